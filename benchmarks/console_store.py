@@ -0,0 +1,39 @@
+"""Append millions of lines to the console LineStore and report memory and latency.
+
+Memory and the time per million appends should stay flat as the line count grows.
+
+    python benchmarks/console_store.py [LINES]
+"""
+
+import random
+import sys
+import time
+import resource
+
+from anvil.helpers.linestore import LineStore
+
+
+def main(lines: int = 10_000_000):
+    store = LineStore(capacity=10_000)
+    step = 1_000_000
+    start = time.perf_counter()
+    for count in range(1, lines + 1):
+        store.append(f"host{count % 500}.example.com | Active: active (running) line {count}\n", count % 7, count % 4)
+        if count % step == 0:
+            now = time.perf_counter()
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"{count:>11,} lines  {(now - start) / step * 1e6:6.2f} us/append  {peak / 1024:7.1f} MB peak RSS")
+            start = now
+
+    # page in from the spill file, as when scrolling back through old output
+    pages = 200
+    start = time.perf_counter()
+    for _ in range(pages):
+        first = random.randrange(0, lines - 1_000)
+        store.get(first, first + 1_000)
+    print(f"random 1,000 line page from disk: {(time.perf_counter() - start) / pages * 1000:.2f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
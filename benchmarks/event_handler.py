@@ -0,0 +1,112 @@
+"""Measure the console event handler for each output preset.
+
+The stream mimics a shell task on many hosts: for every host a runner_on_start,
+some verbose lines and a runner_on_ok carrying the command output. For each
+preset the events are trimmed the way ansible_runner's callback plugin trims
+them (only_failed_event_data empties event_data of all but failed events) and
+the anvil_display stdout callback trims them (see anvil.ansible.callback), and
+the report shows the JSON bytes per event that cross from ansible to anvil,
+the events ansible_runner writes to artifacts/job_events, and handler throughput.
+
+    python benchmarks/event_handler.py [HOSTS]
+"""
+
+import contextlib
+import json
+import os
+import sys
+import copy
+import time
+
+from anvil.ansible.ansible import PRESETS, event_handler
+from anvil.ansible.callback.anvil_display import trim_event
+
+FAILED_EVENTS = ("runner_on_failed", "runner_on_async_failed", "runner_on_item_failed")
+
+
+def event(event_name: str, counter: int, **event_data) -> dict:
+    event_data.setdefault("playbook", "main.json")
+    return {
+        "uuid": f"00000000-0000-0000-0000-{counter:012}",
+        "counter": counter,
+        "stdout": "",
+        "start_line": counter,
+        "end_line": counter + 1,
+        "runner_ident": "run",
+        "created": "2024-01-01T00:00:00.000000",
+        "pid": 1234,
+        "event": event_name,
+        "event_data": {
+            "play_uuid": "a",
+            "parent_uuid": "b",
+            "playbook_uuid": "c",
+            "task_uuid": "d",
+            "play": "Playbook",
+            "task": "$ uptime",
+            "task_action": "ansible.builtin.command",
+            "start": "x",
+            "end": "y",
+            "duration": 0.5,
+            **event_data,
+        },
+    }
+
+
+def event_stream(hosts: int) -> list:
+    events = [event("playbook_on_start", 0), event("playbook_on_task_start", 1, name="$ uptime")]
+    stdout_lines = [f"line {i} of output" for i in range(5)]
+    for i in range(hosts):
+        host = f"host{i}.example.com"
+        counter = len(events)
+        events.append(event("runner_on_start", counter, host=host))
+        events.append(event("verbose", counter + 1))
+        events.append(event("verbose", counter + 2))
+        res = {
+            "changed": True,
+            "stdout": "\n".join(stdout_lines),
+            "stdout_lines": stdout_lines,
+            "stderr": "",
+            "stderr_lines": [],
+            "rc": 0,
+            "invocation": {"module_args": {"_raw_params": "uptime", "chdir": None}},
+        }
+        events.append(event("runner_on_ok", counter + 3, host=host, res=res))
+    events.append(event("playbook_on_stats", len(events)))
+    return events
+
+
+def trim(events: list, verbosity: str) -> list:
+    run_args = PRESETS[verbosity]["run_args"]
+    if PRESETS[verbosity]["envvars"].get("ANSIBLE_STDOUT_CALLBACK") == "anvil_display":
+        events = [trim_event(copy.deepcopy(data)) for data in events]
+    if run_args.get("omit_event_data"):
+        return [{**data, "event_data": {}} for data in events]
+    if run_args.get("only_failed_event_data"):
+        return [data if data["event"] in FAILED_EVENTS else {**data, "event_data": {}} for data in events]
+    return events
+
+
+def main(hosts: int = 20_000):
+    stream = event_stream(hosts)
+    for verbosity in PRESETS:
+        events = trim(stream, verbosity)
+        payload = sum(len(json.dumps(data)) for data in events)
+        messages = []
+        handler = event_handler(messages.append, verbosity)
+        written = 0
+        # anything the handler prints counts, but is not shown
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            for data in events:
+                if handler(data):
+                    written += 1
+            elapsed = time.perf_counter() - start
+        print(
+            f"{verbosity:8} {payload / len(events):7.0f} B/event sent  "
+            f"{written:7,} events written  {len(messages):7,} messages  "
+            f"{elapsed / len(events) * 1e6:5.2f} us/event  {len(events) / elapsed:9,.0f} events/s"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,78 @@
+"""Measure the event data ansible sends to anvil for each output preset.
+
+Runs a fused shell task and a command task against localhost over the local
+connection, and reports the JSON bytes per event the event handler receives.
+normal and summary select the anvil_display stdout callback, which drops
+invocation, uuids and the stdout/stderr duplicated by stdout_lines/stderr_lines
+before an event is written; full sends events untrimmed. Needs ansible-core
+importable from this interpreter.
+
+    python benchmarks/event_size.py [LINES]
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+from anvil.ansible import PlayBuilder, ansible
+from anvil.ansible.ansible import anvilrun
+from anvil.ansible.server import stop_servers
+
+
+def make_project(path: str):
+    os.makedirs(f"{path}/inventory")
+    with open(f"{path}/inventory/hosts", "w") as f:
+        f.write(f"localhost ansible_connection=local ansible_python_interpreter={sys.executable}\n")
+
+
+def measure(verbosity: str, lines: int) -> tuple:
+    play = PlayBuilder()
+    play.verbosity = verbosity
+    play.playbook["become"] = False
+    play.hosts.append("localhost")
+    play.shell([f"seq {lines}", "uname -a"], fused=True)
+    play.shell([f"seq {lines}"])
+
+    sizes = []
+    build_handler = ansible.event_handler
+
+    def measuring_handler(*args) -> callable:
+        handler = build_handler(*args)
+
+        def measure_event(data: dict) -> bool:
+            sizes.append(len(json.dumps(data)))
+            return handler(data)
+
+        return measure_event
+
+    ansible.event_handler = measuring_handler
+    try:
+        result = anvilrun(play, lambda message: None)
+    finally:
+        ansible.event_handler = build_handler
+    if result.status != "successful":
+        raise RuntimeError(f"run ended {result.status} with rc {result.rc}")
+    return len(sizes), sum(sizes)
+
+
+def main(lines: int = 200):
+    with tempfile.TemporaryDirectory() as project:
+        make_project(project)
+        PlayBuilder.private_data_dir = project
+        PlayBuilder.gather_facts = False
+        try:
+            full = None
+            for verbosity in ("full", "normal", "summary"):
+                events, total = measure(verbosity, lines)
+                full = full or total / events
+                print(
+                    f"{verbosity:8} {events:4} events  {total:9,} B  {total / events:8.0f} B/event  "
+                    f"{total / events / full:6.1%} of full"
+                )
+        finally:
+            stop_servers()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
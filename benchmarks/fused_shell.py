@@ -0,0 +1,53 @@
+"""Compare PlayBuilder.shell with one task per command and with fused=True.
+
+Runs the same commands against localhost over the local connection, once as
+separate command tasks and once as a single fused shell task, and reports the
+median run time. Over ssh each task also costs its own round trips, so the gap
+grows with latency to the host. Needs ansible-core installed.
+
+    python benchmarks/fused_shell.py [COMMANDS] [RUNS]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from anvil.ansible import PlayBuilder
+from anvil.ansible.ansible import anvilrun
+from anvil.ansible.server import stop_servers
+
+
+def timed_run(commands: list, fused: bool) -> float:
+    play = PlayBuilder()
+    play.playbook["become"] = False
+    play.hosts.append("localhost")
+    play.shell(commands, fused=fused)
+    start = time.perf_counter()
+    result = anvilrun(play, lambda message: None)
+    if result.status != "successful":
+        raise RuntimeError(f"run ended {result.status} with rc {result.rc}")
+    return time.perf_counter() - start
+
+
+def main(count: int = 3, runs: int = 5):
+    commands = [f"echo command {i}" for i in range(count)]
+    with tempfile.TemporaryDirectory() as project:
+        os.makedirs(f"{project}/inventory")
+        with open(f"{project}/inventory/hosts", "w") as f:
+            f.write(f"localhost ansible_connection=local ansible_python_interpreter={sys.executable}\n")
+        PlayBuilder.private_data_dir = project
+        PlayBuilder.gather_facts = False
+
+        # the first run starts the warm server
+        timed_run(commands, fused=False)
+        for fused in (False, True):
+            times = [timed_run(commands, fused) for _ in range(runs)]
+            name = "fused" if fused else "one task each"
+            print(f"{name:14} {count} commands  {statistics.median(times) * 1000:7.0f} ms  ({runs} runs, median)")
+        stop_servers()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,47 @@
+"""Check that non-GUI modules import without Qt or ansible_runner, and how long they take.
+
+Each module is imported in a fresh interpreter with -X importtime. The script
+exits with status 1 when a module pulls in a forbidden package or its
+cumulative import time is over the budget, so it can run in CI.
+
+    python benchmarks/import_time.py [BUDGET_MS]
+"""
+
+import sys
+
+from anvil.helpers import profiler
+
+# module -> packages it must not import
+CHECKS = {
+    "anvil": ["PySide6", "qdarktheme", "ansible_runner"],
+    "anvil.config": ["PySide6", "qdarktheme", "ansible_runner"],
+    "anvil.helpers.yamlmanager": ["PySide6", "qdarktheme", "ansible_runner"],
+    "anvil.ansible": ["PySide6", "qdarktheme", "ansible_runner"],
+}
+
+
+def main(budget_ms: float = 300.0) -> int:
+    failed = False
+    for module, forbidden in CHECKS.items():
+        imports = profiler.import_times(module)
+        entry = next((item for item in imports if item["module"] == module), None)
+        if entry is None:
+            print(f"{module:28} FAILED TO IMPORT")
+            failed = True
+            continue
+
+        total_ms = entry["cumulative_us"] / 1000
+        loaded = sorted({item["module"].split(".")[0] for item in imports} & set(forbidden))
+        status = "ok"
+        if loaded:
+            status = f"imports {', '.join(loaded)}"
+            failed = True
+        elif total_ms > budget_ms:
+            status = f"over budget of {budget_ms:.0f} ms"
+            failed = True
+        print(f"{module:28} {total_ms:8.1f} ms  {len(imports):4} modules  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(float(arg) for arg in sys.argv[1:])))
@@ -0,0 +1,49 @@
+"""Compare the memory used by the inventory host model.
+
+The legacy model below mirrors the Host class before it used __slots__ and
+sparse variables: every host copied the full Inventory.VARS table.
+
+    python benchmarks/inventory_memory.py [HOST_COUNT ...]
+"""
+
+import sys
+import tracemalloc
+
+from anvil.config.inventory import Inventory
+
+
+class LegacyHost:
+    def __init__(self, name: str):
+        self.name = name
+        self.vars = Inventory.VARS.copy()
+        self.storage_dir: str = ""
+        self.configkey: str = ""
+        self.member_of: dict = {}
+
+
+def build(host_class, count: int) -> int:
+    tracemalloc.start()
+    hosts = {}
+    for i in range(count):
+        host = host_class(f"host{i}")
+        host.vars["ansible_host"] = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        # hosts read from disk are clean once the inventory is loaded
+        if hasattr(host, "clean"):
+            host.clean()
+        hosts[host.name] = host
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    print(f"{'hosts':>8} {'legacy':>12} {'current':>12} {'ratio':>6}")
+    for count in counts:
+        legacy = build(LegacyHost, count)
+        current = build(Inventory.Host, count)
+        print(f"{count:>8} {legacy / 2**20:>10.1f}MB {current / 2**20:>10.1f}MB {legacy / current:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
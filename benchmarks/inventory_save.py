@@ -0,0 +1,55 @@
+"""Time saving one changed host in inventories of different sizes.
+
+The first save after loading serializes the whole inventory and fills the
+yaml fragment cache, later saves only re-serialize the changed host.
+
+    python benchmarks/inventory_save.py [HOST_COUNT ...]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import yaml
+
+from anvil.config.inventory import Inventory
+
+
+def write_inventory(project_dir: str, count: int) -> str:
+    inventory_path = os.path.join(project_dir, "inventory", "hosts")
+    os.makedirs(os.path.dirname(inventory_path))
+    hosts = {f"host{i}": {"ansible_host": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"} for i in range(count)}
+    data = {
+        "all": {"hosts": hosts, "vars": {"ansible_user": "root"}},
+        "web": {"hosts": {name: {} for name in list(hosts)[::2]}},
+    }
+    with open(inventory_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(data, file)
+    return inventory_path
+
+
+def timed_save(inventory: Inventory, index: int) -> float:
+    host = inventory.get_host(f"host{index}")
+    host.vars["ansible_port"] = str(2000 + index)
+    start = time.perf_counter()
+    inventory.save_host(host)
+    return time.perf_counter() - start
+
+
+def main(counts: list):
+    for count in counts:
+        with tempfile.TemporaryDirectory() as project_dir:
+            inventory = Inventory(write_inventory(project_dir, count), project_dir)
+            inventory.setup(materialize=False)
+            first = timed_save(inventory, 0)
+            later = statistics.median(timed_save(inventory, i) for i in range(1, 21))
+            print(
+                f"{count:>7,} hosts  first save {first * 1000:7.1f} ms  "
+                f"later saves {later * 1000:6.1f} ms (median of 20)"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 20_000])
@@ -0,0 +1,52 @@
+"""Compare cold (yaml parse) and warm (snapshot) inventory loads.
+
+    python benchmarks/inventory_snapshot.py [HOST_COUNT ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+from anvil.config.inventory import Inventory
+
+
+def write_inventory(project_dir: str, count: int) -> str:
+    inventory_path = os.path.join(project_dir, "inventory", "hosts")
+    os.makedirs(os.path.dirname(inventory_path))
+    hosts = {f"host{i}": {"ansible_host": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"} for i in range(count)}
+    data = {
+        "all": {"hosts": hosts, "vars": {"ansible_user": "root"}},
+        "web": {"hosts": {name: {} for name in list(hosts)[::2]}},
+    }
+    with open(inventory_path, "w", encoding="utf-8") as file:
+        yaml.safe_dump(data, file)
+    return inventory_path
+
+
+def load(inventory_path: str, project_dir: str, snapshot_path: str) -> float:
+    start = time.perf_counter()
+    Inventory(inventory_path, project_dir, snapshot_path).setup(materialize=False)
+    return time.perf_counter() - start
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 50_000]
+    print(f"{'hosts':>8} {'cold':>9} {'warm':>9}")
+    for count in counts:
+        with tempfile.TemporaryDirectory() as project_dir:
+            inventory_path = write_inventory(project_dir, count)
+            snapshot_path = os.path.join(project_dir, "inventory.snapshot")
+
+            cold = load(inventory_path, project_dir, snapshot_path)
+            # the first load writes the snapshot in the background
+            while not os.path.exists(snapshot_path):
+                time.sleep(0.01)
+            warm = load(inventory_path, project_dir, snapshot_path)
+            print(f"{count:>8} {cold:>8.3f}s {warm:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare sending a directory file by file with PlayBuilder.send_tree.
+
+Builds a directory of small config-like files, then sends it to a scratch
+directory on localhost over the local connection, once with a
+PlayBuilder.send task per file and once as a single archive. Each run starts
+from an empty destination and the time includes packing. Over ssh every copy
+task also pays its own round trips, so the gap grows with latency to the host.
+Needs ansible-core installed, and tar and gzip on this machine.
+
+    python benchmarks/send_tree.py [FILES]
+"""
+
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from anvil.ansible import PlayBuilder
+from anvil.ansible.ansible import anvilrun
+from anvil.ansible.server import stop_servers
+
+
+def make_tree(path: str, files: int):
+    for i in range(files):
+        directory = os.path.join(path, f"conf.d/part{i % 10}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i}.conf"), "w") as f:
+            f.write(f"# setting {i}\nvalue = {i * 7}\n" * 20)
+    os.chmod(os.path.join(path, "conf.d/part0/file0.conf"), 0o750)
+
+
+def timed_run(build) -> float:
+    play = PlayBuilder()
+    play.playbook["become"] = False
+    play.hosts.append("localhost")
+    start = time.perf_counter()
+    build(play)
+    result = anvilrun(play, lambda message: None)
+    if result.status != "successful":
+        raise RuntimeError(f"run ended {result.status} with rc {result.rc}")
+    return time.perf_counter() - start
+
+
+def send_each(src: str, dest: str):
+    def build(play: PlayBuilder):
+        for root, _, names in os.walk(src):
+            target = os.path.join(dest, os.path.relpath(root, src))
+            # copy does not create missing parents, the host is local so they are made here
+            os.makedirs(target, exist_ok=True)
+            for name in names:
+                play.send(os.path.join(root, name), os.path.join(target, name))
+
+    return build
+
+
+def same_tree(src: str, dest: str) -> bool:
+    for root, _, names in os.walk(src):
+        target = os.path.join(dest, os.path.relpath(root, src))
+        _, mismatch, errors = filecmp.cmpfiles(root, target, names, shallow=False)
+        if mismatch or errors:
+            return False
+    return True
+
+
+def main(files: int = 100):
+    with tempfile.TemporaryDirectory() as workdir:
+        project, src, dest = (os.path.join(workdir, name) for name in ("project", "src", "dest"))
+        os.makedirs(f"{project}/inventory")
+        with open(f"{project}/inventory/hosts", "w") as f:
+            f.write(f"localhost ansible_connection=local ansible_python_interpreter={sys.executable}\n")
+        PlayBuilder.private_data_dir = project
+        PlayBuilder.gather_facts = False
+        PlayBuilder.archive_dir = os.path.join(workdir, "archives")
+        make_tree(src, files)
+
+        builds = (("copy per file", send_each(src, dest)), ("send_tree", lambda play: play.send_tree(src, dest)))
+        for name, build in builds:
+            shutil.rmtree(dest, ignore_errors=True)
+            elapsed = timed_run(build)
+            contents = "same contents" if same_tree(src, dest) else "contents differ"
+            mode = os.stat(f"{dest}/conf.d/part0/file0.conf").st_mode & 0o777
+            modes = "modes kept" if mode == 0o750 else "modes lost"
+            print(f"{name:14} {files} files  {elapsed * 1000:7.0f} ms  {contents}, {modes}")
+        stop_servers()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
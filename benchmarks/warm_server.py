@@ -0,0 +1,71 @@
+"""Compare plays run by a fresh ansible-playbook with plays run by the warm server.
+
+Each run is a one-task shell play against localhost over the local connection,
+so nearly all of the time is ansible start-up. The report shows the time until
+the first console message (the playbook_on_start event) and until the run ends.
+The first warm run includes starting the server and is reported on its own.
+Needs ansible-core importable from this interpreter.
+
+    python benchmarks/warm_server.py [RUNS]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from anvil.ansible import PlayBuilder
+from anvil.ansible.ansible import anvilrun
+from anvil.ansible.server import stop_servers
+
+
+def make_project(path: str):
+    os.makedirs(f"{path}/inventory")
+    with open(f"{path}/inventory/hosts", "w") as f:
+        f.write(f"localhost ansible_connection=local ansible_python_interpreter={sys.executable}\n")
+
+
+def timed_run(warm: bool) -> tuple:
+    play = PlayBuilder()
+    play.warm = warm
+    play.playbook["become"] = False
+    play.hosts.append("localhost")
+    play.shell(["uptime"])
+
+    first = []
+    start = time.perf_counter()
+
+    def sink(message):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    result = anvilrun(play, sink)
+    if result.status != "successful":
+        raise RuntimeError(f"run ended {result.status} with rc {result.rc}")
+    return first[0], time.perf_counter() - start
+
+
+def report(name: str, times: list):
+    firsts = [first for first, _ in times]
+    totals = [total for _, total in times]
+    print(
+        f"{name:18} first event {statistics.median(firsts) * 1000:7.0f} ms   "
+        f"run {statistics.median(totals) * 1000:7.0f} ms   ({len(times)} runs, median)"
+    )
+
+
+def main(runs: int = 5):
+    with tempfile.TemporaryDirectory() as project:
+        make_project(project)
+        PlayBuilder.private_data_dir = project
+        PlayBuilder.gather_facts = False
+
+        report("cold", [timed_run(warm=False) for _ in range(runs)])
+        report("warm, first run", [timed_run(warm=True)])
+        report("warm", [timed_run(warm=True) for _ in range(runs)])
+        stop_servers()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,62 @@
+"""Time each yamlmanager backend on inventory documents of 1MB to 50MB.
+
+The pure Python yaml classes are included for comparison with libyaml.
+
+    python benchmarks/yaml_backends.py [SIZE_MB ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+from anvil.helpers import yamlmanager
+
+
+def inventory_document(size_mb: int) -> dict:
+    """Build an inventory whose YAML form is roughly size_mb megabytes."""
+    # one host entry is ~100 bytes of YAML
+    count = size_mb * 10_000
+    hosts = {}
+    for i in range(count):
+        hosts[f"host{i}.example.com"] = {
+            "ansible_host": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+            "ansible_user": "deploy",
+        }
+    return {
+        "all": {"hosts": hosts, "vars": {"ansible_become": True}},
+        "web": {"hosts": {name: {} for name in list(hosts)[::4]}, "vars": {}},
+    }
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1, 10, 50]
+    backends = dict(yamlmanager.BACKENDS)
+    if yamlmanager.LIBYAML:
+        backends["yaml (pure)"] = yamlmanager.YamlBackend(yaml.SafeLoader, yaml.SafeDumper)
+    # register the pure Python classes so dump()/load() can select them by name
+    yamlmanager.BACKENDS.update(backends)
+
+    print(f"libyaml available: {yamlmanager.LIBYAML}")
+    print(f"{'size':>6} {'backend':<12} {'file':>9} {'dump':>9} {'load':>9}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size_mb in sizes:
+            data = inventory_document(size_mb)
+            for name in backends:
+                file_path = os.path.join(temp_dir, f"inventory-{size_mb}")
+                dump_time = timed(lambda: yamlmanager.dump(file_path, data, name))
+                load_time = timed(lambda: yamlmanager.load(file_path, name))
+                file_mb = os.path.getsize(file_path) / 2**20
+                print(f"{size_mb:>4}MB {name:<12} {file_mb:>7.1f}MB {dump_time:>8.2f}s {load_time:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
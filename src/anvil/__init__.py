@@ -1,17 +1,35 @@
-from os import getenv
+import atexit
 
-from dotenv import load_dotenv
+from anvil.helpers import profiler
 
-from anvil.config import CONFIG_FILE, DATA_DIR, TEMP_DIR, ProjectData
-from anvil.gui import gui_main
-from anvil.helpers import configutils, filemanager
+with profiler.phase("import anvil"):
+    from dotenv import load_dotenv
+
+    from anvil.config import CONFIG_FILE, DATA_DIR, TEMP_DIR, ProjectData
+    from anvil.helpers import configutils, filemanager, yamlmanager
+
+
+def __getattr__(name: str):
+    # the gui pulls in Qt, only import it when it is asked for
+    if name == "gui_main":
+        from anvil.gui import gui_main
+
+        return gui_main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def anvil():
-    load_dotenv()
-    filemanager.check_dir(TEMP_DIR, create=True)
-    filemanager.check_dir(DATA_DIR, create=True)
-    filemanager.check_file(CONFIG_FILE, create=True)
-    configutils.validate_config(ProjectData)
-    ProjectData.verify_projects()
+    with profiler.phase("load dotenv"):
+        load_dotenv()
+    with profiler.phase("check directories"):
+        filemanager.check_dir(TEMP_DIR, create=True)
+        filemanager.check_dir(DATA_DIR, create=True)
+        filemanager.check_file(CONFIG_FILE, create=True)
+    atexit.register(yamlmanager.compact, CONFIG_FILE)
+    with profiler.phase("validate config"):
+        configutils.validate_config(ProjectData)
+    with profiler.phase("verify projects"):
+        ProjectData.verify_projects()
+    with profiler.phase("import anvil.gui"):
+        from anvil.gui import gui_main
     gui_main()
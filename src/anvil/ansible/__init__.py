@@ -1,3 +1,25 @@
-from .ansible import anvilrun
+from importlib import import_module
+
+from .batch import BatchAction, BatchQueue
+from .batcher import MessageBatcher
 from .play_builder import PlayBuilder
-from .worker import Worker, WorkerSignals
+from .scheduler import Job, RunScheduler
+
+# ansible_runner and Qt are only imported when these are first used
+LAZY = {
+    "anvilrun": ".ansible",
+    "PRESETS": ".ansible",
+    "WorkerSignals": ".worker",
+}
+
+
+def __getattr__(name: str):
+    if name in LAZY:
+        value = getattr(import_module(LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(LAZY))
@@ -1,21 +1,50 @@
 import json
+import logging
+import os
+from typing import Callable, Dict, Optional
 
-from ansible_runner import run
-from PySide6.QtCore import SignalInstance
+from anvil.helpers.logger import Logger
 
-from anvil.helpers import datautils
-
-from .parse_event import EventParser
-from .play_builder import PlayBuilder
+from .parse_event import EventParser, ProgressSink
+from .play_builder import PlayBuilder, split_fused
 
 # from anvil.config import Project, ProjectData
 
+log = Logger.get_logger(__name__)
+
+
+def anvilrun(
+    play: PlayBuilder,
+    progress_callback: ProgressSink,
+    cancel_callback: Optional[Callable[[], bool]] = None,
+    result_callback: Optional[Callable[[str, dict], None]] = None,
+):
+    """Run a play, sending console messages to progress_callback.
+
+    Arguments:
+        play -- The play to run
+        progress_callback -- A Qt signal or any function taking a message dict
+
+    Keyword Arguments:
+        cancel_callback -- Polled while the play runs, returning True stops it (default: {None})
+        result_callback -- Called with the event name and event data of every per-host task result (default: {None})
 
-def anvilrun(play: PlayBuilder, progress_callback: SignalInstance):
-    run_args = play.get_run_args()
-    run(
+    Returns:
+        Runner -- ansible_runner's result, see its status and rc
+    """
+    # deferred, ansible_runner takes a while to import
+    from ansible_runner import run
+
+    from .server import warm_run
+
+    play.prepare()
+    preset = PRESETS[play.verbosity]
+    # ansible_runner updates envvars in place, so every run gets its own copy
+    run_args = {**preset["run_args"], "envvars": dict(preset["envvars"]), **play.get_run_args()}
+    return (warm_run if play.warm else run)(
         **run_args,
-        event_handler=event_handler(progress_callback),
+        event_handler=event_handler(progress_callback, play.verbosity, result_callback),
+        cancel_callback=cancel_callback,
     )
     # status_handler=status_handler,
 
@@ -28,216 +57,240 @@ def status_handler(status_data, runner_config):
     # status_data.pop("cwd", None)
 
 
-def event_handler(progress_callback):
-    badkeys = [
-        "uuid",
-        "play_uuid",
-        "parent_uuid",
-        "playbook_uuid",
-        "task_uuid",
-        "counter",
-        "stdout",
-        "start_line",
-        "end_line",
-        "runner_ident",
-        "created",
-        "pid",
-        "ad_hoc_command_id",
-        "start",
-        "end",
-        "duration",
-    ]
-
-    def handler(data):
-        nonlocal badkeys
-
-        if data.get("event_data") is None:
+def dump_event(event: str, event_data: dict):
+    # json.dumps of a large result is expensive, only pay for it when debugging
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%s\n%s", event, json.dumps(event_data, indent=2, default=str))
+
+
+def on_adhoc_start(ep: EventParser, event_data: dict):
+    # announce the module once, not for every host
+    if not ep.oneshot:
+        ep.oneshot = True
+        ep.emit(text=event_data.get("resolved_action", ""), color="cyan", charformat="h3")
+
+
+def on_ok(ep: EventParser, event_data: dict):
+    color = "yellow" if event_data["res"].get("changed") else "green"
+    ep.emit(text="OK\t", color=color, charformat="h3", skip_newline=True)
+    ep.emit(text=event_data.get("host", ""))
+
+
+def on_playbook_start(ep: EventParser, event_data: dict):
+    ep.emit(text="Playbook Started", color="purple", charformat="h2")
+
+
+def on_task_start(ep: EventParser, event_data: dict):
+    ep.emit(text=event_data.get("name", ""))
+
+
+def on_playbook_ok(ep: EventParser, event_data: dict):
+    task = event_data.get("task", "")
+    if task == "Gathering Facts":
+        # OS type for package installation can be determined here
+        return
+    if event_data.get("task_action") == "ansible.builtin.shell" and emit_fused(ep, event_data["res"]):
+        return
+    if event_data.get("task_action") != "ansible.builtin.command":
+        on_ok(ep, event_data)
+        return
+
+    # I want to print the debug message, not just OK
+    res = event_data["res"]
+    stdout_lines = output_lines(res, "stdout")
+    if stdout_lines:
+        ep.emit(text="Success", color="green")
+        dump_event("runner_on_ok", event_data)
+        if task.startswith("$ systemctl"):
+            ep.emit_systemctl(stdout_lines)
             return
+        ep.emit_stdout(stdout_lines)
+    stderr_lines = output_lines(res, "stderr")
+    if stderr_lines:
+        ep.emit(text="Failed", color="red")
+        ep.emit_stderr(stderr_lines)
+
+
+def output_lines(res: dict, stream: str) -> list:
+    """Get the lines of a result's stdout or stderr.
+
+    The anvil_display callback drops "stdout" and "stderr" when the "_lines"
+    copies are there, full output still has both.
+    """
+    lines = res.get(f"{stream}_lines")
+    if lines is None:
+        lines = res.get(stream, "").splitlines()
+    return lines
+
+
+def emit_fused(ep: EventParser, res: dict) -> bool:
+    """Show a PlayBuilder.fused_shell result command by command.
+
+    Returns:
+        bool -- False when res is not from a fused_shell task
+    """
+    results = split_fused("\n".join(output_lines(res, "stdout")), "\n".join(output_lines(res, "stderr")))
+    if not results:
+        return False
+    for result in results:
+        rc = result["rc"]
+        ep.emit(text=f"$ {result['cmd']}", color="green" if rc == 0 else "red", charformat="h3", skip_newline=True)
+        ep.emit(text="\tcut off" if rc is None else f"\trc {rc}, {result['duration']} ms")
+        if result["stdout_lines"]:
+            if result["cmd"].startswith("systemctl"):
+                ep.emit_systemctl(result["stdout_lines"])
+            else:
+                ep.emit_stdout(result["stdout_lines"])
+        if result["stderr_lines"]:
+            ep.emit_stderr(result["stderr_lines"])
+    return True
+
+
+def on_failed(ep: EventParser, event_data: dict):
+    res = event_data["res"]
+    ep.emit(text="Failed", color="red")
+    if event_data.get("task_action") == "ansible.builtin.shell" and emit_fused(ep, res):
+        dump_event("runner_on_failed", event_data)
+        return
+    if res.get("msg") is not None:
+        ep.emit(text=res["msg"])
+    stderr_lines = output_lines(res, "stderr")
+    if stderr_lines:
+        ep.emit_stderr(stderr_lines)
+    dump_event("runner_on_failed", event_data)
+
+
+def on_stats(ep: EventParser, event_data: dict):
+    ep.emit(text="Finished")
+
+
+def count_event(ep: EventParser, event_data: dict):
+    ep.counts[ep.key] = ep.counts.get(ep.key, 0) + 1
+
+
+def on_summary_failed(ep: EventParser, event_data: dict):
+    count_event(ep, event_data)
+    res = event_data.get("res", {})
+    ep.emit(text=f"Failed\t{event_data.get('host', '')}", color="red", charformat="h3")
+    if event_data.get("task_action") == "ansible.builtin.shell" and emit_fused(ep, res):
+        dump_event("runner_on_failed", event_data)
+        return
+    if res.get("msg") is not None:
+        ep.emit(text=res["msg"])
+    stderr_lines = output_lines(res, "stderr")
+    if stderr_lines:
+        ep.emit_stderr(stderr_lines)
+    dump_event("runner_on_failed", event_data)
+
+
+def on_summary_stats(ep: EventParser, event_data: dict):
+    counts = ep.counts
+    ep.emit(
+        text=f"Finished: {counts.get('runner_on_ok', 0)} ok, {counts.get('runner_on_failed', 0)} failed, "
+        f"{counts.get('runner_on_unreachable', 0)} unreachable",
+        color="red" if counts.get("runner_on_failed") or counts.get("runner_on_unreachable") else "green",
+    )
 
-        ep = EventParser(progress_callback)
-        ep.debug = False
-
-        event = data["event"]
-        event_data = datautils.remove_empty_keys(data["event_data"])
-
-        for key in badkeys:
-            event_data.pop(key, None)
-
-        if event_data["playbook"] == "__adhoc_playbook__":
-            match event:
-                case "runner_on_start":
-                    json_print = False
-                    if not EventParser.oneshot:
-                        EventParser.oneshot = True
-                        ep.text = event_data["resolved_action"]
-                        ep.color = "cyan"
-                        ep.charformat = "h3"
-                        ep.emit()
-
-                case "runner_on_ok":
-                    json_print = False
-                    if event_data["res"]["changed"]:
-                        ep.color = "yellow"
-                    else:
-                        ep.color = "green"
-                    ep.charformat = "h3"
-                    ep.skip_newline = True
-                    ep.text = "OK\t"
-                    ep.emit()
-                    ep.text = event_data["host"]
-                    ep.emit()
 
+def on_unreachable(ep: EventParser, event_data: dict):
+    ep.emit(text="Unreachable", color="red")
+    dump_event("runner_on_unreachable", event_data)
+
+
+# Events missing from a table are dropped before their data is looked at,
+# which covers the bulk of the stream (verbose, runner_on_start, skipped, ...).
+ADHOC_HANDLERS: Dict[str, Callable[[EventParser, dict], None]] = {
+    "runner_on_start": on_adhoc_start,
+    "runner_on_ok": on_ok,
+    "playbook_on_stats": on_stats,
+    "runner_on_unreachable": on_unreachable,
+}
+PLAYBOOK_HANDLERS: Dict[str, Callable[[EventParser, dict], None]] = {
+    "playbook_on_start": on_playbook_start,
+    "playbook_on_task_start": on_task_start,
+    "runner_on_ok": on_playbook_ok,
+    "runner_on_failed": on_failed,
+    "playbook_on_stats": on_stats,
+    "runner_on_unreachable": on_unreachable,
+}
+
+# With only_failed_event_data the callback plugin sends an empty event_data for
+# everything but failures, so successes are only counted.
+SUMMARY_HANDLERS: Dict[str, Callable[[EventParser, dict], None]] = {
+    "playbook_on_start": on_playbook_start,
+    "runner_on_ok": count_event,
+    "runner_on_failed": on_summary_failed,
+    "runner_on_unreachable": count_event,
+    "playbook_on_stats": on_summary_stats,
+}
+
+# anvil's own callback plugins, see callback/anvil_display.py
+CALLBACK_DIR = os.path.join(os.path.dirname(__file__), "callback")
+
+# Output presets, chosen with PlayBuilder.verbosity.
+# run_args -- extra ansible_runner.run arguments. omit_event_data and
+#     only_failed_event_data make the callback plugin drop event data before it
+#     is serialized, quiet stops ansible's own output being echoed to stdout.
+# envvars -- the run's environment. The anvil_display stdout callback drops the
+#     invocation, uuids and stdout/stderr duplicated by stdout_lines/stderr_lines
+#     from each event before it is serialized. Every preset has the same
+#     ANSIBLE_CALLBACK_PLUGINS so they share a warm server, the stdout callback
+#     reaches ansible as ORIGINAL_STDOUT_CALLBACK, which the server ignores.
+# keep_events -- the handler's return value, False stops ansible_runner writing
+#     each event to artifacts/job_events.
+TRIMMED_ENVVARS = {"ANSIBLE_CALLBACK_PLUGINS": CALLBACK_DIR, "ANSIBLE_STDOUT_CALLBACK": "anvil_display"}
+PRESETS: Dict[str, Dict] = {
+    "summary": {
+        "run_args": {"only_failed_event_data": True, "quiet": True},
+        "envvars": TRIMMED_ENVVARS,
+        "keep_events": False,
+    },
+    "normal": {"run_args": {"quiet": True}, "envvars": TRIMMED_ENVVARS, "keep_events": False},
+    "full": {"run_args": {}, "envvars": {"ANSIBLE_CALLBACK_PLUGINS": CALLBACK_DIR}, "keep_events": True},
+}
+
+
+RESULT_EVENTS = frozenset({"runner_on_ok", "runner_on_failed", "runner_on_unreachable", "runner_on_skipped"})
+
+
+def event_handler(
+    progress_callback: ProgressSink,
+    verbosity: str = "normal",
+    result_callback: Optional[Callable[[str, dict], None]] = None,
+):
+    """Build the ansible_runner event handler for one run.
+
+    Arguments:
+        progress_callback -- A Qt signal or any function taking a message dict
+
+    Keyword Arguments:
+        verbosity -- One of PRESETS (default: {"normal"})
+        result_callback -- Called with the event name and event data of every per-host task result (default: {None})
+
+    Returns:
+        function -- Takes an event dict, as ansible_runner's event_handler
+    """
+    # one parser for the whole run
+    ep = EventParser(progress_callback)
+    keep_events = PRESETS[verbosity]["keep_events"]
+    summary = verbosity == "summary"
+
+    def handler(data: dict) -> bool:
+        event_data = data.get("event_data")
+        if event_data is None:
+            return keep_events
+        if result_callback is not None and data["event"] in RESULT_EVENTS:
+            result_callback(data["event"], event_data)
+        if summary:
+            event_function = SUMMARY_HANDLERS.get(data["event"])
+        elif event_data.get("playbook") == "__adhoc_playbook__":
+            event_function = ADHOC_HANDLERS.get(data["event"])
         else:
-            ep.key = event
-            match event:
-                case "playbook_on_start":
-                    json_print = False
-                    ep.text = "Playbook Started"
-                    ep.color = "purple"
-                    ep.charformat = "h2"
-                    ep.emit()
-
-                case "playbook_on_task_start":
-                    json_print = False
-                    ep.text = event_data["name"]
-                    ep.emit()
-
-                case "runner_on_start":
-                    json_print = False
-
-                case "runner_on_ok":
-                    if event_data["task"] == "Gathering Facts":
-                        # OS type for package installation can be determined here
-                        return
-
-                    if event_data["task_action"] == "ansible.builtin.command":
-                        # I want to print the debug message, not just OK
-                        if event_data["res"]["stdout"]:
-                            ep.color = "green"
-                            ep.text = "Success"
-                            ep.emit()
-
-                            print(json.dumps(event_data, indent=2))
-
-                            if event_data["task"].startswith("$ systemctl"):
-                                ep.emit_systemctl(event_data["res"]["stdout_lines"])
-                                return
-
-                            ep.emit_stdout(event_data["res"]["stdout_lines"])
-
-                        if event_data["res"]["stderr"]:
-                            ep.emit(text="Failed", color="red")
-                            ep.emit_stderr(event_data["res"]["stderr_lines"])
-
-                    else:
-                        if event_data["res"]["changed"]:
-                            ep.color = "yellow"
-                        else:
-                            ep.color = "green"
-                        ep.charformat = "h3"
-                        ep.skip_newline = True
-                        ep.text = "OK\t"
-                        ep.emit()
-                        ep.text = event_data["host"]
-                        ep.emit()
-
-                case "runner_on_failed":
-                    ep.emit(text="Failed", color="red")
-
-                    if event_data["res"].get("msg") is not None:
-                        ep.emit(text=event_data["res"]["msg"])
-                    if event_data["res"]["stderr"]:
-                        ep.emit_stderr(event_data["res"]["stderr_lines"])
-
-        match event:
-            case "playbook_on_stats":
-                ep.text = "Finished"
-                ep.emit()
-
-            case "runner_on_unreachable":
-                ep.color = "red"
-                ep.text = "Unreachable"
-                ep.emit()
-                print(json.dumps(event_data, indent=2))
-
-        # if json_print:
-        #     print()
-        #     print(event)
-        # print(json.dumps(event_data, indent=2))
-        # else:
-        #
+            event_function = PLAYBOOK_HANDLERS.get(data["event"])
+        if event_function is None:
+            return keep_events
+        ep.key = data["event"]
+        event_function(ep, event_data)
+        return keep_events
 
     return handler
-    #     match event_data["event"]:
-    #         case "playbook_on_start":
-    #             pass
-    #         case "playbook_on_play_start":
-    #             pass
-    #         case "playbook_on_task_start":
-    #             pass
-    #         case "playbook_on_include":
-    #             pass
-    #         case "runner_item_on_skipped":
-    #             pass
-    #         case "runner_on_skipped":
-    #             pass
-    #         case "runner_on_start":
-    #             if event_data["event_data"]["task"] != last_message:
-
-    #                 last_message = event_data["event_data"]["task"]
-    #         case "runner_on_ok":
-
-    #             #
-    #             color = "green"
-    #             host = ""
-    #             res = event_data["event_data"]["res"]
-    #             if event_data["event_data"].get("host") is not None:
-    #                 host = event_data["event_data"]["host"]
-
-    #             if "warnings" in res.keys():
-    #                 for warning in res["warnings"]:
-    #                     if warning is not None:
-    #                         pass
-    #                 res.pop("warnings", None)
-
-    #             if res.get("results") is not None:
-    #                 for i in res["results"]:
-    #                     i.pop("invocation", None)
-    #                     #
-    #                     if i["changed"]:
-    #                         color = "yellow"
-    #                     if i.get("path") is not None:
-    #                         pass
-    #                     if i.get("dest") is not None:
-    #                         pass
-    #             else:
-    #                 if res["changed"]:
-    #                     color = "yellow"
-    #                 if res.get("path") is not None:
-    #                     pass
-    #                 if res.get("path") is not None:
-    #                     pass
-    #         case "runner_item_on_ok":
-    #             #
-
-    #             color = "green"
-    #             if event_data["event_data"]["res"]["changed"]:
-    #                 color = "yellow"
-
-    #             # if event_data["event_data"]["res"].get("path") is not None:
-    #             #
-    #         case "runner_on_unreachable":
-    #             pass
-    #         case "playbook_on_stats":
-    #             pass
-    #         case "runner_item_on_failed":
-    #             pass
-    #         case "runner_on_failed":
-    #             pass
-
-    #         case "verbose":
-    #             pass  # Explicitly do nothing for 'verbose'
-    #         case _:
-    #             pass
-
-    # return handler
@@ -0,0 +1,201 @@
+import itertools
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .parse_event import ProgressSink, sink_function
+from .play_builder import PlayBuilder
+from .scheduler import Job, RunScheduler
+
+# how a task name is tagged with the action it came from
+ACTION_TAG = re.compile(r" \[#(\d+)\]$")
+
+# the worst result wins when an action has several tasks on a host
+RESULT_RANK = {"skipped": 0, "ok": 1, "changed": 2, "failed": 3, "unreachable": 4}
+
+
+class BatchAction:
+    """One quick action waiting in a BatchQueue, and its results once run."""
+
+    ids = itertools.count(1)
+
+    def __init__(
+        self,
+        label: str,
+        build: Callable[[PlayBuilder], None],
+        done_callback: Optional[Callable[["BatchAction"], None]] = None,
+    ):
+        self.id = next(BatchAction.ids)
+        self.label = label
+        self.build = build
+        self.done_callback = done_callback
+        # pending, queued, finished, failed, cancelled or timed_out
+        self.state = "pending"
+        # host -> skipped, ok, changed, failed or unreachable
+        self.results: Dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"<BatchAction {self.id} {self.label!r} {self.state}>"
+
+    @property
+    def tag(self) -> str:
+        return f" [#{self.id}]"
+
+    def summary(self) -> str:
+        counts: Dict[str, int] = {}
+        for result in self.results.values():
+            counts[result] = counts.get(result, 0) + 1
+        if not counts:
+            return f"{self.label}: {self.state}, no results"
+        ranked = sorted(counts.items(), key=lambda item: RESULT_RANK[item[0]])
+        return f"{self.label}: " + ", ".join(f"{count} {result}" for result, count in ranked)
+
+
+class BatchQueue:
+    """Merge quick actions on the same targets into one playbook run.
+
+    Actions added for a set of targets are held for window seconds after the
+    first one arrives, or until flush() is called. Then they are built into a
+    single PlayBuilder and handed to the scheduler. This pays for ansible
+    startup, connections and fact gathering once per batch instead of once
+    per action.
+
+    Each action's tasks go in a block with a rescue, so one failing action
+    does not stop the later ones on that host. Every task name is tagged with
+    its action id, which lets results be recorded on the action they came from.
+    """
+
+    def __init__(self, scheduler: RunScheduler, progress_callback: Optional[ProgressSink] = None, window: float = 2.0):
+        """
+        Arguments:
+            scheduler -- Runs the merged plays
+
+        Keyword Arguments:
+            progress_callback -- Receives console output batches, and a summary per action at the end (default: {None})
+            window -- Seconds to wait for more actions before running (default: {2.0})
+        """
+        self.scheduler = scheduler
+        self.progress_callback = progress_callback
+        self.window = window
+        self.pending: Dict[Tuple[str, ...], List[BatchAction]] = {}
+        self.timers: Dict[Tuple[str, ...], threading.Timer] = {}
+        self.lock = threading.Lock()
+
+    def add(
+        self,
+        targets: Iterable[str],
+        label: str,
+        build: Callable[[PlayBuilder], None],
+        done_callback: Optional[Callable[[BatchAction], None]] = None,
+    ) -> BatchAction:
+        """Queue an action.
+
+        Arguments:
+            targets -- Hosts and groups to run on
+            label -- Shown with the action's results
+            build -- Adds the action's tasks to a PlayBuilder, e.g. lambda play: play.service("nginx", "started")
+
+        Keyword Arguments:
+            done_callback -- Called with the action once its batch has run (default: {None})
+
+        Returns:
+            BatchAction -- Holds the per-host results once run
+        """
+        key = tuple(sorted(set(targets)))
+        action = BatchAction(label, build, done_callback)
+        with self.lock:
+            self.pending.setdefault(key, []).append(action)
+            # the window starts with the first action, so a batch is never held longer than that
+            if key not in self.timers and self.window > 0:
+                timer = threading.Timer(self.window, self.flush, args=(key,))
+                timer.daemon = True
+                self.timers[key] = timer
+                timer.start()
+        return action
+
+    def pending_count(self) -> int:
+        with self.lock:
+            return sum(len(actions) for actions in self.pending.values())
+
+    def flush(self, key: Optional[Tuple[str, ...]] = None) -> List[Job]:
+        """Run the pending actions now.
+
+        Keyword Arguments:
+            key -- Only the actions for this sorted tuple of targets (default: {all of them})
+
+        Returns:
+            list -- The scheduled jobs
+        """
+        with self.lock:
+            keys = list(self.pending) if key is None else [key]
+            batches = []
+            for batch_key in keys:
+                timer = self.timers.pop(batch_key, None)
+                if timer is not None:
+                    timer.cancel()
+                actions = self.pending.pop(batch_key, [])
+                if actions:
+                    batches.append((batch_key, actions))
+        return [self.submit(batch_key, actions) for batch_key, actions in batches]
+
+    def build(self, targets: Tuple[str, ...], actions: List[BatchAction]) -> PlayBuilder:
+        play = PlayBuilder()
+        play.hosts.extend(targets)
+        # results are matched to actions by task name, which summary leaves out
+        if play.verbosity == "summary":
+            play.verbosity = "normal"
+        for action in actions:
+            action_play = PlayBuilder()
+            action.build(action_play)
+            play.deferred.extend(action_play.deferred)
+            play.temp_files.extend(action_play.temp_files)
+            tasks = action_play.playbook["tasks"]
+            for task in tasks:
+                task["name"] += action.tag
+            play.playbook["tasks"].append(
+                {
+                    "name": action.label + action.tag,
+                    "block": tasks,
+                    "rescue": [
+                        {"name": f"Continuing after {action.label}{action.tag}", "ansible.builtin.meta": "noop"}
+                    ],
+                }
+            )
+        play.run_args["playbook"] = play.playbook
+        return play
+
+    def submit(self, targets: Tuple[str, ...], actions: List[BatchAction]) -> Job:
+        by_id = {action.id: action for action in actions}
+
+        def record(event: str, event_data: dict):
+            match = ACTION_TAG.search(event_data.get("task", ""))
+            action = by_id.get(int(match.group(1))) if match else None
+            if action is None:
+                return
+            result = event[len("runner_on_") :]
+            if result == "ok" and event_data.get("res", {}).get("changed"):
+                result = "changed"
+            host = event_data.get("host", "")
+            if RESULT_RANK[result] >= RESULT_RANK.get(action.results.get(host, ""), -1):
+                action.results[host] = result
+
+        def done(job: Job):
+            for action in actions:
+                action.state = job.state
+            if self.progress_callback is not None:
+                color = "red" if job.state != "finished" else "cyan"
+                lines = [{"text": action.summary() + "\n", "color": color, "charformat": "text"} for action in actions]
+                sink_function(self.progress_callback)(lines)
+            for action in actions:
+                if action.done_callback is not None:
+                    action.done_callback(action)
+
+        for action in actions:
+            action.state = "queued"
+        return self.scheduler.submit(
+            self.build(targets, actions),
+            targets=targets,
+            progress_callback=self.progress_callback,
+            done_callback=done,
+            result_callback=record,
+        )
@@ -0,0 +1,80 @@
+import threading
+from typing import List
+
+from .parse_event import ProgressSink, sink_function
+
+
+class MessageBatcher:
+    """Collect console messages from a run and pass them on in batches.
+
+    Messages are merged into runs of text that share a colour and format, with
+    the newlines already in place. A background thread delivers whatever has
+    built up every interval seconds, so the receiver is called at most
+    1 / interval times a second however fast messages arrive.
+
+    The batcher has an emit method, so it can be used wherever a progress sink
+    is expected.
+    """
+
+    def __init__(self, progress_callback: ProgressSink, interval: float = 0.033):
+        """
+        Arguments:
+            progress_callback -- Receives each batch as a list of {"text", "color", "charformat"} dicts
+
+        Keyword Arguments:
+            interval -- Seconds between deliveries (default: {0.033})
+        """
+        self.send = sink_function(progress_callback)
+        self.interval = interval
+        # [color, charformat, [text, ...]]
+        self.runs: List[list] = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def __enter__(self) -> "MessageBatcher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def emit(self, message: dict):
+        text = message["text"]
+        if not message["skip_newline"]:
+            text += "\n"
+        with self.lock:
+            if self.runs:
+                run = self.runs[-1]
+                if run[0] == message["color"] and run[1] == message["charformat"]:
+                    run[2].append(text)
+                    return
+            self.runs.append([message["color"], message["charformat"], [text]])
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="anvil-batcher", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the delivery thread and send anything still buffered."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            runs, self.runs = self.runs, []
+        if runs:
+            self.send(
+                [
+                    {"text": "".join(parts), "color": color, "charformat": charformat}
+                    for color, charformat, parts in runs
+                ]
+            )
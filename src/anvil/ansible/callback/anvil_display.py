@@ -0,0 +1,74 @@
+"""
+This module is an Ansible stdout callback that trims events at the source.
+
+ansible_runner's awx_display callback subclasses the stdout callback named in
+ANSIBLE_STDOUT_CALLBACK and writes every event, with the full task result, to a
+file the runner process then reads back. This callback is that base class. It
+behaves like Ansible's default callback, and once awx_display has created it,
+it wraps awx_display's event context so the keys anvil never reads are dropped
+before an event is serialized:
+
+- the module arguments under "invocation", also in loop results
+- "stdout" and "stderr" when the "stdout_lines" and "stderr_lines" copies are there
+- the uuids in event_data, the event keeps its own uuid and parent_uuid
+
+Selected for the normal and summary presets, see anvil.ansible.ansible.PRESETS.
+"""
+
+import sys
+
+from ansible.plugins.callback.default import CallbackModule as DefaultCallbackModule
+
+DOCUMENTATION = """
+    name: anvil_display
+    type: stdout
+    short_description: default output, with events trimmed for anvil
+    description:
+        - Ansible's default output. Under ansible_runner, event data anvil does not read is dropped.
+    extends_documentation_fragment:
+      - default_callback
+      - result_format_callback
+    requirements:
+      - set as stdout in configuration
+"""
+
+UUID_KEYS = ("uuid", "playbook_uuid", "play_uuid", "task_uuid")
+
+
+def trim_result(res: dict) -> dict:
+    """Get a copy of a task result without the keys anvil does not read."""
+    res = {key: value for key, value in res.items() if key != "invocation"}
+    for stream in ("stdout", "stderr"):
+        if isinstance(res.get(f"{stream}_lines"), list):
+            res.pop(stream, None)
+    if isinstance(res.get("results"), list):
+        res["results"] = [trim_result(item) if isinstance(item, dict) else item for item in res["results"]]
+    return res
+
+
+def trim_event(event: dict) -> dict:
+    """Trim the begin dict of an awx_display event in place."""
+    event_data = event.get("event_data")
+    if isinstance(event_data, dict):
+        for key in UUID_KEYS:
+            event_data.pop(key, None)
+        if isinstance(event_data.get("res"), dict):
+            # the result is shared with other callbacks, so it is copied
+            event_data["res"] = trim_result(event_data["res"])
+    return event
+
+
+class CallbackModule(DefaultCallbackModule):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "stdout"
+    CALLBACK_NAME = "anvil_display"
+
+    def __init__(self):
+        super().__init__()
+        # set when awx_display subclasses this callback, None when it is used on its own
+        event_context = getattr(sys.modules.get(type(self).__module__), "event_context", None)
+        if event_context is None or getattr(event_context, "anvil_trimmed", False):
+            return
+        get_begin_dict = event_context.get_begin_dict
+        event_context.get_begin_dict = lambda: trim_event(get_begin_dict())
+        event_context.anvil_trimmed = True
@@ -1,12 +1,27 @@
-from PySide6.QtCore import SignalInstance
+from typing import TYPE_CHECKING, Callable, Dict, Union
+
+if TYPE_CHECKING:
+    from PySide6.QtCore import SignalInstance
+
+# a Qt signal or any function taking the message dict
+ProgressSink = Union["SignalInstance", Callable[[dict], None]]
+
+
+def sink_function(progress_callback: ProgressSink) -> Callable[[dict], None]:
+    """Get the function that delivers a message to a progress sink."""
+    return getattr(progress_callback, "emit", progress_callback)
 
 
 class EventParser:
-    oneshot = False
     debug = False
 
-    def __init__(self, progress_callback: SignalInstance):
+    def __init__(self, progress_callback: ProgressSink):
         self.progress_callback = progress_callback
+        self.send = sink_function(progress_callback)
+        # set once the first message of an ad hoc run has been shown
+        self.oneshot = False
+        # events seen per type, for the summary preset
+        self.counts: Dict[str, int] = {}
         self.default()
 
     def default(self):
@@ -16,32 +31,18 @@ class EventParser:
         self.charformat = "text"
         self.skip_newline = False
 
-    def emit(self, **kwargs):
-        debug_msg = {
-            "text": f"{self.key} ",
-            "color": "red",
-            "charformat": "text",
-            "skip_newline": True,
-        }
+    def emit(self, text: str = "", color: str = "", charformat: str = "", skip_newline: bool = False):
         if self.debug:
-            self.progress_callback.emit(debug_msg)
-
-        message = {
-            "text": self.text,
-            "color": self.color,
-            "charformat": self.charformat,
-            "skip_newline": self.skip_newline,
-        }
-        if kwargs.get("text"):
-            message["text"] = kwargs["text"]
-        if kwargs.get("color"):
-            message["color"] = kwargs["color"]
-        if kwargs.get("charformat"):
-            message["charformat"] = kwargs["charformat"]
-        if kwargs.get("skip_newline"):
-            message["skip_newline"] = kwargs["skip_newline"]
-
-        self.progress_callback.emit(message)
+            self.send({"text": f"{self.key} ", "color": "red", "charformat": "text", "skip_newline": True})
+
+        self.send(
+            {
+                "text": text or self.text,
+                "color": color or self.color,
+                "charformat": charformat or self.charformat,
+                "skip_newline": skip_newline or self.skip_newline,
+            }
+        )
         self.default()
 
     def emit_systemctl(self, data: list):
@@ -1,10 +1,34 @@
+import hashlib
 import json
-from typing import Any, Dict
+import os
+import re
+import secrets
+import shlex
+import tempfile
+from typing import Any, Callable, Dict, List
+
+from anvil.helpers import filemanager
+
+# frames each command's output in a fused shell script, see PlayBuilder.shell
+# the text after the marker is the command on begin lines, and the rc and duration in ms on end lines
+FUSED_MARKER = re.compile(r"^@@anvil-(begin|end) ([0-9a-f]{16}) (\d+)@@ ?(.*)$")
+
+# nanoseconds since the epoch, falling back to whole seconds where date has no %N
+FUSED_CLOCK = (
+    'anvil_now() { t=$(date +%s%N 2>/dev/null); case "$t" in ""|*N) echo $(($(date +%s) * 1000000000));; '
+    '*) echo "$t";; esac; }'
+)
 
 
 class PlayBuilder:
     private_data_dir: str = ""
     gather_facts: bool = True
+    # output preset, see anvil.ansible.ansible.PRESETS
+    verbosity: str = "normal"
+    # run through the warm server in anvil.ansible.server instead of a fresh ansible-playbook
+    warm: bool = True
+    # where send_tree writes its archives, one per play and source directory
+    archive_dir: str = os.path.join(os.getenv("TEMP_DIR", "/tmp/anvil"), "archives")
 
     def __init__(self):
         self.host_pattern: str = ""
@@ -19,6 +43,24 @@ class PlayBuilder:
         self.run_args: Dict[str, Any] = {
             "private_data_dir": self.private_data_dir,
         }
+        # slow steps such as packing archives, run on the job's thread by prepare()
+        self.deferred: List[Callable[[], None]] = []
+        # files written for this play, removed by cleanup() once it has run
+        self.temp_files: List[str] = []
+
+    def prepare(self):
+        """Run the deferred steps. anvilrun calls this before the play starts."""
+        while self.deferred:
+            self.deferred.pop(0)()
+
+    def cleanup(self):
+        """Delete the files written for this play."""
+        for path in self.temp_files:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.temp_files.clear()
 
     def get_run_args(self) -> dict:
         return self.run_args
@@ -57,6 +99,50 @@ class PlayBuilder:
         self.playbook["tasks"].append(task)
         self.run_args["playbook"] = self.playbook
 
+    def send_tree(self, src: str, dest: str, owner: str = "", group: str = "", mode: str = ""):
+        """Send a whole directory as one archive.
+
+        The directory is packed once, transferred once per host and unpacked
+        into dest by ansible.builtin.unarchive, instead of a copy round trip per
+        file. The remote host needs tar and gzip. Packing is deferred to
+        prepare(), so the archive holds the directory as it is when the play
+        starts, and cleanup() deletes it.
+
+        Arguments:
+            src -- Local directory, e.g. under files/hosts/<host>
+            dest -- Remote directory, created if missing
+
+        Keyword Arguments:
+            owner -- Owner of dest and everything unpacked into it (default: {root, as packed})
+            group -- Group of dest and everything unpacked into it (default: {root, as packed})
+            mode -- Mode of dest itself, unpacked files keep their local modes (default: {unchanged})
+        """
+        os.makedirs(self.archive_dir, mode=0o700, exist_ok=True)
+        name = hashlib.blake2b(os.path.abspath(src).encode(), digest_size=8).hexdigest()
+        # a unique file, so plays sending the same directory never share an archive
+        fd, archive = tempfile.mkstemp(dir=self.archive_dir, prefix=f"{name}-", suffix=".tar.gz")
+        os.close(fd)
+        self.temp_files.append(archive)
+
+        permissions = {key: value for key, value in (("owner", owner), ("group", group)) if value}
+        directory = {"path": dest, "state": "directory", **permissions}
+        if mode:
+            directory["mode"] = mode
+        self.playbook["tasks"].append({"name": f"Creating {dest}", "ansible.builtin.file": directory})
+        send = {
+            "name": f"Sending {dest}/",
+            "ansible.builtin.unarchive": {"src": archive, "dest": dest, **permissions},
+        }
+        self.playbook["tasks"].append(send)
+        self.run_args["playbook"] = self.playbook
+
+        def pack():
+            files = filemanager.pack_tree(src, archive)
+            # the name may carry a suffix by now, e.g. a BatchQueue tag
+            send["name"] = send["name"].replace(f"Sending {dest}/", f"Sending {dest}/ ({files} files)", 1)
+
+        self.deferred.append(pack)
+
     def service(self, service_name: str, state: str, daemon_reload: bool = False):
         """Start, stop, or restart a service on the host/group."""
         task = {
@@ -71,7 +157,18 @@ class PlayBuilder:
         self.playbook["tasks"].append(task)
         self.run_args["playbook"] = self.playbook
 
-    def shell(self, commands: list[str]):
+    def shell(self, commands: list[str], fused: bool = False):
+        """Run commands on the host/group.
+
+        Arguments:
+            commands -- Command lines, one task each
+
+        Keyword Arguments:
+            fused -- Run them all in one shell task instead, see fused_shell (default: {False})
+        """
+        if fused and len(commands) > 1:
+            self.fused_shell(commands)
+            return
         for i, cmd in enumerate(commands):
             task = {
                 "name": f"$ {cmd}",
@@ -84,6 +181,42 @@ class PlayBuilder:
             self.playbook["tasks"].append(task)
         self.run_args["playbook"] = self.playbook
 
+    def fused_shell(self, commands: list[str]):
+        """Run commands one after another in a single shell task.
+
+        The commands go to each host as one script, so the module is sent and run
+        once instead of once per command. Each command runs in its own sh -c, so
+        shell syntax works and a cd does not carry over. Like separate tasks, the
+        first command that fails ends the run on that host.
+
+        Each command's stdout and stderr are framed by marker lines carrying its
+        rc and duration, see split_fused.
+        """
+        token = secrets.token_hex(8)
+        lines = [FUSED_CLOCK]
+        for i, cmd in enumerate(commands):
+            begin = shlex.quote(f"@@anvil-begin {token} {i}@@ {' '.join(cmd.splitlines())}")
+            end = f'"@@anvil-end {token} {i}@@ $rc $(((end - start) / 1000000))"'
+            lines += [
+                f"printf '%s\\n' {begin}; printf '%s\\n' {begin} >&2",
+                "start=$(anvil_now)",
+                f"sh -c {shlex.quote(cmd)}",
+                "rc=$?",
+                "end=$(anvil_now)",
+                f"printf '\\n%s\\n' {end}; printf '\\n%s\\n' {end} >&2",
+                '[ "$rc" -eq 0 ] || exit "$rc"',
+            ]
+        task = {
+            "name": f"$ {'; '.join(commands)}",
+            "ansible.builtin.shell": {
+                "cmd": "\n".join(lines),
+                "executable": "/bin/sh",
+            },
+            "register": "shell_out",
+        }
+        self.playbook["tasks"].append(task)
+        self.run_args["playbook"] = self.playbook
+
     def apt(self, package: str, state: str):
         task = {
             "name": f"Install {package}",
@@ -97,3 +230,44 @@ class PlayBuilder:
 
     def print_json(self):
         print(json.dumps(self.run_args, indent=2))
+
+
+def split_fused(stdout: str, stderr: str) -> List[Dict[str, Any]]:
+    """Split the output of a fused_shell task back into one result per command.
+
+    Arguments:
+        stdout -- The task's stdout
+        stderr -- The task's stderr
+
+    Returns:
+        list -- {"cmd", "rc", "duration" (ms), "stdout_lines", "stderr_lines"} dicts in run order,
+            empty when the output is not from a fused_shell task. A command that
+            was cut off has rc None.
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    token = ""
+    for stream, text in (("stdout_lines", stdout), ("stderr_lines", stderr)):
+        current = None
+        for line in text.splitlines():
+            match = FUSED_MARKER.match(line)
+            if match is None or (token and match.group(2) != token):
+                if current is not None:
+                    current[stream].append(line)
+                continue
+            token = match.group(2)
+            index = int(match.group(3))
+            result = results.setdefault(
+                index, {"cmd": "", "rc": None, "duration": 0, "stdout_lines": [], "stderr_lines": []}
+            )
+            if match.group(1) == "begin":
+                result["cmd"] = match.group(4)
+                current = result
+                continue
+            # the end marker starts on a line of its own, which adds one empty line
+            if current is not None and current[stream] and not current[stream][-1]:
+                current[stream].pop()
+            rc, duration = match.group(4).split()
+            result["rc"] = int(rc)
+            result["duration"] = int(duration)
+            current = None
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,248 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from anvil.helpers.logger import Logger
+
+from .batcher import MessageBatcher
+from .parse_event import ProgressSink, sink_function
+from .play_builder import PlayBuilder
+
+log = Logger.get_logger(__name__)
+
+
+class Job:
+    """One play waiting for or holding its targets in a RunScheduler."""
+
+    ids = itertools.count(1)
+
+    def __init__(
+        self,
+        play: PlayBuilder,
+        targets: Iterable[str],
+        priority: int = 0,
+        timeout: float = 0.0,
+        progress_callback: Optional[ProgressSink] = None,
+        done_callback: Optional[Callable[["Job"], None]] = None,
+        result_callback: Optional[Callable[[str, dict], None]] = None,
+    ):
+        self.id = next(Job.ids)
+        self.play = play
+        self.targets = list(targets)
+        self.priority = priority
+        self.timeout = timeout
+        self.progress_callback = progress_callback
+        self.done_callback = done_callback
+        self.result_callback = result_callback
+        # host and group names this job locks, filled in by the scheduler
+        self.keys: Set[str] = set()
+        # queued, running, finished, failed, cancelled or timed_out
+        self.state = "queued"
+        # ansible_runner's status once the run is over
+        self.status = ""
+        self.error: Optional[BaseException] = None
+        self.cancel_requested = False
+        self.timed_out = False
+        self.submitted = time.monotonic()
+        self.started = 0.0
+        self.ended = 0.0
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id} {self.state} {self.targets}>"
+
+    @property
+    def wait_time(self) -> float:
+        return (self.started or time.monotonic()) - self.submitted
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def should_cancel(self) -> bool:
+        """Polled by ansible_runner as its cancel_callback while the play runs."""
+        if self.cancel_requested:
+            return True
+        if self.timeout and time.monotonic() - self.started > self.timeout:
+            self.timed_out = True
+            return True
+        return False
+
+
+def run_job(job: Job):
+    """Run a job's play with anvilrun, batching its console output."""
+    from .ansible import anvilrun
+
+    progress_callback = job.progress_callback or (lambda message: None)
+    with MessageBatcher(progress_callback) as batcher:
+        result = anvilrun(job.play, batcher, cancel_callback=job.should_cancel, result_callback=job.result_callback)
+    job.status = getattr(result, "status", "")
+
+
+class RunScheduler:
+    """Queue plays and run them without letting two touch the same host at once.
+
+    Jobs start in priority order (higher first, then first come first served),
+    up to max_concurrent at a time. A job only starts once none of its hosts or
+    groups are locked by a running job, or wanted by a more urgent job that is
+    still waiting, so a busy host cannot starve an earlier request for it.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        resolve: Optional[Callable[[str], Iterable[str]]] = None,
+        on_change: Optional[Callable[[dict], None]] = None,
+        runner: Callable[[Job], None] = run_job,
+    ):
+        """
+        Keyword Arguments:
+            max_concurrent -- Plays allowed to run at the same time (default: {2})
+            resolve -- Expands a target to the host and group names to lock, e.g. a group to its hosts
+                (default: {the target only})
+            on_change -- Called with stats() whenever a job is queued, starts or ends, from any thread (default: {None})
+            runner -- Runs a job in its worker thread (default: {run_job})
+        """
+        self.max_concurrent = max_concurrent
+        self.resolve = resolve or (lambda target: [target])
+        self.on_change = on_change
+        self.runner = runner
+        self.queue: List[Tuple[int, int, Job]] = []
+        self.running: Dict[int, Job] = {}
+        self.busy: Set[str] = set()
+        self.lock = threading.Lock()
+        # wait times of recently started jobs
+        self.waits: Deque[float] = deque(maxlen=100)
+
+    def submit(
+        self,
+        play: PlayBuilder,
+        targets: Optional[Iterable[str]] = None,
+        priority: int = 0,
+        timeout: float = 0.0,
+        progress_callback: Optional[ProgressSink] = None,
+        done_callback: Optional[Callable[[Job], None]] = None,
+        result_callback: Optional[Callable[[str, dict], None]] = None,
+    ) -> Job:
+        """Queue a play.
+
+        Arguments:
+            play -- The play to run
+
+        Keyword Arguments:
+            targets -- Hosts and groups the play touches (default: {the play's hosts or host pattern})
+            priority -- Higher runs sooner (default: {0})
+            timeout -- Seconds the play may run before it is cancelled, 0 for no limit (default: {0.0})
+            progress_callback -- Receives console output batches (default: {None})
+            done_callback -- Called with the job when it ends, from the job's thread (default: {None})
+            result_callback -- Called with each per-host task result event, see anvilrun (default: {None})
+
+        Returns:
+            Job -- Can be cancelled while queued or running
+        """
+        if targets is None:
+            targets = list(play.hosts) or [play.host_pattern]
+        job = Job(play, targets, priority, timeout, progress_callback, done_callback, result_callback)
+        for target in job.targets:
+            job.keys.add(target)
+            job.keys.update(self.resolve(target))
+        with self.lock:
+            heapq.heappush(self.queue, (-priority, job.id, job))
+        self.dispatch()
+        return job
+
+    def cancel(self, job: Job):
+        """Cancel a job. A queued job never starts, a running one is stopped by ansible_runner."""
+        job.cancel()
+        with self.lock:
+            was_queued = job.state == "queued"
+            if was_queued:
+                job.state = "cancelled"
+                self.queue = [entry for entry in self.queue if entry[2] is not job]
+                heapq.heapify(self.queue)
+        if was_queued:
+            job.play.cleanup()
+            self.notify()
+            if job.done_callback is not None:
+                job.done_callback(job)
+
+    def cancel_all(self):
+        with self.lock:
+            jobs = [entry[2] for entry in self.queue] + list(self.running.values())
+        for job in jobs:
+            self.cancel(job)
+
+    def dispatch(self):
+        """Start every queued job whose targets are free, up to the concurrency cap."""
+        started = []
+        with self.lock:
+            reserved = set(self.busy)
+            waiting = []
+            while self.queue and len(self.running) < self.max_concurrent:
+                entry = heapq.heappop(self.queue)
+                job = entry[2]
+                if job.keys & reserved:
+                    waiting.append(entry)
+                else:
+                    job.state = "running"
+                    job.started = time.monotonic()
+                    self.waits.append(job.wait_time)
+                    self.running[job.id] = job
+                    self.busy |= job.keys
+                    started.append(job)
+                # later jobs may not overtake this one on the same targets
+                reserved |= job.keys
+            for entry in waiting:
+                heapq.heappush(self.queue, entry)
+
+        for job in started:
+            threading.Thread(target=self.execute, args=(job,), name=f"anvil-job-{job.id}", daemon=True).start()
+        self.notify()
+
+    def execute(self, job: Job):
+        try:
+            self.runner(job)
+            if job.timed_out:
+                job.state = "timed_out"
+            elif job.cancel_requested:
+                job.state = "cancelled"
+            else:
+                job.state = "finished"
+        except Exception as e:
+            job.error = e
+            job.state = "failed"
+            log.exception("Job %s failed", job.id)
+            if job.progress_callback is not None:
+                try:
+                    message = {"text": f"Run failed: {e}\n", "color": "red", "charformat": "text"}
+                    sink_function(job.progress_callback)([message])
+                except Exception:
+                    log.exception("Could not report the failure of job %s", job.id)
+        finally:
+            job.ended = time.monotonic()
+            job.play.cleanup()
+            with self.lock:
+                self.running.pop(job.id, None)
+                self.busy -= job.keys
+            if job.done_callback is not None:
+                job.done_callback(job)
+            self.dispatch()
+
+    def stats(self) -> dict:
+        """Get the queue depth, running jobs and wait times in seconds."""
+        with self.lock:
+            now = time.monotonic()
+            return {
+                "queued": len(self.queue),
+                "running": len(self.running),
+                "max_concurrent": self.max_concurrent,
+                # over the last 100 jobs to start
+                "average_wait": sum(self.waits) / len(self.waits) if self.waits else 0.0,
+                # of the job that has been queued longest
+                "oldest_wait": max((now - entry[2].submitted for entry in self.queue), default=0.0),
+            }
+
+    def notify(self):
+        if self.on_change is not None:
+            self.on_change(self.stats())
@@ -0,0 +1,498 @@
+"""
+This module contains a warm Ansible process that runs plays for anvilrun.
+
+Every ansible_runner.run call starts a new ansible-playbook process, which
+imports Ansible, loads its plugins and parses the inventory before the first
+event. The server does that once. It imports Ansible up front, keeps parsed
+inventories in memory, and forks a child for each play. The child inherits all
+of that, runs the same command line ansible_runner would have run, and streams
+its output back over a socket.
+
+The client side prepares the run with ansible_runner (same command, env,
+artifacts and callback plugin) and feeds the output through ansible_runner's own
+OutputEventFilter, so event handlers cannot tell the difference. Runs that need more of
+Runner.run than that, such as answering password prompts or timeouts, are left
+to ansible_runner.
+
+WarmServer starts the server as ``python -m anvil.ansible.server FD``, where FD
+is the server's end of a socket pair. Each run sends the server one end of a
+new socket pair over it, so the server cannot be reached through the
+filesystem and only the process that started it can submit runs.
+"""
+
+import atexit
+import codecs
+import json
+import os
+import select
+import signal
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import threading
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+# length prefix of every message
+HEADER = struct.Struct("!I")
+# modules imported before the first run, the bulk of ansible-playbook's start-up
+WARM_MODULES = [
+    "ansible.cli.playbook",
+    "ansible.cli.adhoc",
+    "ansible.executor.playbook_executor",
+    "ansible.executor.task_executor",
+    "ansible.executor.process.worker",
+    "ansible.inventory.manager",
+    "ansible.vars.manager",
+    "ansible.playbook",
+    "ansible.template",
+    "ansible.plugins.action.normal",
+    "ansible.plugins.action.command",
+    "ansible.plugins.action.copy",
+    "ansible.plugins.action.fetch",
+    "ansible.plugins.connection.local",
+    "ansible.plugins.connection.ssh",
+    "ansible.plugins.strategy.linear",
+    "ansible.plugins.callback.default",
+    "ansible.plugins.inventory.yaml",
+    "ansible.plugins.inventory.ini",
+]
+
+
+def send_message(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return b""
+        data += chunk
+    return data
+
+
+def recv_message(sock: socket.socket) -> Optional[dict]:
+    """Read one message, or None once the other side has closed the socket."""
+    header = recv_exactly(sock, HEADER.size)
+    if not header:
+        return None
+    return json.loads(recv_exactly(sock, HEADER.unpack(header)[0]))
+
+
+# Server side
+
+
+def inventory_sources(argv: List[str]) -> List[str]:
+    sources = []
+    for index, arg in enumerate(argv[:-1]):
+        if arg in ("-i", "--inventory", "--inventory-file"):
+            sources.append(argv[index + 1])
+    return sources
+
+
+def sources_signature(sources: List[str]) -> Tuple:
+    """mtime and size of every file below the inventory sources."""
+    signature = []
+    for source in sources:
+        for root, _, files in os.walk(source) if os.path.isdir(source) else [("", [], [source])]:
+            for name in files:
+                try:
+                    file_stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                signature.append((root, name, file_stat.st_mtime_ns, file_stat.st_size))
+    return tuple(sorted(signature))
+
+
+class Server:
+    def __init__(self, control: socket.socket):
+        # closes when the anvil process exits
+        self.control = control
+        # tuple of sources -> (signature, InventoryManager)
+        self.inventories: Dict[Tuple[str, ...], Tuple[Tuple, Any]] = {}
+        # child pid -> [client socket, or None once it went away, output pipe, decoder]
+        self.children: Dict[int, list] = {}
+
+    def warm_up(self):
+        import importlib
+
+        for module in WARM_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception:
+                print(f"anvil server: could not preload {module}", file=sys.stderr)
+
+    def inventory(self, argv: List[str]):
+        """Parse the run's inventory, or reuse the copy parsed for an earlier run."""
+        from ansible.inventory.manager import InventoryManager
+        from ansible.parsing.dataloader import DataLoader
+
+        sources = tuple(inventory_sources(argv))
+        if not sources:
+            return None
+        signature = sources_signature(list(sources))
+        cached = self.inventories.get(sources)
+        if cached is None or cached[0] != signature:
+            cached = (signature, InventoryManager(loader=DataLoader(), sources=list(sources)))
+            self.inventories[sources] = cached
+        return cached[1]
+
+    def serve(self):
+        self.warm_up()
+        # the client waits for this line before sending runs
+        print("ready", flush=True)
+
+        while True:
+            clients = [child[0] for child in self.children.values() if child[0] is not None]
+            readers = [self.control] + clients + [child[1] for child in self.children.values()]
+            ready, _, _ = select.select(readers, [], [])
+            for item in ready:
+                if item is self.control:
+                    # every run arrives as a socket passed over the control socket
+                    message, fds, _, _ = socket.recv_fds(self.control, 1, 1)
+                    if not message:
+                        return
+                    for fd in fds:
+                        self.start(socket.socket(fileno=fd))
+                else:
+                    self.handle(item)
+
+    def handle(self, item):
+        for pid, (client, pipe, decoder) in list(self.children.items()):
+            if item is client:
+                # the only thing a client sends mid-run is a cancel, or it went away
+                message = recv_message(client)
+                if message is None:
+                    # a closed socket stays readable, the child's output is drained without it
+                    client.close()
+                    self.children[pid][0] = None
+                if message is None or message.get("cancel"):
+                    self.kill(pid)
+            elif item == pipe:
+                self.relay(pid, client, pipe, decoder)
+
+    def start(self, client: socket.socket):
+        request = recv_message(client)
+        if request is None:
+            client.close()
+            return
+        try:
+            inventory = self.inventory(request["argv"])
+        except Exception:
+            # let ansible report inventory errors in the child as usual
+            inventory = None
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            # the child only needs its own output pipe
+            self.control.close()
+            for other_client, other_pipe, _ in self.children.values():
+                if other_client is not None:
+                    other_client.close()
+                os.close(other_pipe)
+            client.close()
+            run_child(request, write_fd, inventory)
+        os.close(write_fd)
+        self.children[pid] = [client, read_fd, codecs.getincrementaldecoder("utf-8")("replace")]
+
+    def relay(self, pid: int, client: socket.socket, pipe: int, decoder):
+        data = os.read(pipe, 65536)
+        if data and client is None:
+            return
+        try:
+            if data:
+                send_message(client, {"output": decoder.decode(data)})
+                return
+            _, status = os.waitpid(pid, 0)
+            if client is not None:
+                message = {"output": decoder.decode(b"", final=True), "rc": os.waitstatus_to_exitcode(status)}
+                send_message(client, message)
+        except OSError:
+            # the client went away, the child is finished either way
+            pass
+        if not data:
+            os.close(pipe)
+            if client is not None:
+                client.close()
+            del self.children[pid]
+
+    def kill(self, pid: int):
+        try:
+            os.killpg(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            # the child has not called setsid yet, so its group does not exist
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def run_child(request: dict, write_fd: int, inventory):
+    """Run one ansible command in a forked child. Never returns."""
+    rc = 250
+    try:
+        os.setsid()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # nothing answers prompts, warm_run leaves runs that expect them to ansible_runner
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+        os.close(write_fd)
+        os.environ.clear()
+        os.environ.update(request["env"])
+        os.chdir(request["cwd"])
+
+        argv = request["argv"]
+        if inventory is not None:
+            import ansible.cli
+
+            sources = inventory_sources(argv)
+            inventory_manager = ansible.cli.InventoryManager
+
+            def cached_inventory(loader, sources=sources, cache=True, **kwargs):
+                if list(sources) == inventory_sources(argv):
+                    return inventory
+                return inventory_manager(loader=loader, sources=sources, cache=cache, **kwargs)
+
+            ansible.cli.InventoryManager = cached_inventory
+
+        sys.argv = argv
+        command = os.path.basename(argv[0])
+        if command not in ("ansible-playbook", "ansible"):
+            os.execvpe(argv[0], argv, request["env"])
+        if command == "ansible-playbook":
+            from ansible.cli.playbook import main as cli_main
+        else:
+            from ansible.cli.adhoc import main as cli_main
+        cli_main(argv)
+        rc = 0
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(rc)
+
+
+# Client side
+
+# set per run by ansible_runner, and only read by plugins, which look at the environment when loaded
+PER_RUN = {"ANSIBLE_CACHE_PLUGIN_CONNECTION"}
+
+
+class WarmServer:
+    """A server process and the settings it was started with."""
+
+    def __init__(self, cwd: str, env: Dict[str, str]):
+        self.control, server_end = socket.socketpair()
+        # runs from several job threads share the control socket
+        self.lock = threading.Lock()
+        self.cwd = cwd
+        # ansible reads its configuration once at import, so the server is only
+        # reused for runs with the same ANSIBLE_* settings and working directory
+        self.settings = settings(cwd, env)
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "anvil.ansible.server", str(server_end.fileno())],
+                cwd=cwd,
+                env={**os.environ, **env},
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                text=True,
+                pass_fds=(server_end.fileno(),),
+            )
+        except OSError:
+            self.control.close()
+            raise
+        finally:
+            server_end.close()
+        if self.process.stdout.readline().strip() != "ready":
+            self.process.wait()
+            self.control.close()
+            raise RuntimeError("the ansible server did not start")
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self):
+        if self.alive():
+            self.process.terminate()
+            self.process.wait()
+        self.control.close()
+
+    def connect(self) -> socket.socket:
+        """Get a socket to the server for one run."""
+        sock, server_end = socket.socketpair()
+        try:
+            with self.lock:
+                socket.send_fds(self.control, [b"r"], [server_end.fileno()])
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            server_end.close()
+        return sock
+
+    def execute(self, runner):
+        """Run a prepared ansible_runner Runner through the server, like Runner.run would."""
+        from ansible_runner.utils import OutputEventFilter, cleanup_artifact_dir
+
+        config = runner.config
+        os.makedirs(os.path.join(config.artifact_dir, "job_events"), mode=0o700, exist_ok=True)
+        command = {"command": config.command, "cwd": config.cwd, "env": config.env}
+        write_artifact(config.artifact_dir, "command", json.dumps(command, ensure_ascii=False))
+        if config.ident is not None:
+            cleanup_artifact_dir(os.path.join(config.artifact_dir, ".."), config.rotate_artifacts)
+        stdout_file = None
+        if not config.suppress_output_file:
+            stdout_file = codecs.open(os.path.join(config.artifact_dir, "stdout"), "w", encoding="utf-8")
+        output = OutputEventFilter(
+            stdout_file,
+            runner.event_callback,
+            getattr(config, "suppress_ansible_output", False),
+            output_json=config.json_mode,
+        )
+
+        runner.status_callback("starting")
+        rc = 255
+        with self.connect() as sock:
+            send_message(sock, {"argv": config.command, "env": config.env, "cwd": config.cwd})
+            runner.status_callback("running")
+            while True:
+                ready, _, _ = select.select([sock], [], [], 0.25)
+                if runner.cancel_callback is not None and not runner.canceled and runner.cancel_callback():
+                    runner.canceled = True
+                    send_message(sock, {"cancel": True})
+                if not ready:
+                    continue
+                message = recv_message(sock)
+                if message is None:
+                    break
+                output.write(message["output"])
+                if "rc" in message:
+                    rc = message["rc"]
+                    break
+        output.close()
+
+        # as Runner.run reports a cancelled run
+        runner.rc = 254 if runner.canceled else rc
+        if runner.canceled:
+            status = "canceled"
+        elif rc == 0:
+            status = "successful"
+        else:
+            status = "failed"
+        runner.status_callback(status)
+        write_artifact(config.artifact_dir, "status", runner.status)
+        write_artifact(config.artifact_dir, "rc", str(runner.rc))
+        return runner
+
+
+def write_artifact(artifact_dir: str, name: str, text: str):
+    """Write a file to the run's artifact directory, readable by this user only."""
+    fd = os.open(os.path.join(artifact_dir, name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.S_IRUSR | stat.S_IWUSR)
+    with open(fd, "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+def needs_runner(config) -> bool:
+    """Whether a run uses parts of Runner.run the server does not reproduce.
+
+    Those are answering password prompts, job and idle timeouts, containers and
+    process or directory isolation.
+    """
+    import pexpect
+
+    expect_passwords = getattr(config, "expect_passwords", None) or {}
+    prompts = [key for key in expect_passwords if key not in (pexpect.TIMEOUT, pexpect.EOF)]
+    return bool(
+        prompts
+        or getattr(config, "job_timeout", None)
+        or getattr(config, "idle_timeout", None)
+        or getattr(config, "containerized", False)
+        or getattr(config, "process_isolation", False)
+        or getattr(config, "directory_isolation_path", None)
+    )
+
+
+def settings(cwd: str, env: Dict[str, str]) -> Tuple:
+    ansible_env = ((key, value) for key, value in env.items() if key.startswith("ANSIBLE_") and key not in PER_RUN)
+    return (cwd, tuple(sorted(ansible_env)))
+
+
+servers: Dict[Tuple, WarmServer] = {}
+servers_lock = threading.Lock()
+# set when this interpreter cannot import ansible, runs then fall back to ansible_runner.run
+unavailable = False
+
+
+def get_server(cwd: str, env: Dict[str, str]) -> Optional[WarmServer]:
+    """Get a running server for these settings, starting one if needed."""
+    global unavailable
+    key = settings(cwd, env)
+    with servers_lock:
+        if unavailable:
+            return None
+        server = servers.get(key)
+        if server is not None and server.alive():
+            return server
+        try:
+            server = WarmServer(cwd, env)
+        except (OSError, RuntimeError):
+            unavailable = True
+            return None
+        if not servers:
+            atexit.register(stop_servers)
+        servers[key] = server
+        return server
+
+
+def stop_servers():
+    with servers_lock:
+        for server in servers.values():
+            server.stop()
+        servers.clear()
+
+
+def warm_run(**run_args):
+    """Like ansible_runner.run, but through a warm server when one can be used.
+
+    Keyword Arguments:
+        The arguments of ansible_runner.run
+
+    Returns:
+        Runner -- As ansible_runner.run
+    """
+    from ansible_runner.interface import init_runner
+
+    runner = init_runner(**run_args)
+    config = runner.config
+    server = None if needs_runner(config) else get_server(config.cwd, config.env)
+    if server is None:
+        runner.run()
+        return runner
+    return server.execute(runner)
+
+
+def main(fd: int):
+    try:
+        import ansible  # noqa: F401
+    except ImportError:
+        print("ansible is not importable from this interpreter", file=sys.stderr)
+        sys.exit(1)
+    Server(socket.socket(fileno=fd)).serve()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]))
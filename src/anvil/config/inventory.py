@@ -1,7 +1,11 @@
+import atexit
 import os
-from typing import Any, Dict, List
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Set, Tuple
 
-from anvil.helpers import datautils, filemanager, yamlmanager
+from anvil.helpers import datautils, filemanager, snapshot, yamlmanager
 
 
 class Inventory:
@@ -28,16 +32,96 @@ class Inventory:
         "ansible_python_interpreter": "",
         "ansible_shell_executable": "",
     }
+    # read-only view shared by every Variables mapping
+    DEFAULTS = MappingProxyType(VARS)
+
+    class Variables(MutableMapping):
+        """Sparse variable mapping on top of the shared Inventory.DEFAULTS table.
+
+        Only values that differ from their default are stored, and the storage
+        is not allocated until the first write. Keys changed since the last
+        save are recorded in `dirty`. Deleting a key restores its default.
+        """
+
+        __slots__ = ("overlay", "dirty")
+        # shared by every clean mapping so it costs nothing per object
+        NO_KEYS: frozenset = frozenset()
+
+        def __init__(self, data: Dict[str, Any] | None = None):
+            self.overlay: Dict[str, Any] | None = None
+            self.dirty: Set[str] | frozenset = Inventory.Variables.NO_KEYS
+            if data:
+                self.update(data)
+
+        def __getitem__(self, key):
+            if self.overlay is not None and key in self.overlay:
+                return self.overlay[key]
+            return Inventory.DEFAULTS[key]
+
+        def __setitem__(self, key, value):
+            if key in self and self[key] == value:
+                return
+            if self.overlay is None:
+                self.overlay = {}
+            if key in Inventory.DEFAULTS and Inventory.DEFAULTS[key] == value:
+                self.overlay.pop(key, None)
+            else:
+                self.overlay[key] = value
+            self.mark(key)
+
+        def __delitem__(self, key):
+            if key not in self:
+                raise KeyError(key)
+            if self.overlay is not None and key in self.overlay:
+                del self.overlay[key]
+                self.mark(key)
+
+        def __iter__(self) -> Iterator[str]:
+            yield from Inventory.DEFAULTS
+            if self.overlay:
+                for key in self.overlay:
+                    if key not in Inventory.DEFAULTS:
+                        yield key
+
+        def __len__(self) -> int:
+            extra = 0
+            if self.overlay:
+                extra = sum(1 for key in self.overlay if key not in Inventory.DEFAULTS)
+            return len(Inventory.DEFAULTS) + extra
+
+        def __contains__(self, key) -> bool:
+            return key in Inventory.DEFAULTS or (self.overlay is not None and key in self.overlay)
+
+        def mark(self, key: str):
+            if not self.dirty:
+                self.dirty = set()
+            self.dirty.add(key)
+
+        def clean(self):
+            self.dirty = Inventory.Variables.NO_KEYS
+
+        def __repr__(self) -> str:
+            return repr(dict(self))
 
     class Host:
+        __slots__ = ("name", "vars", "storage_dir", "configkey", "member_of", "dirty")
         empty = {"ansible_host": ""}
 
         def __init__(self, name: str):
             self.name = name
-            self.vars = Inventory.VARS.copy()
+            self.vars = Inventory.Variables()
             self.storage_dir: str = ""
             self.configkey: str = ""
-            self.member_of: List[Inventory.Group] = []
+            self.member_of: Dict[str, Inventory.Group] = {}
+            # new hosts have never been written
+            self.dirty = True
+
+        def is_dirty(self) -> bool:
+            return self.dirty or bool(self.vars.dirty)
+
+        def clean(self):
+            self.dirty = False
+            self.vars.clean()
 
         def to_dict(self):
             data = {}
@@ -53,6 +137,7 @@ class Inventory:
             return self.name
 
     class Group:
+        __slots__ = ("name", "storage_dir", "configkey", "children", "hosts", "vars", "dirty", "dirty_hosts")
         empty = {"hosts": {}, "vars": {}}
 
         def __init__(self, name: str):
@@ -60,21 +145,47 @@ class Inventory:
             self.storage_dir: str = ""
             self.configkey: str = ""
             self.children: List[Inventory.Group] = []
-            self.hosts: List[Inventory.Host] = []
-            self.vars = Inventory.VARS.copy()
+            self.hosts: Dict[str, Inventory.Host] = {}
+            self.vars = Inventory.Variables()
+            # new groups have never been written
+            self.dirty = True
+            # names of members added or removed since the last save
+            self.dirty_hosts: Set[str] = set()
+
+        def is_dirty(self) -> bool:
+            return self.dirty or bool(self.vars.dirty) or bool(self.dirty_hosts)
+
+        def clean(self):
+            self.dirty = False
+            self.vars.clean()
+            self.dirty_hosts = set()
 
         def get_host(self, host_name: str):
-            for host in self.hosts:
-                if host.name == host_name:
-                    return host
-            return None
+            return self.hosts.get(host_name)
 
         def add_host(self, host):
-            if host not in self.hosts:
-                self.hosts.append(host)
-
-                if self not in host.member_of:
-                    host.member_of.append(self)
+            if host.name not in self.hosts:
+                self.hosts[host.name] = host
+                host.member_of[self.name] = self
+                self.dirty_hosts.add(host.name)
+
+        def remove_host(self, host):
+            self.hosts.pop(host.name, None)
+            host.member_of.pop(self.name, None)
+            self.dirty_hosts.add(host.name)
+
+        def host_entry(self, host) -> Dict[str, Any]:
+            """The value stored under the host's key in this group's hosts."""
+            if self.name != "all":
+                # freeipa_clients:
+                #   hosts:
+                #     server_one:
+                return {}
+            # all:
+            #   hosts:
+            #     server_one:
+            #       ansible_host: 0.0.0.0
+            return host.to_dict()[host.name]
 
         def to_dict(self):
             hosts_data: Dict[str, Any] = {}
@@ -85,19 +196,8 @@ class Inventory:
                 "vars": vars_data,
             }
 
-            for host in self.hosts:
-                if self.name != "all":
-                    # freeipa_clients:
-                    #   hosts:
-                    #     server_one:
-                    # hosts_data.append({host.name: {}})
-                    hosts_data[host.name] = {}
-                else:
-                    # all:
-                    #   hosts:
-                    #     server_one:
-                    #       ansible_host: 0.0.0.0
-                    hosts_data.update(host.to_dict())
+            for host in self.hosts.values():
+                hosts_data[host.name] = self.host_entry(host)
 
             for key, val in self.vars.items():
                 if val:
@@ -108,41 +208,237 @@ class Inventory:
         def __repr__(self) -> str:
             return self.name
 
-    def __init__(self, path: str, project_dir: str):
+    def __init__(self, path: str, project_dir: str, snapshot_path: str = ""):
         self.path = path
         self.project_dir = project_dir
-        self.hosts: List[Inventory.Host] = []
-        self.host_names: List[str] = []
-        self.groups: List[Inventory.Group] = []
-        self.group_names: List[str] = []
+        # binary cache of the parsed inventory, disabled when empty
+        self.snapshot_path = snapshot_path
+        # set when the snapshot is behind the model, see flush_snapshot()
+        self.snapshot_stale = False
+        self.flush_registered = False
+        # file signature as of the last parse or write, see reload()
+        self.loaded_signature: Tuple[int, ...] = ()
+        self.hosts_dir = os.path.join(project_dir, "files", "hosts")
+        self.groups_dir = os.path.join(project_dir, "files", "groups")
+        self.hosts: Dict[str, Inventory.Host] = {}
+        self.groups: Dict[str, Inventory.Group] = {}
+        # parsed inventory file, patched in place by commit()
+        self.document: Dict[str, Any] = {}
+        # serialized yaml of the document, see render(). Per group: whether its
+        # hosts are nested, and its opening lines. Per group and host: the host's lines.
+        self.group_text: Dict[str, Tuple[bool, str]] = {}
+        self.host_text: Dict[str, Dict[str, str]] = {}
+        # unit of work, flushed by commit()
+        self.transaction_depth = 0
+        self.pending_hosts: Dict[str, Inventory.Host] = {}
+        self.pending_groups: Dict[str, Inventory.Group] = {}
+        self.pending_moves: List[Tuple[str, str]] = []
+        self.pending_renames: List[Tuple[str, str]] = []
+
+    @property
+    def host_names(self) -> List[str]:
+        return list(self.hosts)
+
+    @property
+    def group_names(self) -> List[str]:
+        return list(self.groups)
+
+    def setup(self, materialize: bool = True):
+        """Load the inventory from its snapshot, or parse the inventory file.
+
+        Keyword Arguments:
+            materialize -- Create missing storage directories for every host and
+            group in one pass. Read-only sessions can skip it. (default: {True})
+        """
+        if not self.load_snapshot():
+            self.parse()
+            self.save_snapshot()
+        self.loaded_signature = yamlmanager.file_signature(self.path)
+
+        if materialize:
+            self.materialize_storage()
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path:
+            return False
+        cached = snapshot.load(self.snapshot_path, self.path)
+        if cached is None:
+            return False
+        self.document, self.hosts, self.groups = cached
+        self.forget_text()
+        return True
+
+    def save_snapshot(self, background: bool = True):
+        if self.snapshot_path:
+            snapshot.save(self.snapshot_path, self.path, (self.document, self.hosts, self.groups), background)
+        self.snapshot_stale = False
+
+    def mark_snapshot_stale(self):
+        """Defer the snapshot rewrite after a change to flush_snapshot() or exit.
+
+        Pickling the whole inventory costs about as much as a full save, so
+        it is not done on every commit. A snapshot that is out of date is
+        rejected by its signature check, never loaded.
+        """
+        if not self.snapshot_path:
+            return
+        self.snapshot_stale = True
+        if not self.flush_registered:
+            atexit.register(self.flush_snapshot)
+            self.flush_registered = True
+
+    def flush_snapshot(self):
+        """Rewrite the snapshot if changes were made since it was written.
+
+        The file is written before returning, this also runs at exit.
+        """
+        if self.snapshot_stale and not self.transaction_depth:
+            self.save_snapshot(background=False)
 
-    def setup(self):
+    def parse(self, data: Dict[str, Any] | None = None):
+        """Build the hosts and groups from the inventory file.
+
+        Keyword Arguments:
+            data -- The document, if it was already loaded. (default: {None})
+        """
         default = {"all": {"hosts": {}}}
-        data = yamlmanager.read(self.path)
+        if data is None:
+            data = yamlmanager.read(self.path)
         if data is None:
             yamlmanager.write(self.path, default)
             return
 
-        data, _ = datautils.fix_dict(default, data)
+        data, valid = datautils.fix_dict(default, data)
+        self.document = data
+        self.forget_text()
 
         # parse the groups
         for group_name, group_data in data.items():
             group, _ = self.add_group(group_name)
-            group_data, _ = datautils.fix_dict(self.Group.empty, group_data)
-
-            for key, value in group_data.items():
-                # group variables
-                if key == "vars":
-                    for varkey, varval in value.items():
-                        group.vars[varkey] = varval
-
-                # group members
-                if key == "hosts":
-                    for host_name, host_data in value.items():
-                        host, was_created = self.add_host(host_name)
-                        if was_created:
-                            host.vars, _ = datautils.fix_dict(self.Host.empty, host_data)
-                        group.add_host(host)
+            if not isinstance(group_data, dict):
+                group_data = {}
+
+            # group variables
+            group.vars.update(group_data.get("vars") or {})
+
+            # group members
+            for host_name, host_data in (group_data.get("hosts") or {}).items():
+                host, was_created = self.add_host(host_name)
+                if was_created:
+                    host_data = dict(host_data) if isinstance(host_data, dict) else {}
+                    host_vars, _ = datautils.fix_dict(self.Host.empty, host_data)
+                    host.vars.update(host_vars)
+                group.add_host(host)
+
+        # everything parsed so far matches the file
+        for host in self.hosts.values():
+            host.clean()
+        for group in self.groups.values():
+            group.clean()
+        # a missing "all" group still has to be written out
+        if not valid:
+            self.groups["all"].dirty = True
+
+    def reload(self) -> Dict[str, List[str]]:
+        """Re-read the inventory file after another program changed it.
+
+        The live Host and Group objects are updated in place, so references
+        held elsewhere stay valid. Nothing happens while a transaction is open
+        or when the file is unchanged since it was last read or written.
+
+        Returns:
+            dict -- Names under "hosts_added", "hosts_removed", "hosts_changed",
+            "groups_added", "groups_removed" and "groups_changed"
+        """
+        changes: Dict[str, List[str]] = {
+            "hosts_added": [],
+            "hosts_removed": [],
+            "hosts_changed": [],
+            "groups_added": [],
+            "groups_removed": [],
+            "groups_changed": [],
+        }
+        if self.transaction_depth:
+            return changes
+        try:
+            signature = yamlmanager.file_signature(self.path)
+        except OSError:
+            return changes
+        if signature == self.loaded_signature:
+            return changes
+
+        # a half written file or one with conflict markers keeps the current model
+        try:
+            data = yamlmanager.copy_document(yamlmanager.cached_load(self.path) or {})
+        except Exception as e:
+            print(f"Keeping the loaded inventory, {self.path} could not be read: {e}")
+            return changes
+
+        fresh = Inventory(self.path, self.project_dir)
+        fresh.parse(data)
+
+        for name in list(self.groups):
+            if name not in fresh.groups:
+                group = self.groups.pop(name)
+                for host in group.hosts.values():
+                    host.member_of.pop(name, None)
+                changes["groups_removed"].append(name)
+        for name in list(self.hosts):
+            if name not in fresh.hosts:
+                host = self.hosts.pop(name)
+                for group in host.member_of.values():
+                    group.hosts.pop(name, None)
+                changes["hosts_removed"].append(name)
+
+        # groups first, add_host() needs the "all" group
+        for name, fresh_group in fresh.groups.items():
+            group, was_created = self.add_group(name)
+            if was_created:
+                changes["groups_added"].append(name)
+            elif dict(group.vars) != dict(fresh_group.vars) or group.hosts.keys() != fresh_group.hosts.keys():
+                changes["groups_changed"].append(name)
+            group.vars = fresh_group.vars
+
+        for name, fresh_host in fresh.hosts.items():
+            host = self.hosts.get(name)
+            if host is None:
+                host, _ = self.add_host(name)
+                changes["hosts_added"].append(name)
+            elif dict(host.vars) != dict(fresh_host.vars):
+                changes["hosts_changed"].append(name)
+            host.vars = fresh_host.vars
+
+        for name, fresh_group in fresh.groups.items():
+            group = self.groups[name]
+            for host in list(group.hosts.values()):
+                if host.name not in fresh_group.hosts:
+                    group.remove_host(host)
+            for host_name in fresh_group.hosts:
+                group.add_host(self.hosts[host_name])
+
+        self.document = fresh.document
+        self.forget_text()
+        for host in self.hosts.values():
+            host.clean()
+        for group in self.groups.values():
+            group.clean()
+        self.loaded_signature = signature
+        self.mark_snapshot_stale()
+        return changes
+
+    def materialize_storage(self):
+        """Create the missing storage directories of all hosts and groups.
+
+        Each parent directory is listed once, so this costs two directory
+        scans plus one mkdir per missing entry.
+        """
+        filemanager.sync_dirs(self.hosts_dir, [host.configkey for host in self.hosts.values()])
+        filemanager.sync_dirs(self.groups_dir, [group.configkey for group in self.groups.values()])
+
+    def ensure_storage(self, item: Host | Group) -> str:
+        """Create the storage directory of a single host or group on first use."""
+        filemanager.check_dir(item.storage_dir, create=True)
+        return item.storage_dir
 
     def add_host(self, host_name: str) -> tuple[Host, bool]:
         """Add a host to the inventory.
@@ -150,7 +446,8 @@ class Inventory:
         - Trys to get the host from the inventory
         - Creates a new host if it doesn't exist
         - Adds the host to the "all" group.
-        - Creates a storage directory for the host
+        - Sets the storage directory of the host, which is created
+          by materialize_storage() or ensure_storage()
 
         Arguments:
             host_name -- Name of the host to add
@@ -169,8 +466,7 @@ class Inventory:
         if host is None:
             host = self.Host(host_name)
             was_created = True
-        host.storage_dir = os.path.join(self.project_dir, "files", "hosts", host_name)
-        filemanager.check_dir(host.storage_dir, create=True)
+        host.storage_dir = os.path.join(self.hosts_dir, host_name)
         host.configkey = host_name
 
         group = self.get_group("all")
@@ -178,12 +474,7 @@ class Inventory:
             raise ReferenceError("Group 'all' not found in inventory")
 
         group.add_host(host)
-
-        if host_name not in self.host_names:
-            self.host_names.append(host_name)
-
-        if host not in self.hosts:
-            self.hosts.append(host)
+        self.hosts[host_name] = host
 
         return host, was_created
 
@@ -192,60 +483,251 @@ class Inventory:
         group = self.get_group(group_name)
         if group is None:
             group = self.Group(group_name)
-            if group not in self.groups:
-                self.groups.append(group)
-            if group_name not in self.group_names:
-                self.group_names.append(group_name)
+            self.groups[group_name] = group
             was_created = True
 
-        group.storage_dir = os.path.join(self.project_dir, "files", "groups", group_name)
-        filemanager.check_dir(group.storage_dir, create=True)
+        group.storage_dir = os.path.join(self.groups_dir, group_name)
         group.configkey = group_name
 
         return group, was_created
 
     def get_host(self, host_name: str):
-        for host in self.hosts:
-            if host.name == host_name:
-                return host
-        return None
+        return self.hosts.get(host_name)
 
     def get_group(self, group_name: str) -> Group | None:
-        for group in self.groups:
-            if group.name == group_name:
-                return group
-        return None
+        return self.groups.get(group_name)
 
     def delete_host(self, host: Host):
-        for group in host.member_of:
-            group.hosts.remove(host)
-        self.update_config()
+        with self.transaction():
+            for group in list(host.member_of.values()):
+                group.remove_host(host)
+                self.pending_groups[group.name] = group
+            self.hosts.pop(host.configkey, None)
+            self.pending_hosts.pop(host.configkey, None)
+
+    def rename_host(self, host: Host):
+        """Re-key a renamed host in the inventory and group indexes."""
+        old_name = host.configkey
+        self.hosts.pop(old_name, None)
+        self.hosts[host.name] = host
+        for group in host.member_of.values():
+            group.hosts.pop(old_name, None)
+            group.hosts[host.name] = host
+            group.dirty_hosts.update((old_name, host.name))
+
+    def rename_group(self, group: Group):
+        """Re-key a renamed group in the inventory and host indexes."""
+        old_name = group.configkey
+        self.groups.pop(old_name, None)
+        self.groups[group.name] = group
+        for host in group.hosts.values():
+            host.member_of.pop(old_name, None)
+            host.member_of[group.name] = group
+
+    @contextmanager
+    def transaction(self):
+        """Collect inventory changes and flush them in a single write.
+
+        Saves, renames and deletes made inside the block are applied to the
+        in-memory model immediately and written to the inventory file once,
+        when the outermost transaction exits. If the block raises, the pending
+        changes are discarded and the file is left untouched.
+
+        Example:
+            with inventory.transaction():
+                inventory.save_host(host)
+                inventory.save_group(group)
+        """
+        self.transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0:
+                self.rollback()
+            raise
+
+        self.transaction_depth -= 1
+        if self.transaction_depth == 0:
+            self.commit()
+
+    def commit(self):
+        """Write all pending changes to the inventory file in one atomic write.
+
+        Only hosts and groups that are dirty are serialized. Their subtrees
+        are patched into the cached document, their cached yaml is dropped,
+        and the file is rebuilt from the cached yaml of everything else, see
+        render(). If nothing is dirty, the file is not touched.
+        """
+        hosts = [host for host in self.pending_hosts.values() if host.is_dirty()]
+        groups = [group for group in self.pending_groups.values() if group.is_dirty()]
+        if not (hosts or groups or self.pending_moves or self.pending_renames):
+            self.rollback()
+            return
+
+        for old_dir, new_dir in self.pending_renames:
+            if os.path.exists(old_dir):
+                os.rename(old_dir, new_dir)
+
+        document = self.document
+        for old_key, new_key in self.pending_moves:
+            if old_key in document:
+                document[new_key] = document.pop(old_key)
+            self.forget_text(old_key)
+            self.forget_text(new_key)
+
+        for group in groups:
+            self.patch_group(group)
+        for host in hosts:
+            self.patch_host(host)
+
+        yamlmanager.dump_text(self.path, self.render())
+        self.loaded_signature = yamlmanager.file_signature(self.path)
+        self.rollback()
+        self.mark_snapshot_stale()
+
+    def rollback(self):
+        """Discard all pending changes without writing them."""
+        self.pending_hosts = {}
+        self.pending_groups = {}
+        self.pending_moves = []
+        self.pending_renames = []
+
+    def forget_text(self, group_name: str = "", host_name: str = ""):
+        """Drop cached yaml: of one host entry in a group, of a whole group, or of everything."""
+        if not group_name:
+            self.group_text = {}
+            self.host_text = {}
+        elif host_name:
+            self.host_text.get(group_name, {}).pop(host_name, None)
+        else:
+            self.group_text.pop(group_name, None)
+            self.host_text.pop(group_name, None)
+
+    def render(self) -> str:
+        """Serialize the document, reusing the cached yaml of unchanged parts.
+
+        A group with hosts is written as its key line, its other keys, and one
+        cached fragment per host entry, so a one-host change re-serializes
+        that host only. A group's missing fragments are made with one dump.
+        Groups without hosts, or with a malformed entry, are dumped whole. The
+        first render after a load serializes everything.
+
+        Returns:
+            str -- The contents of the inventory file
+        """
+        parts = []
+        for group_name, group_data in self.document.items():
+            hosts_data = group_data.get("hosts") if isinstance(group_data, dict) else None
+            nested = isinstance(hosts_data, dict) and bool(hosts_data)
+
+            cached = self.group_text.get(group_name)
+            if cached is None or cached[0] != nested:
+                if nested:
+                    rest = {key: value for key, value in group_data.items() if key != "hosts"}
+                    text = yamlmanager.key_line(group_name)
+                    if rest:
+                        text += yamlmanager.dump_fragment(rest, 2)
+                    text += yamlmanager.key_line("hosts", 2)
+                else:
+                    text = yamlmanager.dump_fragment({group_name: group_data})
+                cached = self.group_text[group_name] = (nested, text)
+            parts.append(cached[1])
+            if not nested:
+                continue
+
+            texts = self.host_text.get(group_name)
+            if not texts:
+                texts = self.host_text[group_name] = dict(zip(hosts_data, yamlmanager.dump_entries(hosts_data, 4)))
+            for host_name, host_data in hosts_data.items():
+                text = texts.get(host_name)
+                if text is None:
+                    text = texts[host_name] = yamlmanager.dump_fragment({host_name: host_data}, 4)
+                parts.append(text)
+        return "".join(parts)
+
+    def document_section(self, group_name: str, key: str) -> Dict[str, Any]:
+        """Get the "hosts" or "vars" mapping of a group in the cached document."""
+        group_data = self.document.get(group_name)
+        if not isinstance(group_data, dict):
+            group_data = self.document[group_name] = {}
+        section = group_data.get(key)
+        if not isinstance(section, dict):
+            section = group_data[key] = {}
+        return section
+
+    def patch_group(self, group: Group):
+        if group.dirty:
+            group_data = group.to_dict()[group.name]
+            if isinstance(self.document.get(group.name), dict):
+                self.document[group.name].update(group_data)
+            else:
+                self.document[group.name] = group_data
+            self.forget_text(group.name)
+            group.clean()
+            return
+
+        if group.vars.dirty:
+            self.forget_text(group.name)
+            vars_data = self.document_section(group.name, "vars")
+            for key in group.vars.dirty:
+                if group.vars.get(key):
+                    vars_data[key] = group.vars[key]
+                else:
+                    vars_data.pop(key, None)
+
+        if group.dirty_hosts:
+            hosts_data = self.document_section(group.name, "hosts")
+            for host_name in group.dirty_hosts:
+                host = group.hosts.get(host_name)
+                if host is None:
+                    hosts_data.pop(host_name, None)
+                else:
+                    hosts_data[host_name] = group.host_entry(host)
+                self.forget_text(group.name, host_name)
+
+        group.clean()
+
+    def patch_host(self, host: Host):
+        if self.hosts.get(host.name) is host:
+            hosts_data = self.document_section("all", "hosts")
+            hosts_data[host.name] = host.to_dict()[host.name]
+            self.forget_text("all", host.name)
+        host.clean()
 
     def update_config(self):
-        for host in self.hosts:
-            self.save_host(host)
-        for group in self.groups:
-            self.save_group(group)
-        # print("Inventory updated")
+        with self.transaction():
+            for host in list(self.hosts.values()):
+                self.save_host(host)
+            for group in list(self.groups.values()):
+                self.save_group(group)
 
     def save_group(self, group: Group):
-        group_data = group.to_dict()
-        if group.name != group.configkey:
-            yamlmanager.delete(self.path, group.configkey)
+        """Queue the group for saving to the inventory config file.
 
-            new_dir = group.storage_dir.replace(f"/{group.configkey}", f"/{group.name}")
-            os.rename(group.storage_dir, new_dir)
+        Outside of a transaction the change is written immediately.
 
-            group.storage_dir = new_dir
-            group.configkey = group.name
-        yamlmanager.update(self.path, group.name, group_data[group.name])
-        # print(f"save_group: {group.name}")
+        Arguments:
+            group -- Group object to save
+        """
+        with self.transaction():
+            if group.name != group.configkey:
+                self.pending_moves.append((group.configkey, group.name))
+
+                new_dir = group.storage_dir.replace(f"/{group.configkey}", f"/{group.name}")
+                self.pending_renames.append((group.storage_dir, new_dir))
+
+                self.rename_group(group)
+                group.storage_dir = new_dir
+                group.configkey = group.name
+
+            self.pending_groups[group.name] = group
 
     def save_host(self, host: Host):
-        """Save the host to the inventory config file.
+        """Queue the host for saving to the inventory config file.
 
         Host variables are saved to their host entry in the
-        all group.
+        all group. Outside of a transaction the change is written immediately.
 
         Arguments:
             host -- Host object to save
@@ -253,19 +735,21 @@ class Inventory:
         Raises:
             Exception: The "all" group is required in the inventory.
         """
-        group = self.get_group("all")
-        if group is None:
+        if self.get_group("all") is None:
             raise ReferenceError("Group 'all' not found in inventory")
-        group_data = group.to_dict()
 
-        if host.name != host.configkey:
-            yamlmanager.delete(self.path, "all")
+        with self.transaction():
+            if host.name != host.configkey:
+                new_dir = host.storage_dir.replace(f"/{host.configkey}", f"/{host.name}")
+                self.pending_renames.append((host.storage_dir, new_dir))
 
-            new_dir = host.storage_dir.replace(f"/{host.configkey}", f"/{host.name}")
-            os.rename(host.storage_dir, new_dir)
+                self.rename_host(host)
+                host.storage_dir = new_dir
+                host.configkey = host.name
 
-            host.storage_dir = new_dir
-            host.configkey = host.name
+            # a rename changes the member lists of every group the host is in
+            for group in host.member_of.values():
+                if group.dirty_hosts:
+                    self.pending_groups[group.name] = group
 
-        yamlmanager.update(self.path, "all", group_data["all"])
-        # print(f"save_host: {host.name}")
+            self.pending_hosts[host.name] = host
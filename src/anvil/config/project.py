@@ -1,6 +1,6 @@
 from os import getenv, path
 
-from anvil.helpers import filemanager
+from anvil.helpers import filemanager, manifest, snapshot
 
 from .inventory import Inventory
 
@@ -14,9 +14,24 @@ class Project:
         self.file_count = 0
         self.tree_file = path.join(self.root_dir, "tree.yaml")
         self.inventory_path = path.join(self.root_dir, "inventory/hosts")
-        self.inventory = Inventory(self.inventory_path, self.root_dir)
+        self.inventory = Inventory(self.inventory_path, self.root_dir, self.snapshot_path)
+
+    @property
+    def snapshot_path(self) -> str:
+        # machine-local, a property so it is not saved with the project in the config
+        return snapshot.snapshot_path(self.inventory_path, self.name)
+
+    def setup(self, read_only: bool = False):
+        """Create the project structure and load the inventory.
+
+        Keyword Arguments:
+            read_only -- Only load the inventory, without creating missing
+            directories and files or writing the inventory back. (default: {False})
+        """
+        if read_only:
+            self.inventory.setup(materialize=False)
+            return
 
-    def setup(self):
         dir_structure = [
             "env",
             "inventory",
@@ -45,3 +60,26 @@ class Project:
 
         self.inventory.setup()
         self.inventory.update_config()
+
+    def update_stats(self, callback=None) -> list[int]:
+        """Count the size, directories and files of the project.
+
+        Keyword Arguments:
+            callback -- Called with the running [size, dir_count, file_count]
+            while the project is walked (default: {None})
+
+        Returns:
+            list -- [size, dir_count, file_count]
+        """
+        stats = filemanager.tree(self.root_dir, callback)
+        self.size, self.dir_count, self.file_count = stats
+        return stats
+
+    def update_manifest(self) -> dict:
+        """Record every file under files/ in the tree file.
+
+        Returns:
+            dict -- Relative paths that were "added", "modified" or
+            "removed" since the last update.
+        """
+        return manifest.update(self.tree_file, path.join(self.root_dir, "files"))
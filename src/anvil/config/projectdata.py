@@ -14,57 +14,119 @@ class ProjectData:
     projects: Dict = {}
     project_list = []
     project_objs = {}
+    # name, root_dir and modified time of every project found on disk
+    project_meta: Dict[str, Dict] = {}
     selected_project = ""
 
     def __init__(self):
         pass
 
     @classmethod
-    def verify_projects(cls):
-        project_names = filemanager.get_directories(DATA_DIR)
-        for project in project_names:
-            cls.import_project(project)
+    def verify_projects(cls) -> Dict[str, str]:
+        """Discover the projects under DATA_DIR and load the selected one.
+
+        The other projects are only registered with their metadata and are
+        loaded by get_project() when they are first needed, so startup does
+        not depend on the number of projects.
+
+        Returns:
+            dict -- Error message by project name, for projects that failed.
+        """
+        changed = False
+        for entry in filemanager.get_directory_entries(DATA_DIR):
+            cls.project_meta[entry.name] = {
+                "name": entry.name,
+                "root_dir": entry.path,
+                "modified": entry.stat().st_mtime,
+            }
+            changed = cls.register_project(Project(entry.name), loaded=False) or changed
+        if changed:
+            cls.update_config()
+
+        if cls.selected_project in cls.project_meta:
+            error = cls.import_project(cls.selected_project)
+            if error:
+                return {cls.selected_project: error}
+        return {}
 
     @classmethod
-    def import_project(cls, project_name: str, create=False) -> bool:
+    def import_project(cls, project_name: str, create=False) -> str:
+        """Load a project and add it to the registry.
+
+        Arguments:
+            project_name -- Name of the project to import.
+
+        Keyword Arguments:
+            create -- Create missing project files (default: {False})
+
+        Returns:
+            str -- Why the project failed to load, or "" if it loaded.
+        """
+        try:
+            project = cls.load_project(project_name, create)
+        except (Exception, SystemExit) as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"project '{project_name}' failed to import: {error}")
+            return error
+        if project is None:
+            return "missing files"
+
+        if cls.register_project(project):
+            cls.update_config()
+        return ""
+
+    @classmethod
+    def load_project(cls, project_name: str, create=False) -> Project | None:
+        """Check and set up a project without touching the registry."""
         new_project = Project(project_name)
-        ret = True
+        if not cls.check_project(new_project, create):
+            return None
 
-        if not filemanager.check_dir(new_project.root_dir, create):
+        new_project.setup()
+        return new_project
+
+    @classmethod
+    def check_project(cls, project: Project, create=False) -> bool:
+        ret = True
+        if not filemanager.check_dir(project.root_dir, create):
             ret = False
-        if not filemanager.check_file(new_project.tree_file, create):
+        if not filemanager.check_file(project.tree_file, create):
             ret = False
 
         if not ret:
-            print(f"project '{project_name}' has missing files.")
-            return False
-
-        cls.add_project(new_project)
-        return True
+            print(f"project '{project.name}' has missing files.")
+        return ret
 
     @classmethod
-    def add_project(cls, project: Project):
-        ret = True
+    def register_project(cls, project: Project, loaded: bool = True) -> bool:
+        """Add a project to the registry.
+
+        Keyword Arguments:
+            loaded -- The project has been set up and can be handed
+            out by get_project() (default: {True})
+
+        Returns:
+            bool -- True if the saved config needs updating.
+        """
+        changed = False
         if project.name not in cls.project_list:
             cls.project_list.append(project.name)
-            ret = False
+            changed = True
 
         if project.name not in cls.projects:
             cls.projects[project.name] = configutils.class_to_dict(project)
+            changed = True
 
-            ret = False
-
-        if not ret:
-            cls.update_config()
-
-        project.setup()
-        cls.project_objs.update({project.name: project})
+        if loaded:
+            cls.project_objs.update({project.name: project})
+        return changed
 
     @classmethod
     def get_project(cls, project_name: str) -> Project:
         """Get a project by name.
 
-        If the project does not exist, a new project will be created.
+        Projects are loaded on first use. If the project does not
+        exist, a new project will be created.
 
         Arguments:
             project_name -- Name of the project to get.
@@ -72,13 +134,46 @@ class ProjectData:
         Returns:
             Project -- The project object.
         """
-        project = cls.project_objs.get(project_name, Project(project_name))
+        project = cls.project_objs.get(project_name)
+        if project is not None:
+            return project
+
+        project = cls.load_project(project_name)
+        if project is None:
+            return Project(project_name)
+
+        if cls.register_project(project):
+            cls.update_config()
         return project
 
     @classmethod
-    def update_config(cls):
+    def reload_config(cls):
+        """Re-read ProjectData from the config file after it changed on disk.
+
+        The current settings are kept if the file cannot be parsed.
+        """
+        try:
+            yamlmanager.cached_load(cls.config_file)
+        except Exception as e:
+            print(f"Keeping the loaded config, {cls.config_file} could not be read: {e}")
+            return
+        configutils.validate_config(cls)
+
+    @classmethod
+    def update_config(cls, key: str = ""):
+        """Save ProjectData to the config file.
+
+        Keyword Arguments:
+            key -- Only save this attribute. It is appended to the config
+            journal instead of rewriting the whole file. (default: {""})
+        """
+        if key:
+            yamlmanager.journal(cls.config_file, [cls.__name__, key], getattr(cls, key))
+            return
+
         data = configutils.class_to_dict(cls)
         del data["project_objs"]
+        del data["project_meta"]
         yamlmanager.update(cls.config_file, cls.__name__, data)
 
     @classmethod
@@ -0,0 +1,171 @@
+from collections import deque
+from typing import Deque, List, Tuple
+
+from PySide6.QtGui import QColor, QTextCharFormat, QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit
+
+from anvil.config import TEMP_DIR
+from anvil.helpers.linestore import Line, LineStore
+
+COLORS = {
+    "gray": QColor(149, 165, 166),
+    "red": QColor(192, 57, 43),
+    "green": QColor(39, 174, 96),
+    "yellow": QColor(241, 196, 15),
+    "purple": QColor(155, 89, 182),
+    "cyan": QColor(93, 173, 226),
+    "black": QColor(23, 32, 42),
+}
+WEIGHTS = {
+    "text": 400,
+    "h1": 900,
+    "h2": 650,
+    "h3": 500,
+}
+COLOR_IDS = {name: index for index, name in enumerate(COLORS)}
+WEIGHT_IDS = {name: index for index, name in enumerate(WEIGHTS)}
+
+
+class Console(QPlainTextEdit):
+    """Read-only run output that keeps a bounded window of records in the widget.
+
+    All output goes to a LineStore, which spills to disk. The widget only holds
+    the records from self.first to self.last. While the view is at the bottom,
+    new output is appended and the oldest records are dropped. Scrolling to the
+    top or bottom of the window pages records in from the store.
+    """
+
+    def __init__(self, window: int = 5_000, page: int = 1_000):
+        """
+        Keyword Arguments:
+            window -- Records held by the widget (default: {5_000})
+            page -- Records loaded when scrolling past either end (default: {1_000})
+        """
+        super().__init__()
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.store = LineStore(f"{TEMP_DIR}/console", capacity=window * 2)
+        self.window = window
+        self.page = page
+        self.first = 0
+        self.last = 0
+        # UTF-16 length of each record in the widget, to cut records off either end,
+        # and whether it ends a line, since the scrollbar moves by lines
+        self.lengths: Deque[Tuple[int, bool]] = deque()
+        self.paging = False
+
+        self.formats: List[List[QTextCharFormat]] = []
+        for color in COLORS.values():
+            row = []
+            for weight in WEIGHTS.values():
+                textformat = QTextCharFormat()
+                textformat.setForeground(color)
+                textformat.setFontWeight(weight)
+                row.append(textformat)
+            self.formats.append(row)
+
+        self.verticalScrollBar().valueChanged.connect(self.signal_scrolled)
+
+    def append_batch(self, batch: list):
+        """Store a batch of runs from MessageBatcher and show it if the view is at the bottom.
+
+        Arguments:
+            batch -- {"text", "color", "charformat"} dicts
+        """
+        following = self.last == len(self.store) and self.at_bottom()
+        start = len(self.store)
+        for run in batch:
+            color_id = COLOR_IDS.get(run["color"], 0)
+            weight_id = WEIGHT_IDS.get(run["charformat"], 0)
+            # one record per line keeps paging granular
+            for text in run["text"].splitlines(keepends=True):
+                self.store.append(text, color_id, weight_id)
+
+        if following:
+            self.insert_lines(self.store.get(start, len(self.store)), at_end=True)
+            self.last = len(self.store)
+            self.trim(from_end=False)
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+
+    def clear_output(self):
+        self.store.clear()
+        self.lengths.clear()
+        self.first = self.last = 0
+        self.clear()
+
+    def at_bottom(self) -> bool:
+        scrollbar = self.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum()
+
+    def signal_scrolled(self, value: int):
+        if self.paging:
+            return
+        scrollbar = self.verticalScrollBar()
+        if value == scrollbar.minimum() and self.first > 0:
+            self.page_up()
+        elif value == scrollbar.maximum() and self.last < len(self.store):
+            self.page_down()
+
+    def page_up(self):
+        start = max(self.first - self.page, 0)
+        lines = self.store.get(start, self.first)
+        self.paging = True
+        self.insert_lines(lines, at_end=False)
+        self.first = start
+        self.trim(from_end=True)
+        # keep the line that was at the top of the view in place
+        self.verticalScrollBar().setValue(sum(text.endswith("\n") for text, _, _ in lines))
+        self.paging = False
+
+    def page_down(self):
+        lines = self.store.get(self.last, self.last + self.page)
+        self.paging = True
+        value = self.verticalScrollBar().value()
+        self.insert_lines(lines, at_end=True)
+        self.last += len(lines)
+        removed_lines = self.trim(from_end=False)
+        self.verticalScrollBar().setValue(max(value - removed_lines, 0))
+        self.paging = False
+
+    def insert_lines(self, lines: List[Line], at_end: bool):
+        cursor = QTextCursor(self.document())
+        if at_end:
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.beginEditBlock()
+        lengths = []
+        for text, color_id, weight_id in lines:
+            cursor.insertText(text, self.formats[color_id][weight_id])
+            lengths.append((len(text.encode("utf-16-le")) // 2, text.endswith("\n")))
+        cursor.endEditBlock()
+        if at_end:
+            self.lengths.extend(lengths)
+        else:
+            self.lengths.extendleft(reversed(lengths))
+
+    def trim(self, from_end: bool) -> int:
+        """Drop records from one end until the widget holds at most self.window records.
+
+        Returns:
+            int -- The number of line breaks removed, a record without a
+            trailing newline does not end a line
+        """
+        excess = len(self.lengths) - self.window
+        if excess <= 0:
+            return 0
+        size = 0
+        line_breaks = 0
+        for _ in range(excess):
+            length, ends_line = self.lengths.pop() if from_end else self.lengths.popleft()
+            size += length
+            line_breaks += ends_line
+
+        cursor = QTextCursor(self.document())
+        if from_end:
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.setPosition(cursor.position() - size, QTextCursor.MoveMode.KeepAnchor)
+            self.last -= excess
+        else:
+            cursor.setPosition(size, QTextCursor.MoveMode.KeepAnchor)
+            self.first += excess
+        cursor.removeSelectedText()
+        return line_breaks
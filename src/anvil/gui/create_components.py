@@ -25,6 +25,8 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
+from .console import Console
+
 T = TypeVar("T")
 AnyLayout = TypeVar("AnyLayout", QVBoxLayout, QHBoxLayout, QFormLayout)
 AnyWidget = TypeVar(
@@ -118,6 +120,12 @@ def create_QTextEdit(obj_name: str, setReadOnly: bool = False) -> QTextEdit:
     return textedit
 
 
+def create_Console(obj_name: str) -> Console:
+    console = Console()
+    console.setObjectName(obj_name)
+    return console
+
+
 def create_QAction(parent: QWidget, obj_name: str, parent_menu: QMenu | QMenuBar, text: str) -> QAction:
     action = QAction(text, parent)
     parent_menu.addAction(action)
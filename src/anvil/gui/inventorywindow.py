@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict
 
 from PySide6.QtWidgets import QGroupBox, QLineEdit, QWidget
 
@@ -23,8 +23,8 @@ class InventoryWindow(QWidget):
         self.manual = False
         self.project: Project = ProjectData.get_project(ProjectData.selected_project)
         self.projectinventory = self.project.inventory
-        self.hosts: List[Inventory.Host] = self.projectinventory.hosts
-        self.groups: List[Inventory.Group] = self.projectinventory.groups
+        self.hosts: Dict[str, Inventory.Host] = self.projectinventory.hosts
+        self.groups: Dict[str, Inventory.Group] = self.projectinventory.groups
 
         # primary layout
         primary_layout = create_QHBoxLayout()
@@ -54,7 +54,7 @@ class InventoryWindow(QWidget):
 
         # host dropdown
         hosts = []
-        for host in self.hosts:
+        for host in self.hosts.values():
             hosts.append(host.name)
         hosts.append("New Host")
         selecthost = create_QComboBox("select_host", hosts)
@@ -64,7 +64,7 @@ class InventoryWindow(QWidget):
 
         # group dropdown
         groups = []
-        for group in self.groups:
+        for group in self.groups.values():
             groups.append(group.name)
         groups.append("New Group")
         selectgroup = create_QComboBox("select_group", groups)
@@ -245,14 +245,14 @@ class InventoryWindow(QWidget):
                 self.available_groups.removeItem(self.available_groups.findText(child.name))
 
             hosts = []
-            for host in self.hosts:
+            for host in self.hosts.values():
                 hosts.append(host.name)
             self.available_hosts.clear()
             self.available_hosts.addItems(hosts)
             self.available_hosts.addItem("")
             self.available_hosts.setCurrentIndex(-1)
 
-            for host in self.group.hosts:
+            for host in self.group.hosts.values():
                 self.group_child_hosts.addItem(host.name)
                 self.available_hosts.removeItem(self.available_hosts.findText(host.name))
 
@@ -276,17 +276,18 @@ class InventoryWindow(QWidget):
         if not hostname:
             return
 
-        host, _ = self.projectinventory.add_host(hostname)
+        with self.projectinventory.transaction():
+            host, _ = self.projectinventory.add_host(hostname)
 
-        # update vars from form
-        var_vals = self.variable_section.findChildren(QLineEdit)
-        for var in var_vals:
-            host.vars[var.objectName()] = var.text()
+            # update vars from form
+            var_vals = self.variable_section.findChildren(QLineEdit)
+            for var in var_vals:
+                host.vars[var.objectName()] = var.text()
 
-        host.name = self.target_host_name.text().strip()
-        host.vars["ansible_host"] = self.ansible_host.text().strip()
+            host.name = self.target_host_name.text().strip()
+            host.vars["ansible_host"] = self.ansible_host.text().strip()
 
-        self.projectinventory.save_host(host)
+            self.projectinventory.save_host(host)
 
         # update/add to dropdown
         self.manual = True
@@ -301,22 +302,23 @@ class InventoryWindow(QWidget):
         groupname = self.selectgroup.currentText()
         if not groupname:
             return
-        group, _ = self.projectinventory.add_group(groupname)
+        with self.projectinventory.transaction():
+            group, _ = self.projectinventory.add_group(groupname)
 
-        # update vars from form
-        var_vals = self.variable_section.findChildren(QLineEdit)
-        for var in var_vals:
-            group.vars[var.objectName()] = var.text()
+            # update vars from form
+            var_vals = self.variable_section.findChildren(QLineEdit)
+            for var in var_vals:
+                group.vars[var.objectName()] = var.text()
 
-        # update hosts from form
-        for i in range(self.group_child_hosts.count()):
-            child = self.group_child_hosts.item(i)
-            host = self.projectinventory.get_host(child.text())
-            if host is not None:
-                group.add_host(host)
+            # update hosts from form
+            for i in range(self.group_child_hosts.count()):
+                child = self.group_child_hosts.item(i)
+                host = self.projectinventory.get_host(child.text())
+                if host is not None:
+                    group.add_host(host)
 
-        group.name = self.target_group_name.text().strip()
-        self.projectinventory.save_group(group)
+            group.name = self.target_group_name.text().strip()
+            self.projectinventory.save_group(group)
 
         # update/add to dropdown
         self.manual = True
@@ -362,3 +364,30 @@ class InventoryWindow(QWidget):
         self.available_groups.clear()
         self.group_child_hosts.clear()
         self.group_child_groups.clear()
+
+    def apply_inventory_changes(self, changes: Dict[str, list]):
+        """Bring the dropdowns in line with an inventory that was reloaded from disk.
+
+        Arguments:
+            changes -- The result of Inventory.reload()
+        """
+        self.manual = True
+        for combobox, kind, placeholder in (
+            (self.selecthost, "hosts", "New Host"),
+            (self.selectgroup, "groups", "New Group"),
+        ):
+            for name in changes[f"{kind}_removed"]:
+                index = combobox.findText(name)
+                if index != -1:
+                    combobox.removeItem(index)
+            for name in changes[f"{kind}_added"]:
+                combobox.insertItem(combobox.findText(placeholder), name)
+        self.manual = False
+
+        # refresh the form if the entry being edited was changed underneath it
+        selected = self.selecthost.currentText()
+        if selected in changes["hosts_changed"]:
+            self.signal_selecthost_changed()
+        selected = self.selectgroup.currentText()
+        if selected in changes["groups_changed"]:
+            self.signal_selectgroup_changed()
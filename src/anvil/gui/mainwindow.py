@@ -1,18 +1,21 @@
 import os
 import sys
-from typing import List
+from typing import Dict
 
 import qdarktheme
-from PySide6.QtCore import Qt, QThreadPool
-from PySide6.QtGui import QColor, QTextCharFormat, QTextCursor
+from PySide6.QtCore import Qt, QThreadPool, QTimer
 from PySide6.QtWidgets import QApplication, QMainWindow, QMessageBox
 
-from anvil.ansible import PlayBuilder, Worker, WorkerSignals
-from anvil.config import Inventory, Project, ProjectData
+from anvil.ansible import BatchQueue, PlayBuilder, RunScheduler, WorkerSignals
+from anvil.config import TEMP_DIR, Inventory, Project, ProjectData
+from anvil.helpers import profiler
+from anvil.helpers.datautils import convert_bytes
+from anvil.helpers.watcher import Watcher
 
 from .dialogs import ImportProjectDialog, SelectProjectDialog
 from .inventorywindow import InventoryWindow
 from .mainwindow_gui import MainWindow_UI
+from .workers import StatsWorker, WatcherSignals
 
 
 class MainWindow(QMainWindow):
@@ -27,23 +30,37 @@ class MainWindow(QMainWindow):
         if not ProjectData.selected_project:
             sys.exit()  # TODO: Select Project Dialog
 
-        self.project: Project = ProjectData.get_project(ProjectData.selected_project)
+        with profiler.phase("load selected project"):
+            self.project: Project = ProjectData.get_project(ProjectData.selected_project)
         self.projectinventory = self.project.inventory
-        self.hosts: List[Inventory.Host] = self.projectinventory.hosts
-        self.groups: List[Inventory.Group] = self.projectinventory.groups
+        self.hosts: Dict[str, Inventory.Host] = self.projectinventory.hosts
+        self.groups: Dict[str, Inventory.Group] = self.projectinventory.groups
         PlayBuilder.private_data_dir = self.project.root_dir
-
-        ui = MainWindow_UI()
-        ui.init_ui(self)
+        # plays are queued, so conflicting ones never touch a host at the same time
+        self.scheduler = RunScheduler(resolve=self.helper_resolve_target, on_change=self.signals.queue.emit)
+        # quick actions on the same target can be merged into one run
+        self.batch_queue = BatchQueue(self.scheduler, progress_callback=self.signals.message)
+        self.signals.message.connect(self.helper_append_console)
+        self.signals.finished.connect(self.ansible_complete)
+        self.signals.queue.connect(self.helper_show_queue)
+
+        with profiler.phase("MainWindow_UI.init_ui"):
+            ui = MainWindow_UI()
+            ui.init_ui(self)
         self.ui = ui
 
         self.inv_target = "all"
         self.inv_target_type = "group"
+        # one StatsWorker at a time, changes while it runs start another afterwards
+        self.stats_running = False
+        self.stats_pending = False
 
         # Connect signals here for visibility
         # tree
         ui.tree.clicked.connect(self.signal_tree_clicked)
+        ui.tree.customContextMenuRequested.connect(self.signal_tree_menu)
         self.populate_tree()
+        self.populate_tree_stats()
         # lists
         ui.groups_list.clicked.connect(self.signal_groups_list_changed)
         ui.hosts_list.clicked.connect(self.signal_hosts_list_changed)
@@ -53,6 +70,7 @@ class MainWindow(QMainWindow):
         ui.qaction_selectproject.triggered.connect(self.dialog_selectproject)
         ui.qaction_inventory.triggered.connect(self.window_inventory)
         ui.qaction_ping.triggered.connect(self.signal_ping)
+        ui.qaction_send_directory.triggered.connect(self.signal_send_directory)
         # buttons
         ui.send_file_button.clicked.connect(self.signal_send_file)
         ui.fetch_file_button.clicked.connect(self.signal_fetch_file)
@@ -61,8 +79,19 @@ class MainWindow(QMainWindow):
         ui.button_service_restart.clicked.connect(self.signal_quick_systemd)
         ui.button_service_status.clicked.connect(self.signal_quick_systemd)
         ui.quickshell_run_button.clicked.connect(self.signal_quick_shell)
+        ui.cancel_button.clicked.connect(self.scheduler.cancel_all)
+        ui.batch_run_button.clicked.connect(self.signal_batch_run)
         # check boxes
         ui.gather_facts.stateChanged.connect(self.signal_gather_facts)
+        ui.verbosity.currentTextChanged.connect(self.signal_verbosity)
+        # reload when the inventory, config or files change on disk
+        self.start_watcher()
+
+    def closeEvent(self, event):
+        self.watcher.stop()
+        self.scheduler.cancel_all()
+        self.projectinventory.flush_snapshot()
+        super().closeEvent(event)
 
     def signal_tree_clicked(self):
         ui = self.ui
@@ -95,6 +124,24 @@ class MainWindow(QMainWindow):
             elif target_type == "groups":
                 ui.groups_list.findItems(target_name, Qt.MatchFlag.MatchExactly)[0].setSelected(True)
 
+    def signal_tree_menu(self, position):
+        ui = self.ui
+        selected_path = ui.model.filePath(ui.tree.indexAt(position))
+        relative_path = selected_path.replace(self.files_path, "").split("/")
+        # ["", "hosts", "<host>", "etc", ...], the storage root itself maps to / and is never sent whole
+        if not os.path.isdir(selected_path) or len(relative_path) < 4:
+            return
+        self.tree_menu_path = selected_path
+        ui.tree_menu.exec(ui.tree.viewport().mapToGlobal(position))
+
+    def signal_send_directory(self):
+        src = self.tree_menu_path
+        relative_path = src.replace(self.files_path, "").split("/")
+        dest = f"/{os.path.join(*relative_path[3:])}"
+        self.inv_target_type = relative_path[1]
+        self.inv_target = relative_path[2]
+        self.ansible_quick(f"Send {dest}/", lambda play: play.send_tree(src, dest))
+
     def signal_hosts_list_changed(self):
         ui = self.ui
         if not self.manual:
@@ -102,7 +149,7 @@ class MainWindow(QMainWindow):
             host = self.projectinventory.get_host(choice)
             if host is not None:
                 ui.groups_list.clearSelection()
-                self.helper_expand_tree(host.storage_dir)
+                self.helper_expand_tree(self.projectinventory.ensure_storage(host))
 
             self.inv_target = choice
             self.inv_target_type = "hosts"
@@ -111,6 +158,10 @@ class MainWindow(QMainWindow):
         ui = self.ui
         PlayBuilder.gather_facts = ui.gather_facts.isChecked()
 
+    def signal_verbosity(self, verbosity: str):
+        if verbosity:
+            PlayBuilder.verbosity = verbosity
+
     def signal_groups_list_changed(self):
         ui = self.ui
         if not self.manual:
@@ -118,7 +169,7 @@ class MainWindow(QMainWindow):
             group = self.projectinventory.get_group(choice)
             if group is not None:
                 ui.hosts_list.clearSelection()
-                self.helper_expand_tree(group.storage_dir)
+                self.helper_expand_tree(self.projectinventory.ensure_storage(group))
 
             self.inv_target = choice
             self.inv_target_type = "group"
@@ -127,14 +178,9 @@ class MainWindow(QMainWindow):
         """
         Must pick file from the tree view!
         """
-        self.helper_input_setEnabled(False)
         dest = self.target_file_remote_path
         src = self.target_file_local_path
-
-        play = PlayBuilder()
-        play.hosts.append(self.inv_target)
-        play.send(src, dest)
-        self.ansible_run(play)
+        self.ansible_quick(f"Send {dest}", lambda play: play.send(src, dest))
 
     def signal_fetch_file(self):
         # self.helper_input_setEnabled(False)
@@ -154,7 +200,6 @@ class MainWindow(QMainWindow):
         self.ansible_run(play)
 
     def signal_ping(self):
-        self.helper_input_setEnabled(False)
         play = PlayBuilder()
         play.host_pattern = self.inv_target
         play.module("ping")
@@ -164,24 +209,22 @@ class MainWindow(QMainWindow):
         # self.helper_input_setEnabled(False)
         ui = self.ui
         service_name = ui.quick_systemd_service.text()
-        play = PlayBuilder()
-        play.hosts.append(self.inv_target)
         match self.sender().objectName():
             case "button_service_start":
-                play.service(service_name, "started")
+                self.ansible_quick(f"Start {service_name}", lambda play: play.service(service_name, "started"))
             case "button_service_stop":
-                play.service(service_name, "stopped")
+                self.ansible_quick(f"Stop {service_name}", lambda play: play.service(service_name, "stopped"))
             case "button_service_restart":
-                play.service(service_name, "restarted", daemon_reload=True)
+                self.ansible_quick(
+                    f"Restart {service_name}", lambda play: play.service(service_name, "restarted", daemon_reload=True)
+                )
             case "button_service_status":
-                play.shell(["systemctl status " + service_name])
-        self.ansible_run(play)
+                self.ansible_quick(
+                    f"Status of {service_name}", lambda play: play.shell(["systemctl status " + service_name])
+                )
 
     def signal_quick_shell(self):
-        self.helper_input_setEnabled(False)
         ui = self.ui
-        play = PlayBuilder()
-        play.hosts.append(self.inv_target)
         commands = []
         text = ui.quickshell_1.text()
         if text:
@@ -192,8 +235,8 @@ class MainWindow(QMainWindow):
         text = ui.quickshell_3.text()
         if text:
             commands.append(text)
-        play.shell(commands)
-        self.ansible_run(play)
+        fused = ui.quickshell_fused.isChecked()
+        self.ansible_quick(f"Run {len(commands)} commands", lambda play: play.shell(commands, fused=fused))
 
     def helper_expand_tree(self, item_path: str):
         ui = self.ui
@@ -227,39 +270,8 @@ class MainWindow(QMainWindow):
             ui.tree.setCurrentIndex(final_index)
             ui.tree.scrollTo(final_index)
 
-    def helper_append_console(self, msg: dict):
-        ui = self.ui
-        color_map = {
-            "red": QColor(192, 57, 43),
-            "green": QColor(39, 174, 96),
-            "yellow": QColor(241, 196, 15),
-            "purple": QColor(155, 89, 182),
-            "cyan": QColor(93, 173, 226),
-            "gray": QColor(149, 165, 166),
-            "black": QColor(23, 32, 42),
-        }
-        color = color_map.get(msg["color"], QColor(0, 0, 0))
-
-        weight_map = {
-            "text": 400,
-            "h1": 900,
-            "h2": 650,
-            "h3": 500,
-        }
-
-        charformat = QTextCharFormat()
-        charformat.setForeground(color)
-        charformat.setFontWeight(weight_map.get(msg["charformat"], 1))
-
-        cursor = ui.console.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)  # Move the cursor to the end
-
-        cursor.insertText(msg["text"], charformat)
-
-        if not msg["skip_newline"]:
-            cursor.insertText("\n")
-
-        ui.console.ensureCursorVisible()
+    def helper_append_console(self, batch: list):
+        self.ui.console.append_batch(batch)
 
     def helper_input_setEnabled(self, toggle: bool):
         ui = self.ui
@@ -271,19 +283,65 @@ class MainWindow(QMainWindow):
 
     def ansible_run(self, play: PlayBuilder):
         ui = self.ui
-        worker = Worker(play, self.signals.message)
-        worker.signals.finished.connect(self.ansible_complete)
-        worker.signals.message.connect(self.helper_append_console)
         ui.progress_bar.setRange(0, 0)
-        self.thread_pool.start(worker)
+        self.scheduler.submit(
+            play,
+            progress_callback=self.signals.message,
+            done_callback=lambda job: self.signals.finished.emit(job.state == "finished"),
+        )
+
+    def ansible_quick(self, label: str, build):
+        """Run a quick action on the current target, or add it to the batch in batch mode.
+
+        Arguments:
+            label -- Names the action in the batch results
+            build -- Adds the action's tasks to a PlayBuilder
+        """
+        ui = self.ui
+        if ui.batch_mode.isChecked():
+            self.batch_queue.add(
+                [self.inv_target],
+                label,
+                build,
+                done_callback=lambda action: self.signals.finished.emit(action.state == "finished"),
+            )
+            ui.progress_bar.setRange(0, 0)
+            ui.batch_pending.setText(f"{self.batch_queue.pending_count()} pending")
+            return
+        play = PlayBuilder()
+        play.hosts.append(self.inv_target)
+        build(play)
+        self.ansible_run(play)
+
+    def signal_batch_run(self):
+        self.batch_queue.flush()
 
     def ansible_complete(self, success):
-        if success:
+        stats = self.scheduler.stats()
+        if not stats["queued"] and not stats["running"] and not self.batch_queue.pending_count():
             ui = self.ui
             ui.progress_bar.setRange(0, 100)
             ui.progress_bar.reset()
             self.helper_input_setEnabled(True)
 
+    def helper_resolve_target(self, target: str) -> list:
+        """Get the hosts a play on target touches, for the scheduler's locks."""
+        group = self.groups.get(target)
+        if group is None:
+            return [target]
+        if group.name == "all":
+            return list(self.hosts)
+        return list(group.hosts)
+
+    def helper_show_queue(self, stats: dict):
+        self.ui.batch_pending.setText(f"{self.batch_queue.pending_count()} pending")
+        text = f"{stats['running']}/{stats['max_concurrent']} running"
+        if stats["queued"]:
+            text += f", {stats['queued']} queued, oldest {stats['oldest_wait']:.0f}s"
+        if stats["average_wait"] >= 0.1:
+            text += f", avg wait {stats['average_wait']:.1f}s"
+        self.ui.queue_stats.setText(text)
+
     def populate_tree(self):
         ui = self.ui
         files_path = os.path.join(self.project.root_dir, "files")
@@ -292,11 +350,73 @@ class MainWindow(QMainWindow):
         self.tree_root_index = ui.model.index(files_path)
         self.files_path = files_path
 
+    def populate_tree_stats(self):
+        if self.stats_running:
+            self.stats_pending = True
+            return
+        self.stats_running = True
+        self.stats_pending = False
+        worker = StatsWorker(self.project)
+        worker.signals.progress.connect(self.helper_show_tree_stats)
+        worker.signals.finished.connect(self.helper_show_tree_stats)
+        worker.signals.done.connect(self.helper_tree_stats_done)
+        self.thread_pool.start(worker)
+
+    def helper_tree_stats_done(self):
+        self.stats_running = False
+        if self.stats_pending:
+            self.populate_tree_stats()
+
+    def helper_show_tree_stats(self, stats: list):
+        size, dir_count, file_count = stats
+        self.ui.tree_stats.setText(f"{convert_bytes(size)} in {file_count} files, {dir_count} directories")
+
+    def start_watcher(self):
+        self.watcher_signals = WatcherSignals()
+        self.watcher_signals.changed.connect(self.signal_files_changed)
+        # the callback runs on the watcher thread, the signal hands the batch to the GUI thread
+        watcher = Watcher(self.watcher_signals.changed.emit)
+        watcher.watch(os.path.dirname(self.project.inventory_path))
+        watcher.watch(self.files_path)
+        watcher.watch(os.path.dirname(os.path.abspath(ProjectData.config_file)), recursive=False)
+        watcher.start()
+        self.watcher = watcher
+
+    def signal_files_changed(self, paths: list):
+        inventory_dir = os.path.dirname(self.project.inventory_path)
+        config_file = os.path.abspath(ProjectData.config_file)
+        config_dir = os.path.dirname(config_file)
+
+        def under(directory: str) -> bool:
+            # a directory itself is reported when the watcher dropped events
+            return any(changed == directory or changed.startswith(directory + os.sep) for changed in paths)
+
+        if under(inventory_dir):
+            changes = self.projectinventory.reload()
+            self.helper_update_lists(changes)
+            invwindow = getattr(self, "invwindow", None)
+            if invwindow is not None and invwindow.isVisible():
+                invwindow.apply_inventory_changes(changes)
+        # the config file or its journal
+        if any(changed.startswith(config_file) or changed == config_dir for changed in paths):
+            ProjectData.reload_config()
+        if under(self.files_path):
+            self.populate_tree_stats()
+
+    def helper_update_lists(self, changes: Dict[str, list]):
+        ui = self.ui
+        for widget, kind in ((ui.hosts_list, "hosts"), (ui.groups_list, "groups")):
+            for name in changes[f"{kind}_removed"]:
+                for item in widget.findItems(name, Qt.MatchFlag.MatchExactly):
+                    widget.takeItem(widget.row(item))
+            for name in changes[f"{kind}_added"]:
+                widget.addItem(name)
+
     def populate_lists(self):
         ui = self.ui
-        for group in self.groups:
+        for group in self.groups.values():
             ui.groups_list.addItem(group.name)
-        for host in self.hosts:
+        for host in self.hosts.values():
             ui.hosts_list.addItem(host.name)
 
     def dialog_importproject(self):
@@ -323,7 +443,9 @@ class MainWindow(QMainWindow):
             selected_project = dlg.selected_project.currentText()
             if selected_project:
                 ProjectData.selected_project = selected_project
-                ProjectData.update_config()
+                ProjectData.update_config("selected_project")
+                # load the project now rather than when it is first used
+                ProjectData.get_project(selected_project)
 
     def window_inventory(self):
         if ProjectData.selected_project:
@@ -336,7 +458,13 @@ class MainWindow(QMainWindow):
 
 
 def gui_main():
-    app = QApplication()
-    window = MainWindow()
-    window.show()
+    with profiler.phase("create QApplication"):
+        app = QApplication()
+    with profiler.phase("create MainWindow"):
+        window = MainWindow()
+    with profiler.phase("show MainWindow"):
+        window.show()
+    if profiler.enabled:
+        # runs on the first pass of the event loop, once the window has been painted
+        QTimer.singleShot(0, lambda: profiler.finish(TEMP_DIR))
     app.exec()
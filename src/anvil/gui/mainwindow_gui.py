@@ -1,18 +1,22 @@
-from PySide6.QtWidgets import QHBoxLayout, QMainWindow, QTabWidget, QVBoxLayout, QWidget
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import QHBoxLayout, QMainWindow, QMenu, QTabWidget, QVBoxLayout, QWidget
+
+from anvil.ansible import PRESETS, PlayBuilder
 
 from .create_components import (
+    create_Console,
     create_QAction,
     create_QCheckBox,
     create_QComboBox,
     create_QGroupBox,
     create_QHBoxLayout,
+    create_QLabel,
     create_QLineEdit,
     create_QListWidget,
     create_QProgressBar,
     create_QPushButton,
     create_QSpacerItem,
     create_QTabWidget,
-    create_QTextEdit,
     create_QTreeView,
     create_QVBoxLayout,
     create_QWidget,
@@ -70,8 +74,17 @@ class MainWindow_UI(QWidget):
     def section_two(self, parent_layout: QVBoxLayout):
         tree, model = create_QTreeView("file_tree")
         parent_layout.addWidget(tree)
+        tree_stats = create_QLabel("", "tree_stats")
+        parent_layout.addWidget(tree_stats)
+        # shown on directories inside a host or group's storage
+        tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        tree_menu = QMenu(tree)
+        send_directory = create_QAction(tree, "qaction_send_directory", tree_menu, "Send Directory")
         self.tree = tree
         self.model = model
+        self.tree_stats = tree_stats
+        self.tree_menu = tree_menu
+        self.qaction_send_directory = send_directory
 
     def section_three(self, target_layout: QVBoxLayout):
         section_two_tabs = create_QTabWidget("section_two_tabs", 450)
@@ -82,18 +95,30 @@ class MainWindow_UI(QWidget):
         self.gather_facts = create_QCheckBox("gather_facts", "Gather Facts?")
         self.gather_facts.setChecked(True)
         target_layout.addWidget(self.gather_facts)
+        self.verbosity = create_QComboBox("verbosity", list(PRESETS))
+        self.verbosity.setCurrentText(PlayBuilder.verbosity)
+        self.verbosity.setToolTip("How much of each event is sent back by Ansible")
+        target_layout.addWidget(self.verbosity)
 
     def section_four(self, parent_layout: QVBoxLayout):
-        console = create_QTextEdit("console")
+        console = create_Console("console")
         parent_layout.addWidget(console)
         console.setMinimumWidth(550)
-        console.setReadOnly(True)
 
+        run_layout = create_QHBoxLayout("run_layout")
+        parent_layout.addLayout(run_layout)
         progress_bar = create_QProgressBar("progress_bar")
-        parent_layout.addWidget(progress_bar)
+        run_layout.addWidget(progress_bar)
+        queue_stats = create_QLabel("", "queue_stats")
+        run_layout.addWidget(queue_stats)
+        cancel_button = create_QPushButton("cancel_button", "Cancel")
+        cancel_button.setToolTip("Cancel all queued and running plays")
+        run_layout.addWidget(cancel_button)
 
         self.console = console
         self.progress_bar = progress_bar
+        self.queue_stats = queue_stats
+        self.cancel_button = cancel_button
 
     def setup_menubar(self):
 
@@ -119,6 +144,24 @@ class MainWindow_UI(QWidget):
         self.quickactions_systemd(right_layout)
         # apt
         self.quickactions_apt(right_layout)
+        # batching
+        self.quickactions_batch(right_layout)
+
+    def quickactions_batch(self, parent_layout: QVBoxLayout):
+        groupbox, layout = create_QGroupBox("quick_batch", "Batch", QVBoxLayout)
+        batch_mode = create_QCheckBox("batch_mode", "Merge quick actions into one run")
+        batch_mode.setToolTip("Send files, systemd and commands on the same target run together after a short wait")
+        batch_pending = create_QLabel("", "batch_pending")
+        batch_run_button = create_QPushButton("batch_run_button", "Run Batch Now")
+
+        layout.addWidget(batch_mode)
+        layout.addWidget(batch_pending)
+        layout.addWidget(batch_run_button)
+        parent_layout.addWidget(groupbox)
+
+        self.batch_mode = batch_mode
+        self.batch_pending = batch_pending
+        self.batch_run_button = batch_run_button
 
     def quickactions_files(self, parent_layout: QVBoxLayout):
         groupbox, layout = create_QGroupBox("quick_file", "Send / Fetch Files")
@@ -147,12 +190,15 @@ class MainWindow_UI(QWidget):
         quickshell_1 = create_QLineEdit("quickshell_1", "ls -la")
         quickshell_2 = create_QLineEdit("quickshell_2", "df -h")
         quickshell_3 = create_QLineEdit("quickshell_3", "uptime")
+        quickshell_fused = create_QCheckBox("quickshell_fused", "One task per host")
+        quickshell_fused.setToolTip("Run the commands in a single shell script instead of one task each")
         spacer = create_QSpacerItem()
         quickshell_run_button = create_QPushButton("quickshell_run_button", "Run")
 
         layout.addWidget(quickshell_1)
         layout.addWidget(quickshell_2)
         layout.addWidget(quickshell_3)
+        layout.addWidget(quickshell_fused)
         layout.addItem(spacer)
         layout.addWidget(quickshell_run_button)
         parent_layout.addWidget(groupbox)
@@ -161,6 +207,7 @@ class MainWindow_UI(QWidget):
         self.quickshell_1 = quickshell_1
         self.quickshell_2 = quickshell_2
         self.quickshell_3 = quickshell_3
+        self.quickshell_fused = quickshell_fused
 
     def quickactions_systemd(self, parent_layout: QVBoxLayout):
         groupbox, layout = create_QGroupBox("quick_systemd", "Systemd", QVBoxLayout)
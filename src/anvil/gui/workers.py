@@ -0,0 +1,34 @@
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from anvil.config import Project
+
+
+class StatsWorkerSignals(QObject):
+    progress = Signal(list)
+    finished = Signal(list)
+    done = Signal()
+
+
+class WatcherSignals(QObject):
+    changed = Signal(list)
+
+
+class StatsWorker(QRunnable):
+    """Count the size, directories and files of a project off the GUI thread.
+
+    Afterwards the project's file manifest is brought up to date. done is
+    emitted when the worker stops, also if it failed.
+    """
+
+    def __init__(self, project: Project):
+        super(StatsWorker, self).__init__()
+        self.project = project
+        self.signals = StatsWorkerSignals()
+
+    def run(self):
+        try:
+            stats = self.project.update_stats(self.signals.progress.emit)
+            self.signals.finished.emit(stats)
+            self.project.update_manifest()
+        finally:
+            self.signals.done.emit()
@@ -2,9 +2,11 @@
 This module contains functions for managing files and directories.
 """
 
+import hashlib
 import os
-import subprocess
-from .datautils import convert_bytes
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 def check_dir(dir_path: str = None, create: bool = False) -> bool:
@@ -51,6 +53,15 @@ def create_dir(dir_path: str) -> None:
         raise FileNotFoundError(f"Error Creating {dir_path}")
 
 
+def file_hash(file_path: str) -> str:
+    """Hash the contents of a file with blake2b."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def get_directories(dir_path: str) -> list:
     """Get a list of directories in a directory."""
     dirs = []
@@ -60,59 +71,185 @@ def get_directories(dir_path: str) -> list:
     return dirs
 
 
-def process_line(line: str):
-    """Process a line from the tree command."""
-    line_copy2 = line.rstrip().split(" ")
+def get_directory_entries(dir_path: str) -> list[os.DirEntry]:
+    """Get the directories in a directory as os.DirEntry objects.
 
-    if len(line_copy2) == 1:
-        return
-    if line_copy2[0].isdigit():
-        print("Summary Line")
-        return
+    Listing with os.scandir avoids a separate stat call per entry.
+    """
+    with os.scandir(dir_path) as entries:
+        return [entry for entry in entries if entry.is_dir()]
 
-    bytes_str = ""
-    for i in line:
-        if i == "[":
-            continue
-        if i.isdigit():
-            bytes_str = bytes_str + i
+
+def sync_dirs(dir_path: str, names: list, create: bool = True) -> list:
+    """Make sure a directory has a subdirectory for each name.
+
+    The directory is listed once with os.scandir instead of checking
+    every entry separately, and only the missing directories are created.
+
+    Arguments:
+        dir_path -- Parent directory
+        names -- Names of the subdirectories
+
+    Keyword Arguments:
+        create -- Create the missing subdirectories (default: {True})
+
+    Returns:
+        list -- Names that were missing
+    """
+    existing = set()
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    existing.add(entry.name)
+    except FileNotFoundError:
+        pass
+
+    missing = [name for name in names if name not in existing]
+    if create:
+        for name in missing:
+            create_dir(os.path.join(dir_path, name))
+    return missing
+
+
+def walk_tree(directory: str, report=None, report_every: int = 1000) -> list[int]:
+    """Count the bytes, directories and files below a directory.
+
+    Symlinks are counted as files and never followed.
+
+    Arguments:
+        directory -- Directory to walk
+
+    Keyword Arguments:
+        report -- Called with [size, dir_count, file_count] deltas while walking (default: {None})
+        report_every -- Entries between two report calls (default: {1000})
+
+    Returns:
+        list -- [size, dir_count, file_count]
+    """
+    totals = [0, 0, 0]
+    delta = [0, 0, 0]
+    pending = 0
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            delta[1] += 1
+                        else:
+                            delta[0] += entry.stat(follow_symlinks=False).st_size
+                            delta[2] += 1
+                    except OSError:
+                        # deleted during the scan, the rest of the directory still counts
+                        continue
+                    pending += 1
+                    if report is not None and pending >= report_every:
+                        report(delta)
+                        totals = [t + d for t, d in zip(totals, delta)]
+                        delta = [0, 0, 0]
+                        pending = 0
+        except OSError:
+            # unreadable or vanished directories are skipped
             continue
-        if i == "]":
-            break
-
-    dir_level = 0
-    for i in line_copy2:
-        if i != "":
-            break
-        dir_level += 1
-
-    dir_level = dir_level // 4
-    return [dir_level, int(bytes_str)]
-
-
-def tree(directory: str) -> list[int]:
-    """Run the tree command on a directory."""
-    depth = 0
-    size = 0
-
-    with subprocess.Popen(
-        ["tree", directory, "-s", "-F"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    ) as p:
-        for line in p.stdout:
-            ret = process_line(line)
-
-            if ret is not None:
-                depth = ret[0]
-                size += ret[1]
-
-        p.stdout.close()
-        print(f"Depth = {depth}")
-        print(convert_bytes(size))
-
-        p.wait()  # Wait for the process to finish
-        if p.returncode != 0:
-            error_output = p.stderr.read()
-            print(f"Error: {error_output}", end="")
+
+    if report is not None and pending:
+        report(delta)
+    return [t + d for t, d in zip(totals, delta)]
+
+
+def tree(directory: str, callback=None, max_workers: int = 8) -> list[int]:
+    """Count the bytes, directories and files below a directory.
+
+    The top-level subdirectories are walked in parallel. Running totals are
+    streamed to the callback as the walk progresses, so callers can show
+    partial results for large trees.
+
+    Arguments:
+        directory -- Directory to walk
+
+    Keyword Arguments:
+        callback -- Called with the running [size, dir_count, file_count] (default: {None})
+        max_workers -- Maximum number of subtrees walked at once (default: {8})
+
+    Returns:
+        list -- [size, dir_count, file_count]
+    """
+    totals = [0, 0, 0]
+    lock = threading.Lock()
+
+    def report(delta: list[int]):
+        with lock:
+            for i, value in enumerate(delta):
+                totals[i] += value
+            current = list(totals)
+        if callback is not None:
+            callback(current)
+
+    subtrees = []
+    top_level = [0, 0, 0]
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subtrees.append(entry.path)
+                    top_level[1] += 1
+                else:
+                    top_level[0] += entry.stat(follow_symlinks=False).st_size
+                    top_level[2] += 1
+            except OSError:
+                continue
+    report(top_level)
+
+    if subtrees:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(subtrees))) as pool:
+            futures = [pool.submit(walk_tree, subtree, report) for subtree in subtrees]
+            # a failed walk raises here instead of leaving the totals short
+            for future in futures:
+                future.result()
+
+    return list(totals)
+
+
+def pack_tree(directory: str, archive_path: str) -> int:
+    """Pack the contents of a directory into a gzipped tar archive.
+
+    Entries are stored relative to the directory, sorted, and owned by root,
+    so the local user's ids never end up on a remote host. File modes are kept.
+    Symlinks are stored as links. The archive is written next to archive_path
+    and moved into place, so a reader never sees a partial archive.
+
+    Arguments:
+        directory -- Directory to pack
+        archive_path -- Where to write the archive
+
+    Returns:
+        int -- Number of files packed
+    """
+    def reset_owner(info: tarfile.TarInfo) -> tarfile.TarInfo:
+        info.uid = info.gid = 0
+        info.uname = info.gname = "root"
+        return info
+
+    files = 0
+    partial = f"{archive_path}.partial"
+    try:
+        with tarfile.open(partial, "w:gz", compresslevel=6) as archive:
+            for root, dirs, names in os.walk(directory):
+                dirs.sort()
+                names.sort()
+                for name in dirs + names:
+                    path = os.path.join(root, name)
+                    archive.add(path, arcname=os.path.relpath(path, directory), recursive=False, filter=reset_owner)
+                files += len(names)
+        os.replace(partial, archive_path)
+    except BaseException:
+        # a failed pack leaves nothing behind
+        try:
+            os.unlink(partial)
+        except FileNotFoundError:
+            pass
+        raise
+    return files
@@ -0,0 +1,108 @@
+"""
+This module contains a bounded-memory store for console output.
+
+Every record is a piece of text with a colour id and a weight id. The text is
+appended to an anonymous spill file and a fixed-width record holding its offset,
+length and ids is appended to an index file, so record n can always be read back
+with two seeks. The most recent records are also kept in a ring buffer and are
+read from memory. Memory use does not depend on how many records were written.
+"""
+
+import os
+import struct
+import tempfile
+from typing import List, Tuple
+
+# text offset, text length, colour id, weight id
+RECORD = struct.Struct("<QIBB")
+
+Line = Tuple[str, int, int]
+
+
+class LineStore:
+    def __init__(self, spill_dir: str = "", capacity: int = 10_000):
+        """
+        Keyword Arguments:
+            spill_dir -- Directory for the spill files, they are deleted on close (default: {system temp})
+            capacity -- Records kept in memory (default: {10_000})
+        """
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.text_file = tempfile.TemporaryFile(dir=spill_dir or None)
+        self.index_file = tempfile.TemporaryFile(dir=spill_dir or None)
+        self.capacity = capacity
+        self.ring: List[Line | None] = [None] * capacity
+        self.count = 0
+        self.text_size = 0
+        self.unflushed = False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, text: str, color_id: int = 0, weight_id: int = 0):
+        data = text.encode("utf-8")
+        self.text_file.write(data)
+        self.index_file.write(RECORD.pack(self.text_size, len(data), color_id, weight_id))
+        self.text_size += len(data)
+        self.ring[self.count % self.capacity] = (text, color_id, weight_id)
+        self.count += 1
+        self.unflushed = True
+
+    def get(self, start: int, stop: int) -> List[Line]:
+        """Get the records from start up to but not including stop.
+
+        Arguments:
+            start -- Index of the first record
+            stop -- Index after the last record
+
+        Returns:
+            list -- (text, colour id, weight id) tuples
+        """
+        start = max(start, 0)
+        stop = min(stop, self.count)
+        if start >= stop:
+            return []
+
+        in_memory = min(max(self.count - self.capacity, start), stop)
+        lines: List[Line] = []
+        if start < in_memory:
+            lines.extend(self.read(start, in_memory))
+        for index in range(in_memory, stop):
+            lines.append(self.ring[index % self.capacity])
+        return lines
+
+    def read(self, start: int, stop: int) -> List[Line]:
+        """Read a range of records back from the spill files."""
+        if self.unflushed:
+            self.text_file.flush()
+            self.index_file.flush()
+            self.unflushed = False
+
+        self.index_file.seek(start * RECORD.size)
+        records = list(RECORD.iter_unpack(self.index_file.read((stop - start) * RECORD.size)))
+        # the records are contiguous, so the texts are read in one go
+        first_offset = records[0][0]
+        last_offset, last_length = records[-1][0], records[-1][1]
+        self.text_file.seek(first_offset)
+        block = self.text_file.read(last_offset + last_length - first_offset)
+        self.text_file.seek(0, os.SEEK_END)
+        self.index_file.seek(0, os.SEEK_END)
+
+        lines: List[Line] = []
+        for offset, length, color_id, weight_id in records:
+            position = offset - first_offset
+            lines.append((block[position : position + length].decode("utf-8"), color_id, weight_id))
+        return lines
+
+    def clear(self):
+        self.text_file.truncate(0)
+        self.index_file.truncate(0)
+        self.text_file.seek(0)
+        self.index_file.seek(0)
+        self.ring = [None] * self.capacity
+        self.count = 0
+        self.text_size = 0
+
+    def close(self):
+        self.text_file.close()
+        self.index_file.close()
@@ -0,0 +1,111 @@
+"""
+This module contains functions for maintaining a manifest of a directory.
+
+The manifest is a yaml file that records the size, mtime, inode and content
+hash of every file below a directory, keyed by relative path:
+
+    files:
+      hosts/server_one/etc/fstab:
+        hash: 5c4f...
+        inode: 1837462
+        mtime: 1723456789000000000
+        size: 512
+
+Updating it only re-hashes files whose stat signature changed since the last
+update, and reports which files were added, modified or removed.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from . import filemanager, yamlmanager
+
+# files at least this large are hashed on the thread pool
+LARGE_FILE = 1 << 20
+
+
+def scan(directory: str) -> Dict[str, Dict[str, int]]:
+    """Stat every regular file below a directory, without following symlinks."""
+    entries: Dict[str, Dict[str, int]] = {}
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as items:
+                for item in items:
+                    if item.is_dir(follow_symlinks=False):
+                        stack.append(item.path)
+                    elif item.is_file(follow_symlinks=False):
+                        stat = item.stat(follow_symlinks=False)
+                        entries[os.path.relpath(item.path, directory)] = {
+                            "size": stat.st_size,
+                            "mtime": stat.st_mtime_ns,
+                            "inode": stat.st_ino,
+                        }
+        except OSError:
+            continue
+    return entries
+
+
+def read(manifest_path: str) -> Dict[str, Dict]:
+    """Get the recorded files of a manifest, or nothing if it has none yet."""
+    files = yamlmanager.read(manifest_path).get("files")
+    if not isinstance(files, dict):
+        return {}
+    return files
+
+
+def update(manifest_path: str, directory: str, max_workers: int = 4) -> Dict[str, List[str]]:
+    """Bring the manifest up to date with the directory.
+
+    Files with an unchanged size, mtime and inode keep their recorded hash.
+    The others are hashed, large files in parallel. A file whose stat changed
+    but whose contents did not is not reported as modified.
+
+    Arguments:
+        manifest_path -- The manifest file, usually the project's tree.yaml
+        directory -- The directory the manifest describes
+
+    Keyword Arguments:
+        max_workers -- Maximum number of large files hashed at once (default: {4})
+
+    Returns:
+        dict -- Sorted relative paths under "added", "modified" and "removed"
+    """
+    previous = read(manifest_path)
+    current = scan(directory)
+
+    stale = []
+    for path, entry in current.items():
+        old = previous.get(path)
+        if old is not None and all(old.get(key) == entry[key] for key in ("size", "mtime", "inode")):
+            entry["hash"] = old.get("hash")
+        else:
+            stale.append(path)
+
+    small = [path for path in stale if current[path]["size"] < LARGE_FILE]
+    large = [path for path in stale if current[path]["size"] >= LARGE_FILE]
+
+    def hash_file(path: str):
+        try:
+            current[path]["hash"] = filemanager.file_hash(os.path.join(directory, path))
+        except OSError:
+            # removed while the manifest was being updated
+            current.pop(path, None)
+
+    for path in small:
+        hash_file(path)
+    if large:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(large))) as pool:
+            list(pool.map(hash_file, large))
+
+    modified = [path for path in stale if path in current and path in previous]
+    changes: Dict[str, List[str]] = {
+        "added": sorted(path for path in current if path not in previous),
+        "modified": sorted(path for path in modified if previous[path].get("hash") != current[path]["hash"]),
+        "removed": sorted(path for path in previous if path not in current),
+    }
+
+    if stale or changes["removed"]:
+        yamlmanager.dump(manifest_path, {"files": current})
+    return changes
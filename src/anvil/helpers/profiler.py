@@ -0,0 +1,139 @@
+"""
+This module records how long each phase of startup takes for ``anvil --profile-startup``.
+
+It is imported first by the anvil package and only uses the standard library,
+so the time spent importing everything else can be measured. When the flag is
+not given every function here returns straight away.
+
+Per-import timings come from a separate ``python -X importtime -c "import anvil.gui"``
+run, since that data can only be collected when the interpreter starts.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+FLAG = "--profile-startup"
+
+enabled = any(arg == FLAG or arg.startswith(f"{FLAG}=") for arg in sys.argv[1:])
+origin = time.perf_counter()
+phases: List[Dict] = []
+depth = 0
+
+
+def report_path(temp_dir: str) -> str:
+    """Get the report path given with --profile-startup=PATH, or a timestamped one in temp_dir."""
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"{FLAG}="):
+            return arg.split("=", 1)[1]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(temp_dir, f"startup-profile-{stamp}.yaml")
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time the enclosed block as a startup phase. Phases may be nested.
+
+    Arguments:
+        name -- Shown in the report
+    """
+    global depth
+    if not enabled:
+        yield
+        return
+    entry = {"phase": name, "depth": depth, "start_ms": elapsed_ms(), "duration_ms": 0.0}
+    phases.append(entry)
+    depth += 1
+    try:
+        yield
+    finally:
+        depth -= 1
+        entry["duration_ms"] = round(elapsed_ms() - entry["start_ms"], 3)
+
+
+def elapsed_ms() -> float:
+    return round((time.perf_counter() - origin) * 1000, 3)
+
+
+def import_times(module: str = "anvil") -> List[Dict]:
+    """Import a module in a fresh interpreter with -X importtime and parse the output.
+
+    Arguments:
+        module -- The module to import (default: {"anvil"})
+
+    Returns:
+        list -- One entry per imported module, in the order the imports finished
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time:       self [us] |   cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        imports.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+            }
+        )
+    return imports
+
+
+def finish(temp_dir: str, top: int = 25) -> str:
+    """Write the report and print a summary. Called once the GUI event loop is running.
+
+    Arguments:
+        temp_dir -- Where the report goes unless a path was given with the flag
+
+    Keyword Arguments:
+        top -- How many of the slowest imports to print (default: {25})
+
+    Returns:
+        str -- The report path, or an empty string when profiling is off
+    """
+    if not enabled:
+        return ""
+    from . import yamlmanager
+
+    total_ms = elapsed_ms()
+    # anvil itself no longer loads the GUI, so profile the package the app starts from
+    imports = import_times("anvil.gui")
+    path = report_path(temp_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    yamlmanager.dump(
+        path,
+        {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "total_ms": total_ms,
+            "phases": phases,
+            "imports": imports,
+        },
+    )
+
+    print(f"Startup took {total_ms:.1f} ms")
+    for entry in phases:
+        indent = "  " * entry["depth"]
+        print(f"  {entry['duration_ms']:9.1f} ms  {indent}{entry['phase']}")
+    print("Slowest imports (cumulative, fresh interpreter):")
+    for entry in sorted(imports, key=lambda item: item["cumulative_us"], reverse=True)[:top]:
+        print(f"  {entry['cumulative_us'] / 1000:9.1f} ms  {entry['module']}")
+    print(f"Report written to {path}")
+    return path
@@ -0,0 +1,135 @@
+"""
+This module contains functions for caching parsed files as binary snapshots.
+
+A snapshot file holds two pickles: a small header with the signature of the
+source file and the pickled object itself. The header is checked first, so a
+stale snapshot is rejected without unpickling its payload. The signature
+includes the source's absolute path, since parsed objects may hold paths
+derived from it, so a snapshot is never loaded for a copy of the file.
+
+Unpickling runs code, so a snapshot is only loaded if it belongs to this user
+and neither it nor its directory can be written by anyone else.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from typing import Any
+
+from .filemanager import file_hash
+
+# bump when the layout of pickled objects changes
+VERSION = 2
+PROTOCOL = 5
+
+
+def snapshot_path(source_path: str, name: str) -> str:
+    """Get where the snapshot of a source file goes in TEMP_DIR/snapshots.
+
+    Arguments:
+        source_path -- The file the snapshot caches
+        name -- Readable part of the file name, e.g. the project name
+
+    Returns:
+        str -- A path unique to the absolute path of the source
+    """
+    key = hashlib.blake2b(os.path.abspath(source_path).encode(), digest_size=8).hexdigest()
+    return os.path.join(os.getenv("TEMP_DIR", "/tmp/anvil"), "snapshots", f"{name}-{key}.inventory")
+
+
+def signature(file_path: str) -> dict:
+    """Get the version, absolute path, mtime, size and content hash of a source file."""
+    stat = os.stat(file_path)
+    return {
+        "version": VERSION,
+        "path": os.path.abspath(file_path),
+        "mtime": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hash": file_hash(file_path),
+    }
+
+
+def private(stat_result: os.stat_result) -> bool:
+    """Owned by this user and not writable by the group or others."""
+    return stat_result.st_uid == os.getuid() and not stat_result.st_mode & 0o022
+
+
+def load(snapshot_path: str, source_path: str) -> Any:
+    """Load a snapshot if it is still valid for the source file.
+
+    The snapshot must have been made from the same path. A matching mtime
+    and size is then trusted as is. If only the mtime differs, for example
+    after a git checkout, the content hash decides.
+
+    Returns:
+        The cached object, or None if the snapshot is missing, stale or not private.
+    """
+    try:
+        stat = os.stat(source_path)
+        if not private(os.stat(os.path.dirname(os.path.abspath(snapshot_path)))):
+            return None
+        with open(snapshot_path, "rb") as file:
+            if not private(os.fstat(file.fileno())):
+                return None
+            header = pickle.load(file)
+            if header.get("version") != VERSION or header.get("size") != stat.st_size:
+                return None
+            if header.get("path") != os.path.abspath(source_path):
+                return None
+            if header.get("mtime") != stat.st_mtime_ns and header.get("hash") != file_hash(source_path):
+                return None
+            return pickle.load(file)
+
+    # TypeError and ValueError come from objects whose layout changed without a VERSION bump
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+        return None
+
+
+def save(snapshot_path: str, source_path: str, obj: Any, background: bool = True):
+    """Write a snapshot of an object parsed from the source file.
+
+    The object is pickled right away, so later changes to it do not leak
+    into the snapshot. Writing the file happens on a background thread
+    unless background is False.
+    """
+    try:
+        header = pickle.dumps(signature(source_path), protocol=PROTOCOL)
+    except OSError:
+        return
+    payload = pickle.dumps(obj, protocol=PROTOCOL)
+
+    if background:
+        threading.Thread(target=write, args=(snapshot_path, header, payload), daemon=True).start()
+    else:
+        write(snapshot_path, header, payload)
+
+
+def write(snapshot_path: str, header: bytes, payload: bytes):
+    """Atomically write a snapshot file."""
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        directory_stat = os.stat(directory)
+        if directory_stat.st_uid == os.getuid() and directory_stat.st_mode & 0o077:
+            # made by an older version with the default mode
+            os.chmod(directory, 0o700)
+        elif not private(directory_stat):
+            print(f"Not writing snapshot {snapshot_path}: {directory} is not private to this user")
+            return
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            file.write(payload)
+        os.replace(temp_path, snapshot_path)
+    except OSError as e:
+        print(f"Error writing snapshot {snapshot_path}: {e}")
+
+
+def delete(snapshot_path: str):
+    """Remove a snapshot if it exists."""
+    try:
+        os.unlink(snapshot_path)
+    except FileNotFoundError:
+        pass
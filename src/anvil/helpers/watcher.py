@@ -0,0 +1,222 @@
+"""
+This module contains a filesystem watcher.
+
+On Linux the watcher uses inotify through ctypes. Elsewhere, or when inotify
+is unavailable (for example when the watch limit is reached), it falls back
+to polling the watched trees. Changed paths are collected and handed to the
+callback in one batch once the trees have been quiet for the debounce delay.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyBackend:
+    def __init__(self, roots: List[Tuple[str, bool]]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.watches: Dict[int, str] = {}
+        try:
+            for root, recursive in roots:
+                self.add_tree(root, recursive)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, path: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.watches[wd] = path
+
+    def add_tree(self, root: str, recursive: bool = True):
+        if not os.path.isdir(root):
+            return
+        self.add_watch(root)
+        if not recursive:
+            return
+        for dir_path, dir_names, _ in os.walk(root):
+            for dir_name in dir_names:
+                self.add_watch(os.path.join(dir_path, dir_name))
+
+    def wait(self, timeout: float) -> Set[str]:
+        changed: Set[str] = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            # events were dropped, so anything under the roots may have changed
+            if mask & IN_Q_OVERFLOW:
+                self.overflow(changed)
+                continue
+            directory = self.watches.get(wd)
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            changed.add(path)
+            # start watching directories created inside a watched tree
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self.add_tree(path)
+                except OSError:
+                    pass
+        return changed
+
+    def overflow(self, changed: Set[str]):
+        """Report every root as changed and watch directories whose creation was missed."""
+        for root, recursive in self.roots:
+            changed.add(root)
+            try:
+                self.add_tree(root, recursive)
+            except OSError:
+                pass
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingBackend:
+    def __init__(self, roots: List[Tuple[str, bool]], interval: float = 1.0):
+        self.roots = roots
+        self.interval = interval
+        self.state = self.scan()
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        state: Dict[str, Tuple[int, int]] = {}
+        for root, recursive in self.roots:
+            stack = [root]
+            while stack:
+                try:
+                    with os.scandir(stack.pop()) as entries:
+                        for entry in entries:
+                            stat = entry.stat(follow_symlinks=False)
+                            state[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                            if recursive and entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                except OSError:
+                    continue
+        return state
+
+    def wait(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        state = self.scan()
+        previous = self.state
+        self.state = state
+        changed = {path for path, signature in state.items() if previous.get(path) != signature}
+        changed.update(path for path in previous if path not in state)
+        return changed
+
+    def close(self):
+        pass
+
+
+class Watcher:
+    """Watch directories and report changed paths in debounced batches.
+
+    The callback runs on the watcher thread with a sorted list of the paths
+    that changed. GUI code should forward it to the GUI thread, for
+    example through a Qt signal.
+
+    Example:
+        watcher = Watcher(callback)
+        watcher.watch("/tmp/anvil/data/demo/inventory")
+        watcher.start()
+    """
+
+    def __init__(self, callback: Callable[[List[str]], None], debounce: float = 0.3, poll_interval: float = 1.0):
+        self.callback = callback
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.roots: List[Tuple[str, bool]] = []
+        self.backend: InotifyBackend | PollingBackend | None = None
+        self.stop_event = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def watch(self, path: str, recursive: bool = True):
+        """Add a directory to watch. Must be called before start()."""
+        self.roots.append((path, recursive))
+
+    def start(self):
+        self.backend = self.make_backend()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="anvil-watcher", daemon=True)
+        self.thread.start()
+
+    def make_backend(self) -> InotifyBackend | PollingBackend:
+        if sys.platform.startswith("linux"):
+            try:
+                return InotifyBackend(self.roots)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable, polling for changes instead: {e}")
+        return PollingBackend(self.roots, self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def run(self):
+        pending: Set[str] = set()
+        last_change = 0.0
+        while not self.stop_event.is_set():
+            timeout = self.debounce if pending else 0.5
+            changed = self.backend.wait(timeout)
+            if changed:
+                pending.update(changed)
+                last_change = time.monotonic()
+            elif pending and time.monotonic() - last_change >= self.debounce:
+                batch = sorted(pending)
+                pending = set()
+                try:
+                    self.callback(batch)
+                except Exception as e:
+                    print(f"Error handling file changes: {e}")
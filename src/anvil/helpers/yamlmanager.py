@@ -1,26 +1,290 @@
+import copy
+import json
+import marshal
+import os
+import pickle
+import stat
 import sys
-from typing import Any, Dict
+import tempfile
+import textwrap
+import threading
+from typing import IO, Any, Dict, List, Tuple
 
 import yaml
 from yaml.representer import RepresenterError
 
+try:
+    # libyaml bindings, several times faster than the pure Python classes
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
 
-def read(item_path, key: str = "") -> Dict[str, Any]:
+    LIBYAML = True
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+    LIBYAML = False
+
+
+class Backend:
+    """A serialization format for documents read and written by this module."""
+
+    name = ""
+    binary = False
+
+    def load(self, file: IO) -> Any:
+        raise NotImplementedError
+
+    def dump(self, data: Any, file: IO):
+        raise NotImplementedError
+
+
+class YamlBackend(Backend):
+    """Safe YAML, through libyaml when it is available."""
+
+    name = "yaml"
+
+    def __init__(self, loader=SafeLoader, dumper=SafeDumper):
+        self.loader = loader
+        self.dumper = dumper
+
+    def load(self, file: IO) -> Any:
+        return yaml.load(file, Loader=self.loader)
+
+    def dump(self, data: Any, file: IO):
+        yaml.dump(data, file, Dumper=self.dumper)
+
+
+class JsonBackend(Backend):
+    """JSON, for internal caches that are never edited by hand."""
+
+    name = "json"
+
+    def load(self, file: IO) -> Any:
+        return json.load(file)
+
+    def dump(self, data: Any, file: IO):
+        json.dump(data, file, separators=(",", ":"))
+
+
+class PickleBackend(Backend):
+    """Pickle, the fastest option for internal caches."""
+
+    name = "pickle"
+    binary = True
+
+    def load(self, file: IO) -> Any:
+        return pickle.load(file)
+
+    def dump(self, data: Any, file: IO):
+        pickle.dump(data, file, protocol=5)
+
+
+BACKENDS: Dict[str, Backend] = {
+    "yaml": YamlBackend(),
+    "json": JsonBackend(),
+    "pickle": PickleBackend(),
+}
+EXTENSIONS = {
+    ".json": "json",
+    ".pickle": "pickle",
+    ".pkl": "pickle",
+}
+
+
+def get_backend(file_path: str, backend: str = "") -> Backend:
+    """Get a backend by name, or by the file extension when no name is given.
+
+    Files without a known extension are YAML.
+    """
+    if not backend:
+        backend = EXTENSIONS.get(os.path.splitext(file_path)[1], "yaml")
+    return BACKENDS[backend]
+
+
+def load(file_path: str, backend: str = "") -> Any:
+    """Parse a file with its backend, without any error handling."""
+    file_backend = get_backend(file_path, backend)
+    if file_backend.binary:
+        with open(file_path, "rb") as file:
+            return file_backend.load(file)
+    with open(file_path, "r", encoding="utf-8") as file:
+        return file_backend.load(file)
+
+
+# Parsed documents by absolute path, with the signature of the file (and its
+# journal) they were parsed from. Entries are only ever handed out as copies.
+cache: Dict[str, Tuple[Tuple[int, ...], Any]] = {}
+cache_stats = {"hits": 0, "misses": 0}
+cache_lock = threading.Lock()
+
+
+# compact a journal into its file once it grows past this many bytes
+JOURNAL_LIMIT = 64 * 1024
+
+
+def file_signature(file_path: str) -> Tuple[int, ...]:
+    """Get the (mtime, size, inode) of a file, plus (mtime, size) of its journal."""
+    stat_result = os.stat(file_path)
+    signature: Tuple[int, ...] = (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+    try:
+        journal_stat = os.stat(journal_path(file_path))
+        signature += (journal_stat.st_mtime_ns, journal_stat.st_size)
+    except FileNotFoundError:
+        pass
+    return signature
+
+
+def copy_document(data: Any) -> Any:
+    """Deep copy a parsed document.
+
+    marshal copies plain containers and scalars much faster than deepcopy,
+    which is kept for anything else, such as YAML timestamps.
+    """
+    try:
+        return marshal.loads(marshal.dumps(data))
+    except ValueError:
+        return copy.deepcopy(data)
+
+
+def cached_load(file_path: str, backend: str = "") -> Any:
+    """Parse a file, or return the cached document if the file is unchanged.
+
+    The returned document is shared with the cache and must not be modified.
+    """
+    path = os.path.abspath(file_path)
+    signature = file_signature(path)
+    with cache_lock:
+        entry = cache.get(path)
+        if entry is not None and entry[0] == signature:
+            cache_stats["hits"] += 1
+            return entry[1]
+        cache_stats["misses"] += 1
+
+    data = replay(path, load(path, backend))
+    with cache_lock:
+        cache[path] = (signature, data)
+    return data
+
+
+def cache_store(file_path: str, data: Any):
+    """Write-through: remember a document that was just written to a file."""
+    path = os.path.abspath(file_path)
+    with cache_lock:
+        cache[path] = (file_signature(path), copy_document(data))
+
+
+def cache_info() -> dict:
+    """Get the hit/miss counters and the number of cached documents."""
+    with cache_lock:
+        return {**cache_stats, "documents": len(cache)}
+
+
+def clear_cache(file_path: str = ""):
+    """Forget one cached document, or all of them."""
+    with cache_lock:
+        if file_path:
+            cache.pop(os.path.abspath(file_path), None)
+        else:
+            cache.clear()
+
+
+def journal_path(file_path: str) -> str:
+    return f"{file_path}.journal"
+
+
+def apply_entry(data: dict, keys: List[str], value: Any):
+    """Set a nested key, creating the parent mappings as needed."""
+    target = data
+    for key in keys[:-1]:
+        if not isinstance(target.get(key), dict):
+            target[key] = {}
+        target = target[key]
+    target[keys[-1]] = value
+
+
+def replay(file_path: str, data: Any) -> Any:
+    """Apply the journal of a file, if it has one, to its parsed data.
+
+    Torn lines, left by a crash in the middle of an append, are skipped.
+    """
+    try:
+        with open(journal_path(file_path), "r", encoding="utf-8") as file:
+            lines = file.readlines()
+    except FileNotFoundError:
+        return data
+
+    if not isinstance(data, dict):
+        data = {}
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        apply_entry(data, entry["keys"], entry["value"])
+    return data
+
+
+def journal(file_path: str, keys: List[str], value: Any):
+    """Update one nested key of a yaml file through its append-only journal.
+
+    The change is appended to "<file_path>.journal" and synced, which costs
+    the same no matter how large the file is. The journal is replayed when
+    the file is read and folded back into the file by compact(), which
+    happens automatically once the journal passes JOURNAL_LIMIT bytes.
+
+    Example:
+        journal("config.yaml", ["ProjectData", "selected_project"], "demo")
+    """
+    path = os.path.abspath(file_path)
+    line = (json.dumps({"keys": keys, "value": value}) + "\n").encode("utf-8")
+
+    with cache_lock:
+        signature = file_signature(path)
+        with open(journal_path(path), "a+b") as file:
+            # start on a fresh line if a crash left a torn entry behind
+            if file.seek(0, os.SEEK_END):
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    line = b"\n" + line
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # keep a cached document that was current before the append
+        entry = cache.pop(path, None)
+        if entry is not None and entry[0] == signature and isinstance(entry[1], dict):
+            apply_entry(entry[1], keys, copy_document(value))
+            cache[path] = (file_signature(path), entry[1])
+
+    if os.path.getsize(journal_path(path)) > JOURNAL_LIMIT:
+        compact(path)
+
+
+def compact(file_path: str):
+    """Fold the journal of a file into the file and remove the journal."""
+    if not os.path.exists(journal_path(file_path)):
+        return
+    dump(file_path, copy_document(cached_load(file_path)))
+
+
+def read(item_path, key: str = "", backend: str = "") -> Dict[str, Any]:
     """Get data from the yaml file.
     If key is provided, return the value of that key.
+
+    Unchanged files are served from the document cache, so repeated reads
+    cost a stat call instead of a parse.
     """
 
     try:
-        with open(item_path, "r", encoding="utf-8") as file:
-            data: Dict[str, Any] = yaml.safe_load(file)
+        data: Dict[str, Any] = cached_load(item_path, backend)
 
         if not data:
             return {}
 
         if key:
-            return data.get(key, {})
+            return copy_document(data.get(key, {}))
 
-        return data
+        return copy_document(data)
 
     except FileNotFoundError:
         print(f"File not found: {item_path}")
@@ -31,22 +295,124 @@ def read(item_path, key: str = "") -> Dict[str, Any]:
         sys.exit(1)
 
 
-def write(file_path: str, data: dict, key: str = ""):
+def atomic_write(file_path: str, write_function, binary: bool = False):
+    """Atomically replace a file with what write_function writes to an open file.
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and renamed over the target, so readers never see a partial file.
+    Any journal of the file is removed, the new contents supersede it.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        if binary:
+            file = os.fdopen(fd, "wb")
+        else:
+            file = os.fdopen(fd, "w", encoding="utf-8")
+        with file:
+            write_function(file)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            os.chmod(temp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    if os.path.exists(journal_path(file_path)):
+        os.unlink(journal_path(file_path))
+
+
+def dump(file_path: str, data: dict, backend: str = ""):
+    """Atomically replace a yaml file with the provided data."""
+    file_backend = get_backend(file_path, backend)
+    atomic_write(file_path, lambda file: file_backend.dump(data, file), file_backend.binary)
+    cache_store(file_path, data)
+
+
+def dump_text(file_path: str, text: str):
+    """Atomically replace a file with already serialized text, see dump_fragment().
+
+    The cached document of the file is dropped rather than rebuilt, so the
+    cost of a write only depends on the size of the text.
+    """
+    atomic_write(file_path, lambda file: file.write(text))
+    clear_cache(file_path)
+
+
+def dump_fragment(data: dict, indent: int = 0) -> str:
+    """Serialize a mapping as block yaml, indented to nest under a parent key.
+
+    Fragments dumped with the right indent can be joined into a document, so
+    a large file can be rebuilt from cached pieces.
+
+    Arguments:
+        data -- Mapping to serialize
+
+    Keyword Arguments:
+        indent -- Spaces added in front of every line (default: {0})
+
+    Returns:
+        str -- The yaml lines, ending with a newline
+    """
+    # keys stay in document order, so dump_entries() can match entries to keys
+    text = yaml.dump(data, Dumper=SafeDumper, default_flow_style=False, sort_keys=False)
+    if indent:
+        text = textwrap.indent(text, " " * indent)
+    return text
+
+
+def dump_entries(data: dict, indent: int = 0) -> List[str]:
+    """Serialize each entry of a mapping as its own fragment, with a single dump.
+
+    One dump of the whole mapping is much faster than one per entry. Its
+    lines are split where a key starts at the left margin.
+
+    Returns:
+        list -- One dump_fragment() result per key, in the order of data
+    """
+    text = dump_fragment(data)
+    entries: List[str] = []
+    start = 0
+    position = text.find("\n") + 1
+    while 0 < position < len(text):
+        # values are indented, blank lines belong to multi-line scalars and ": " continues a long "? key"
+        if text[position] not in " :\n":
+            entries.append(text[start:position])
+            start = position
+        position = text.find("\n", position) + 1
+    entries.append(text[start:])
+    if len(entries) != len(data):
+        # a layout this split does not understand, e.g. an empty mapping
+        return [dump_fragment({key: value}, indent) for key, value in data.items()]
+    if indent:
+        entries = [textwrap.indent(entry, " " * indent) for entry in entries]
+    return entries
+
+
+def key_line(key: Any, indent: int = 0) -> str:
+    """Serialize a mapping key that opens a block, e.g. "all:\\n"."""
+    # "key: {}\n" with the empty flow mapping cut off, which quotes the key when needed
+    return dump_fragment({key: {}}, indent)[: -len(" {}\n")] + "\n"
+
+
+def write(file_path: str, data: dict, key: str = "", backend: str = ""):
     """Overwrite a yaml file with the provided data."""
 
-    data_to_write = read(file_path)
+    data_to_write = read(file_path, backend=backend)
     if key:
         data_to_write[key] = data
     else:
         data_to_write = data
 
-    with open(file_path, "w", encoding="utf-8") as file:
-        yaml.safe_dump(data_to_write, file)
+    dump(file_path, data_to_write, backend)
 
 
-def update(file_path: str, key: str, value):
+def update(file_path: str, key: str, value, backend: str = ""):
     """Update a yaml file with the provided key and value."""
-    read_data = read(file_path)
+    read_data = read(file_path, backend=backend)
 
     if key in read_data and isinstance(read_data[key], dict):
         read_data[key].update(value)
@@ -54,8 +420,7 @@ def update(file_path: str, key: str, value):
         read_data[key] = value
 
     try:
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.safe_dump(read_data, file)
+        dump(file_path, read_data, backend)
 
     except RepresenterError as e:
         print(e)
@@ -67,16 +432,15 @@ def update(file_path: str, key: str, value):
         print(f"An unexpected error occurred: {e}")
 
 
-def delete(file_path: str, key: str):
+def delete(file_path: str, key: str, backend: str = ""):
     """Delete a key from a yaml file."""
-    read_data = read(file_path)
+    read_data = read(file_path, backend=backend)
 
     if key in read_data:
         del read_data[key]
 
     try:
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.safe_dump(read_data, file)
+        dump(file_path, read_data, backend)
 
     except RepresenterError as e:
         print(e)
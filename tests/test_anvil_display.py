@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("ansible_runner")
+pytest.importorskip("ansible")
+
+from anvil.ansible import PlayBuilder  # noqa: E402
+from anvil.ansible.ansible import anvilrun  # noqa: E402
+from anvil.ansible.callback.anvil_display import trim_event  # noqa: E402
+from anvil.ansible.server import stop_servers  # noqa: E402
+
+
+def test_trim_event_drops_what_anvil_does_not_read():
+    res = {
+        "rc": 0,
+        "stdout": "a\nb",
+        "stdout_lines": ["a", "b"],
+        "stderr": "",
+        "invocation": {"module_args": {"cmd": "x"}},
+        "results": [{"item": 1, "stdout": "c", "stdout_lines": ["c"], "invocation": {}}],
+    }
+    event = {
+        "uuid": "u",
+        "parent_uuid": "p",
+        "event_data": {"uuid": "u", "task_uuid": "t", "play_uuid": "p", "playbook_uuid": "b", "res": res},
+    }
+    trim_event(event)
+
+    assert event["uuid"] == "u" and event["parent_uuid"] == "p"
+    assert event["event_data"] == {
+        "res": {"rc": 0, "stdout_lines": ["a", "b"], "stderr": "", "results": [{"item": 1, "stdout_lines": ["c"]}]}
+    }
+    # the result other callbacks see is left alone
+    assert "invocation" in res and "stdout" in res and "invocation" in res["results"][0]
+
+
+def test_normal_runs_send_trimmed_events_and_show_the_same_output(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "inventory")
+    (tmp_path / "inventory" / "hosts").write_text(
+        f"localhost ansible_connection=local ansible_python_interpreter={sys.executable}\n"
+    )
+    monkeypatch.setattr(PlayBuilder, "private_data_dir", str(tmp_path))
+    monkeypatch.setattr(PlayBuilder, "gather_facts", False)
+    # the server runs this interpreter with anvil importable
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")])))
+
+    messages = {}
+    results = {}
+    try:
+        for verbosity in ("full", "normal"):
+            play = PlayBuilder()
+            play.verbosity = verbosity
+            play.playbook["become"] = False
+            play.hosts.append("localhost")
+            play.shell(["printf 'one\\ntwo\\n'"])
+            play.shell(["echo out", "echo err >&2"], fused=True)
+            messages[verbosity] = []
+            results[verbosity] = []
+            runner = anvilrun(
+                play,
+                messages[verbosity].append,
+                result_callback=lambda event, event_data, found=results[verbosity]: found.append(event_data),
+            )
+            assert runner.status == "successful"
+    finally:
+        stop_servers()
+
+    # the fused task reports each command's duration, which differs between runs
+    assert [m for m in messages["normal"] if " ms" not in m["text"]] == [
+        m for m in messages["full"] if " ms" not in m["text"]
+    ]
+    assert "invocation" in results["full"][0]["res"] and "stdout" in results["full"][0]["res"]
+    for event_data in results["normal"]:
+        assert "task_uuid" not in event_data
+        assert "invocation" not in event_data["res"]
+        assert "stdout" not in event_data["res"] and "stderr" not in event_data["res"]
+    assert results["normal"][0]["res"]["stdout_lines"] == ["one", "two"]
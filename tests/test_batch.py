@@ -0,0 +1,60 @@
+import threading
+
+from anvil.ansible import BatchQueue, RunScheduler
+
+# host -> result each action's tasks get, by action label
+OUTCOMES = {
+    "uptime": {"host1": "ok", "host2": "ok"},
+    "restart": {"host1": "changed", "host2": "failed"},
+    "cleanup": {"host1": "skipped", "host2": "changed"},
+}
+
+
+def fake_runner(job):
+    """Send result events the way ansible would for the batched play."""
+    job.result_callback("runner_on_ok", {"task": "Gathering Facts", "host": "host1", "res": {}})
+    for block in job.play.playbook["tasks"]:
+        label = block["name"].split(" [#")[0]
+        for task in block["block"]:
+            for host, result in OUTCOMES[label].items():
+                event = "runner_on_ok" if result == "changed" else f"runner_on_{result}"
+                res = {"changed": result == "changed"}
+                job.result_callback(event, {"task": task["name"], "host": host, "res": res})
+            if label == "restart":
+                # the rescue runs after the failure on host2, later actions still run there
+                job.result_callback("runner_on_ok", {"task": block["rescue"][0]["name"], "host": "host2", "res": {}})
+
+
+def test_results_are_attributed_to_the_action_they_came_from():
+    messages = []
+    done = threading.Semaphore(0)
+    queue = BatchQueue(RunScheduler(runner=fake_runner), progress_callback=messages.append, window=0)
+
+    def add(label, commands, targets=("host1", "host2")):
+        return queue.add(targets, label, lambda play: play.shell(commands), lambda action: done.release())
+
+    # the same targets in any order share a batch
+    uptime = add("uptime", ["uptime"], targets=("host2", "host1"))
+    restart = add("restart", ["systemctl restart nginx", "true"])
+    cleanup = add("cleanup", ["rm -f /tmp/x"])
+    assert queue.pending_count() == 3
+    (job,) = queue.flush()
+    for _ in range(3):
+        assert done.acquire(timeout=5)
+
+    # one play, one block with a rescue per action
+    assert [block["name"] for block in job.play.playbook["tasks"]] == [
+        f"uptime [#{uptime.id}]",
+        f"restart [#{restart.id}]",
+        f"cleanup [#{cleanup.id}]",
+    ]
+    assert all(block["rescue"] for block in job.play.playbook["tasks"])
+
+    assert uptime.results == {"host1": "ok", "host2": "ok"}
+    # a failure outranks the rescue's ok on the same host
+    assert restart.results == {"host1": "changed", "host2": "failed"}
+    assert cleanup.results == {"host1": "skipped", "host2": "changed"}
+    assert all(action.state == "finished" for action in (uptime, restart, cleanup))
+
+    summaries = [line["text"] for batch in messages for line in batch]
+    assert summaries == ["uptime: 2 ok\n", "restart: 1 changed, 1 failed\n", "cleanup: 1 skipped, 1 changed\n"]
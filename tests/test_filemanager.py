@@ -0,0 +1,82 @@
+import os
+import tarfile
+
+import pytest
+
+from anvil.helpers import filemanager
+
+
+def make_tree(path):
+    for sub in ("a", "b", "b/c"):
+        os.makedirs(path / sub)
+    for name in ("top.txt", "a/one.txt", "b/two.txt", "b/c/three.txt"):
+        (path / name).write_text("x" * 10)
+
+
+def test_tree_counts_everything(tmp_path):
+    make_tree(tmp_path)
+    assert filemanager.tree(str(tmp_path)) == [40, 3, 4]
+
+
+def test_tree_skips_only_the_entry_that_vanished(tmp_path, monkeypatch):
+    make_tree(tmp_path)
+    (tmp_path / "b" / "gone.txt").write_text("x" * 10)
+    scandir = os.scandir
+
+    class Vanished:
+        def __init__(self, entry):
+            self.entry = entry
+            self.path = entry.path
+
+        def is_dir(self, follow_symlinks=True):
+            return False
+
+        def stat(self, follow_symlinks=True):
+            raise FileNotFoundError(self.path)
+
+    class Entries:
+        def __init__(self, path):
+            self.entries = scandir(path)
+
+        def __enter__(self):
+            # the vanished file comes first, so the rest of its directory must still count
+            entries = sorted(self.entries, key=lambda entry: entry.name != "gone.txt")
+            return [Vanished(entry) if entry.name == "gone.txt" else entry for entry in entries]
+
+        def __exit__(self, *exc):
+            self.entries.close()
+
+    monkeypatch.setattr(filemanager.os, "scandir", Entries)
+    assert filemanager.tree(str(tmp_path)) == [40, 3, 4]
+
+
+def test_tree_raises_errors_from_the_walkers(tmp_path):
+    make_tree(tmp_path)
+    calls = []
+
+    def callback(totals):
+        calls.append(totals)
+        # the first call reports the top level, later ones come from the walkers
+        if len(calls) > 1:
+            raise RuntimeError("callback failed")
+
+    with pytest.raises(RuntimeError):
+        filemanager.tree(str(tmp_path), callback)
+
+
+def test_pack_tree_removes_the_partial_archive_on_failure(tmp_path, monkeypatch):
+    make_tree(tmp_path / "src")
+    add = tarfile.TarFile.add
+
+    def failing_add(self, name, *args, **kwargs):
+        if name.endswith("two.txt"):
+            raise OSError("read error")
+        add(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(tarfile.TarFile, "add", failing_add)
+    archive = tmp_path / "tree.tar.gz"
+    with pytest.raises(OSError):
+        filemanager.pack_tree(str(tmp_path / "src"), str(archive))
+
+    assert not os.path.exists(f"{archive}.partial")
+    assert not os.path.exists(archive)
@@ -0,0 +1,22 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+FORBIDDEN = ["PySide6", "qdarktheme", "ansible_runner"]
+
+
+def imported_packages(module: str) -> set:
+    """Import a module in a fresh interpreter and get the top level packages it loaded."""
+    code = f"import json, sys, {module}; print(json.dumps(sorted({{name.split('.')[0] for name in sys.modules}})))"
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+@pytest.mark.parametrize("module", ["anvil", "anvil.config", "anvil.helpers.yamlmanager", "anvil.ansible"])
+def test_non_gui_modules_skip_qt_and_ansible_runner(module):
+    assert not imported_packages(module) & set(FORBIDDEN)
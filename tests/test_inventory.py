@@ -0,0 +1,140 @@
+import time
+
+import pytest
+import yaml
+
+from anvil.config.inventory import Inventory
+from anvil.helpers import yamlmanager
+
+
+def write_inventory(path, hosts: int):
+    document = {
+        "all": {"hosts": {f"host{i}": {"ansible_host": f"10.0.{i // 256 % 256}.{i % 256}"} for i in range(hosts)}},
+        "web": {"hosts": {f"host{i}": {} for i in range(0, hosts, 2)}, "vars": {"ansible_user": "deploy"}},
+    }
+    yamlmanager.dump(str(path), document)
+
+
+def load_time(tmp_path, hosts: int) -> float:
+    """Best of three setup() times, parsing only."""
+    path = tmp_path / f"hosts{hosts}"
+    write_inventory(path, hosts)
+    best = float("inf")
+    for _ in range(3):
+        inventory = Inventory(str(path), str(tmp_path))
+        start = time.perf_counter()
+        inventory.setup(materialize=False)
+        best = min(best, time.perf_counter() - start)
+    assert len(inventory.hosts) == hosts
+    return best
+
+
+@pytest.fixture
+def inventory(tmp_path):
+    path = tmp_path / "hosts"
+    write_inventory(path, 10)
+    inventory = Inventory(str(path), str(tmp_path))
+    inventory.setup(materialize=False)
+    return inventory
+
+
+def test_setup_scales_linearly(tmp_path):
+    small = load_time(tmp_path, 1_000)
+    large = load_time(tmp_path, 10_000)
+    # 10x the hosts should cost about 10x, a quadratic load would be 100x
+    assert large / small < 30
+
+
+def test_get_host_and_group(inventory):
+    assert inventory.get_host("host3").name == "host3"
+    assert inventory.get_host("missing") is None
+    assert inventory.get_group("web").get_host("host2") is inventory.get_host("host2")
+    assert inventory.get_group("web").get_host("host3") is None
+
+
+def test_group_add_host(inventory):
+    host = inventory.get_host("host3")
+    web = inventory.get_group("web")
+    web.add_host(host)
+    web.add_host(host)
+    assert web.get_host("host3") is host
+    assert host.member_of["web"] is web
+    assert len(web.hosts) == 6
+
+
+def test_rename_host(inventory):
+    host = inventory.get_host("host2")
+    host.name = "renamed"
+    inventory.save_host(host)
+    assert inventory.get_host("host2") is None
+    assert inventory.get_host("renamed") is host
+    assert inventory.get_group("web").get_host("renamed") is host
+    assert inventory.get_group("all").get_host("host2") is None
+
+    document = yamlmanager.read(inventory.path)
+    assert "renamed" in document["all"]["hosts"]
+    assert "renamed" in document["web"]["hosts"]
+    assert "host2" not in document["web"]["hosts"]
+
+
+def test_rename_group(inventory):
+    group = inventory.get_group("web")
+    group.name = "frontend"
+    inventory.save_group(group)
+    assert inventory.get_group("web") is None
+    assert inventory.get_group("frontend") is group
+    assert inventory.get_host("host4").member_of["frontend"] is group
+    assert "web" not in inventory.get_host("host4").member_of
+
+    document = yamlmanager.read(inventory.path)
+    assert "frontend" in document and "web" not in document
+
+
+def test_commit_writes_the_document(inventory):
+    host = inventory.get_host("host1")
+    host.vars["ansible_port"] = "2222"
+    inventory.save_host(host)
+    new_host, _ = inventory.add_host("new: host")
+    inventory.get_group("web").add_host(new_host)
+    inventory.save_host(new_host)
+    web = inventory.get_group("web")
+    web.vars["ansible_user"] = "admin"
+    inventory.save_group(web)
+    inventory.delete_host(inventory.get_host("host4"))
+    empty, _ = inventory.add_group("empty")
+    inventory.save_group(empty)
+
+    with open(inventory.path, encoding="utf-8") as file:
+        written = yaml.safe_load(file)
+    assert written == inventory.document
+    assert written["all"]["hosts"]["host1"]["ansible_port"] == "2222"
+    assert "new: host" in written["web"]["hosts"]
+    assert "host4" not in written["all"]["hosts"] and "host4" not in written["web"]["hosts"]
+    assert written["web"]["vars"]["ansible_user"] == "admin"
+
+
+def test_one_host_save_does_not_reserialize_the_fleet(tmp_path):
+    path = tmp_path / "hosts"
+    write_inventory(path, 5_000)
+    inventory = Inventory(str(path), str(tmp_path))
+    inventory.setup(materialize=False)
+
+    def save(name: str) -> float:
+        host = inventory.get_host(name)
+        host.vars["ansible_port"] = "2222"
+        start = time.perf_counter()
+        inventory.save_host(host)
+        return time.perf_counter() - start
+
+    # the first save serializes everything and fills the fragment cache
+    first = save("host0")
+    later = min(save(f"host{i}") for i in range(1, 6))
+    assert later < first / 10
+
+
+def test_reload_keeps_the_model_when_the_file_is_broken(inventory):
+    with open(inventory.path, "a") as f:
+        f.write("<<<<<<< HEAD\nall: [\n")
+    changes = inventory.reload()
+    assert not any(changes.values())
+    assert inventory.get_host("host0") is not None
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import yaml
+
+from anvil.helpers import yamlmanager
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def make_config(tmp_path) -> str:
+    path = str(tmp_path / "config.yaml")
+    yamlmanager.dump(path, {"ProjectData": {"selected_project": "", "projects": ["demo"]}})
+    return path
+
+
+def on_disk(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def test_journal_is_replayed_on_read(tmp_path):
+    path = make_config(tmp_path)
+    yamlmanager.journal(path, ["ProjectData", "selected_project"], "demo")
+    yamlmanager.journal(path, ["Window", "width"], 800)
+
+    assert on_disk(path)["ProjectData"]["selected_project"] == ""
+    assert os.path.exists(yamlmanager.journal_path(path))
+    yamlmanager.clear_cache()
+    data = yamlmanager.read(path)
+    assert data["ProjectData"] == {"selected_project": "demo", "projects": ["demo"]}
+    assert data["Window"] == {"width": 800}
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = make_config(tmp_path)
+    yamlmanager.journal(path, ["ProjectData", "selected_project"], "demo")
+    # a crash in the middle of an append
+    with open(yamlmanager.journal_path(path), "a", encoding="utf-8") as f:
+        f.write('{"keys": ["ProjectData", "selec')
+
+    yamlmanager.clear_cache()
+    assert yamlmanager.read(path, "ProjectData")["selected_project"] == "demo"
+    # the next entry starts on its own line and is not lost with the torn one
+    yamlmanager.journal(path, ["ProjectData", "projects"], ["demo", "other"])
+    yamlmanager.clear_cache()
+    assert yamlmanager.read(path, "ProjectData") == {"selected_project": "demo", "projects": ["demo", "other"]}
+
+
+def test_journal_is_compacted_past_the_limit(tmp_path, monkeypatch):
+    path = make_config(tmp_path)
+    yamlmanager.journal(path, ["ProjectData", "selected_project"], "project0")
+    entry_size = os.path.getsize(yamlmanager.journal_path(path))
+    monkeypatch.setattr(yamlmanager, "JOURNAL_LIMIT", entry_size * 3)
+
+    yamlmanager.journal(path, ["ProjectData", "selected_project"], "project1")
+    yamlmanager.journal(path, ["ProjectData", "selected_project"], "project2")
+    assert os.path.getsize(yamlmanager.journal_path(path)) == entry_size * 3
+    assert on_disk(path)["ProjectData"]["selected_project"] == ""
+
+    # the fourth entry takes the journal past the limit
+    yamlmanager.journal(path, ["ProjectData", "selected_project"], "project3")
+    assert not os.path.exists(yamlmanager.journal_path(path))
+    assert on_disk(path)["ProjectData"] == {"selected_project": "project3", "projects": ["demo"]}
+
+
+def test_journal_is_compacted_at_exit(tmp_path):
+    path = make_config(tmp_path)
+    # what anvil() registers for the config file
+    code = (
+        "import atexit, sys; from anvil.helpers import yamlmanager; "
+        "atexit.register(yamlmanager.compact, sys.argv[1]); "
+        "yamlmanager.journal(sys.argv[1], ['ProjectData', 'selected_project'], 'demo')"
+    )
+    subprocess.run([sys.executable, "-c", code, path], env=dict(os.environ, PYTHONPATH=SRC), check=True)
+
+    assert not os.path.exists(yamlmanager.journal_path(path))
+    assert on_disk(path)["ProjectData"]["selected_project"] == "demo"
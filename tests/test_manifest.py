@@ -0,0 +1,45 @@
+import os
+
+from anvil.helpers import filemanager, manifest
+
+
+def test_update_reports_changes_and_hashes_only_changed_files(tmp_path, monkeypatch):
+    files = tmp_path / "files"
+    os.makedirs(files / "hosts" / "web")
+    for name in ("keep.conf", "edit.conf", "touch.conf", "drop.conf"):
+        (files / "hosts" / "web" / name).write_text(f"{name}\n")
+    tree_file = tmp_path / "tree.yaml"
+    tree_file.write_text("")
+
+    hashed = []
+    file_hash = filemanager.file_hash
+
+    def counting_hash(path):
+        hashed.append(os.path.relpath(path, files))
+        return file_hash(path)
+
+    monkeypatch.setattr(filemanager, "file_hash", counting_hash)
+
+    first = manifest.update(str(tree_file), str(files))
+    assert len(first["added"]) == 4 and not first["modified"] and not first["removed"]
+
+    hashed.clear()
+    web = files / "hosts" / "web"
+    (web / "edit.conf").write_text("changed contents\n")
+    stat = os.stat(web / "touch.conf")
+    # same contents, a new mtime
+    os.utime(web / "touch.conf", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (web / "drop.conf").unlink()
+    (web / "new.conf").write_text("new\n")
+
+    changes = manifest.update(str(tree_file), str(files))
+    assert changes == {
+        "added": ["hosts/web/new.conf"],
+        "modified": ["hosts/web/edit.conf"],
+        "removed": ["hosts/web/drop.conf"],
+    }
+    assert sorted(hashed) == ["hosts/web/edit.conf", "hosts/web/new.conf", "hosts/web/touch.conf"]
+
+    hashed.clear()
+    assert manifest.update(str(tree_file), str(files)) == {"added": [], "modified": [], "removed": []}
+    assert not hashed
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import tarfile
+import threading
+
+from anvil.ansible import PlayBuilder, RunScheduler
+from anvil.ansible.play_builder import split_fused
+
+
+def make_tree(path):
+    os.makedirs(path / "conf.d")
+    (path / "conf.d" / "app.conf").write_text("value = 1\n")
+
+
+def test_send_tree_archives_are_per_play_and_removed(tmp_path, monkeypatch):
+    monkeypatch.setattr(PlayBuilder, "archive_dir", str(tmp_path / "archives"))
+    make_tree(tmp_path / "src")
+
+    first, second = PlayBuilder(), PlayBuilder()
+    for play in (first, second):
+        play.hosts.append("host0")
+        play.send_tree(str(tmp_path / "src"), "/etc/app")
+    first_archive, second_archive = first.temp_files + second.temp_files
+    assert first_archive != second_archive
+    # nothing is packed until the play is about to run
+    assert os.path.getsize(first_archive) == 0
+
+    packed = []
+    finished = threading.Event()
+
+    def runner(job):
+        job.play.prepare()
+        with tarfile.open(job.play.temp_files[0]) as archive:
+            packed.append(archive.getnames())
+
+    scheduler = RunScheduler(runner=runner)
+    scheduler.submit(first, done_callback=lambda job: finished.set())
+    assert finished.wait(5)
+
+    assert packed == [["conf.d", "conf.d/app.conf"]]
+    assert first.playbook["tasks"][-1]["name"] == "Sending /etc/app/ (1 files)"
+    assert not os.path.exists(first_archive)
+    assert os.path.exists(second_archive)
+    second.cleanup()
+    assert not os.path.exists(second_archive)
+
+
+def run_fused(commands):
+    """Run a fused_shell script with sh and split its output, as ansible's shell module reports it."""
+    play = PlayBuilder()
+    play.fused_shell(commands)
+    script = play.playbook["tasks"][-1]["ansible.builtin.shell"]["cmd"]
+    done = subprocess.run(["/bin/sh", "-c", script], capture_output=True, text=True, check=False)
+    # the shell module strips the trailing newline of both streams
+    return split_fused(done.stdout.rstrip("\n"), done.stderr.rstrip("\n")), done.returncode
+
+
+def test_split_fused_output_without_a_trailing_newline():
+    results, rc = run_fused(["printf one", "printf 'two\\nthree' >&2"])
+
+    assert rc == 0
+    assert [(r["cmd"], r["rc"], r["stdout_lines"], r["stderr_lines"]) for r in results] == [
+        ("printf one", 0, ["one"], []),
+        ("printf 'two\\nthree' >&2", 0, [], ["two", "three"]),
+    ]
+
+
+def test_split_fused_stops_at_the_first_failure():
+    results, rc = run_fused(["echo one", "echo bad >&2; exit 3", "echo never"])
+
+    assert rc == 3
+    # the later command never started, so it has no result
+    assert [(r["cmd"], r["rc"], r["stdout_lines"], r["stderr_lines"]) for r in results] == [
+        ("echo one", 0, ["one"], []),
+        ("echo bad >&2; exit 3", 3, [], ["bad"]),
+    ]
+
+
+def test_split_fused_cut_off_command_has_no_rc():
+    # killing the script leaves the command without an end marker
+    results, _ = run_fused(["echo one", "echo partial; kill -9 $PPID", "echo never"])
+
+    assert [(r["cmd"], r["rc"], r["stdout_lines"]) for r in results] == [
+        ("echo one", 0, ["one"]),
+        ("echo partial; kill -9 $PPID", None, ["partial"]),
+    ]
+
+
+def test_split_fused_multi_line_commands():
+    results, rc = run_fused(["echo a\necho b", "for i in 1 2\ndo echo $i\ndone"])
+
+    assert rc == 0
+    # begin markers carry the command on one line
+    assert [(r["cmd"], r["stdout_lines"]) for r in results] == [
+        ("echo a echo b", ["a", "b"]),
+        ("for i in 1 2 do echo $i done", ["1", "2"]),
+    ]
+
+
+def test_split_fused_ignores_other_output():
+    assert split_fused("plain output", "") == []
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from anvil.ansible import PlayBuilder, RunScheduler
+
+
+def failing_runner(job):
+    raise RuntimeError("inventory is missing")
+
+
+def test_failed_job_reports_its_error():
+    messages = []
+    finished = threading.Event()
+    scheduler = RunScheduler(runner=failing_runner)
+
+    play = PlayBuilder()
+    play.hosts.append("host0")
+    job = scheduler.submit(play, progress_callback=messages.append, done_callback=lambda job: finished.set())
+    assert finished.wait(5)
+
+    assert job.state == "failed"
+    assert isinstance(job.error, RuntimeError)
+    lines = [line for batch in messages for line in batch]
+    assert any("inventory is missing" in line["text"] and line["color"] == "red" for line in lines)
+
+
+def play_for(*hosts):
+    play = PlayBuilder()
+    play.hosts.extend(hosts)
+    return play
+
+
+def test_jobs_on_overlapping_targets_never_run_together():
+    groups = {"web": ["host1", "host2"], "db": ["host3"]}
+    lock = threading.Lock()
+    running = set()
+    overlaps = []
+    done = threading.Semaphore(0)
+
+    def runner(job):
+        with lock:
+            if running & job.keys:
+                overlaps.append(job.targets)
+            running.update(job.keys)
+        time.sleep(0.05)
+        with lock:
+            running.difference_update(job.keys)
+
+    scheduler = RunScheduler(max_concurrent=4, resolve=lambda target: groups.get(target, [target]), runner=runner)
+    targets = [["web"], ["host2"], ["db"], ["host1", "host3"], ["host4"]]
+    jobs = [scheduler.submit(play_for(), t, done_callback=lambda job: done.release()) for t in targets]
+    for _ in jobs:
+        assert done.acquire(timeout=5)
+
+    assert not overlaps
+    assert all(job.state == "finished" for job in jobs)
+    web, host2, db, both, host4 = jobs
+    # the group locks its hosts, so the job on one of them waits for it
+    assert host2.started >= web.ended
+    assert both.started >= max(web.ended, db.ended)
+    # nothing stops an unrelated host
+    assert host4.started < web.ended
+
+
+def test_higher_priority_runs_first():
+    release = threading.Event()
+    order = []
+    done = threading.Semaphore(0)
+
+    def runner(job):
+        order.append(job.priority)
+        if job.priority == 0:
+            release.wait(5)
+
+    scheduler = RunScheduler(max_concurrent=1, runner=runner)
+    scheduler.submit(play_for("host0"), done_callback=lambda job: done.release())
+    # both wait behind the first job, submitted low before high
+    scheduler.submit(play_for("host1"), priority=1, done_callback=lambda job: done.release())
+    scheduler.submit(play_for("host2"), priority=5, done_callback=lambda job: done.release())
+    release.set()
+    for _ in range(3):
+        assert done.acquire(timeout=5)
+
+    assert order == [0, 5, 1]
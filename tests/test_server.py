@@ -0,0 +1,84 @@
+import codecs
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pexpect = pytest.importorskip("pexpect")
+pytest.importorskip("ansible_runner")
+pytest.importorskip("ansible")
+
+from anvil.ansible import PlayBuilder  # noqa: E402
+from anvil.ansible.ansible import anvilrun  # noqa: E402
+from anvil.ansible.server import Server, needs_runner, servers, stop_servers  # noqa: E402
+
+
+def config(**settings):
+    defaults = {"expect_passwords": {pexpect.TIMEOUT: None, pexpect.EOF: None}, "job_timeout": 0, "idle_timeout": None}
+    return SimpleNamespace(**{**defaults, **settings})
+
+
+def test_runs_with_prompts_or_timeouts_skip_the_server():
+    assert not needs_runner(config())
+    assert needs_runner(config(expect_passwords={re.compile("Password:"): "secret", pexpect.TIMEOUT: None}))
+    assert needs_runner(config(job_timeout=60))
+    assert needs_runner(config(idle_timeout=30))
+
+
+def test_warm_run_writes_status_and_rc(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / "inventory")
+    (tmp_path / "inventory" / "hosts").write_text(
+        f"localhost ansible_connection=local ansible_python_interpreter={sys.executable}\n"
+    )
+    monkeypatch.setattr(PlayBuilder, "private_data_dir", str(tmp_path))
+    monkeypatch.setattr(PlayBuilder, "gather_facts", False)
+    # the server runs this interpreter with anvil importable
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")])))
+
+    play = PlayBuilder()
+    play.playbook["become"] = False
+    play.hosts.append("localhost")
+    play.shell(["true"])
+    try:
+        result = anvilrun(play, lambda message: None)
+        assert servers, "the run did not go through the warm server"
+    finally:
+        stop_servers()
+
+    assert result.status == "successful"
+    artifact_dir = result.config.artifact_dir
+    with open(os.path.join(artifact_dir, "status")) as f:
+        assert f.read() == "successful"
+    with open(os.path.join(artifact_dir, "rc")) as f:
+        assert f.read() == "0"
+
+
+def test_a_client_that_goes_away_cancels_its_run_and_is_dropped():
+    control, _ = socket.socketpair()
+    server = Server(control)
+    client, client_end = socket.socketpair()
+    read_fd, write_fd = os.pipe()
+    # still in this process group, as a child is before it calls setsid
+    child = subprocess.Popen(["sleep", "30"])
+    server.children[child.pid] = [client, read_fd, codecs.getincrementaldecoder("utf-8")("replace")]
+    start = time.monotonic()
+
+    client_end.close()
+    server.handle(client)
+    assert server.children[child.pid][0] is None
+
+    # the child's output is drained without a client, then the run is forgotten
+    os.write(write_fd, b"output")
+    server.handle(read_fd)
+    os.close(write_fd)
+    server.handle(read_fd)
+    assert not server.children
+    # reaping the child did not wait for sleep to end, so the cancel reached it
+    assert time.monotonic() - start < 10
+    control.close()
@@ -0,0 +1,98 @@
+import os
+import pickle
+import threading
+
+from anvil.config.inventory import Inventory
+from anvil.helpers import snapshot, yamlmanager
+
+
+def make_inventory(tmp_path) -> Inventory:
+    path = tmp_path / "hosts"
+    if not path.exists():
+        yamlmanager.dump(str(path), {"all": {"hosts": {"host0": {"ansible_host": "10.0.0.1"}}}})
+    snapshot_dir = tmp_path / "snapshots"
+    return Inventory(str(path), str(tmp_path), str(snapshot_dir / "test.inventory"))
+
+
+def loaded(inventory: Inventory) -> Inventory:
+    """Set up the inventory and wait for the snapshot written in the background."""
+    inventory.setup(materialize=False)
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join()
+    return inventory
+
+
+def test_snapshot_round_trip(tmp_path):
+    inventory = loaded(make_inventory(tmp_path))
+    assert os.stat(os.path.dirname(inventory.snapshot_path)).st_mode & 0o777 == 0o700
+
+    cached = make_inventory(tmp_path)
+    assert cached.load_snapshot()
+    assert cached.get_host("host0").vars["ansible_host"] == "10.0.0.1"
+
+
+def test_commit_defers_the_snapshot(tmp_path):
+    inventory = loaded(make_inventory(tmp_path))
+    written = os.stat(inventory.snapshot_path).st_mtime_ns
+
+    host = inventory.get_host("host0")
+    host.vars["ansible_port"] = "2222"
+    inventory.save_host(host)
+    assert inventory.snapshot_stale
+    assert os.stat(inventory.snapshot_path).st_mtime_ns == written
+    # the outdated snapshot is never loaded
+    assert make_inventory(tmp_path).load_snapshot() is False
+
+    inventory.flush_snapshot()
+    assert not inventory.snapshot_stale
+    cached = make_inventory(tmp_path)
+    assert cached.load_snapshot()
+    assert cached.get_host("host0").vars["ansible_port"] == "2222"
+
+
+def test_snapshot_writable_by_others_is_ignored(tmp_path):
+    inventory = loaded(make_inventory(tmp_path))
+
+    os.chmod(inventory.snapshot_path, 0o666)
+    assert snapshot.load(inventory.snapshot_path, inventory.path) is None
+    os.chmod(inventory.snapshot_path, 0o600)
+    os.chmod(os.path.dirname(inventory.snapshot_path), 0o777)
+    assert snapshot.load(inventory.snapshot_path, inventory.path) is None
+
+
+def test_snapshot_with_an_old_layout_is_ignored(tmp_path):
+    inventory = loaded(make_inventory(tmp_path))
+    # a header that matches, followed by a payload that cannot be unpickled
+    snapshot.write(inventory.snapshot_path, pickle.dumps(snapshot.signature(inventory.path)), b"\x80\x05garbage")
+    assert snapshot.load(inventory.snapshot_path, inventory.path) is None
+
+
+def test_projects_with_the_same_name_do_not_share_snapshots(tmp_path, monkeypatch):
+    from anvil.config.project import Project
+
+    monkeypatch.setenv("TEMP_DIR", str(tmp_path / "temp"))
+    projects = []
+    for data_dir in ("a", "b"):
+        monkeypatch.setenv("DATA_DIR", str(tmp_path / data_dir))
+        project = Project("demo")
+        os.makedirs(os.path.dirname(project.inventory_path))
+        yamlmanager.dump(project.inventory_path, {"all": {"hosts": {"host0": {"ansible_host": "10.0.0.1"}}}})
+        projects.append(project)
+    first, second = projects
+    assert first.snapshot_path != second.snapshot_path
+
+    loaded(first.inventory)
+    # a snapshot of the same content under another path is not used
+    assert snapshot.load(first.snapshot_path, second.inventory_path) is None
+    loaded(second.inventory)
+    assert second.inventory.get_host("host0").storage_dir.startswith(str(tmp_path / "b"))
+
+
+def test_snapshot_path_is_not_saved_in_the_config():
+    from anvil.config.project import Project
+    from anvil.helpers import configutils
+
+    project = Project("demo")
+    assert project.snapshot_path
+    assert "snapshot_path" not in configutils.class_to_dict(project)
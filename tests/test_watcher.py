@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from anvil.helpers import watcher
+from anvil.helpers.watcher import PollingBackend, Watcher
+
+
+def test_polling_backend_reports_create_modify_and_delete(tmp_path):
+    os.makedirs(tmp_path / "sub")
+    (tmp_path / "sub" / "old.conf").write_text("old\n")
+    backend = PollingBackend([(str(tmp_path), True)], interval=0.01)
+    assert backend.wait(0.01) == set()
+
+    (tmp_path / "sub" / "new.conf").write_text("new\n")
+    assert str(tmp_path / "sub" / "new.conf") in backend.wait(0.01)
+
+    (tmp_path / "sub" / "new.conf").write_text("new, and longer\n")
+    assert backend.wait(0.01) == {str(tmp_path / "sub" / "new.conf")}
+
+    (tmp_path / "sub" / "old.conf").unlink()
+    assert str(tmp_path / "sub" / "old.conf") in backend.wait(0.01)
+
+
+def test_watcher_delivers_one_debounced_batch(tmp_path, monkeypatch):
+    # force the polling backend
+    monkeypatch.setattr(watcher.sys, "platform", "other")
+    batches = []
+    delivered = threading.Event()
+
+    def callback(paths):
+        batches.append(paths)
+        delivered.set()
+
+    file_watcher = Watcher(callback, debounce=0.1, poll_interval=0.02)
+    file_watcher.watch(str(tmp_path))
+    file_watcher.start()
+    try:
+        assert isinstance(file_watcher.backend, PollingBackend)
+        (tmp_path / "a.conf").write_text("a\n")
+        (tmp_path / "b.conf").write_text("b\n")
+        assert delivered.wait(5)
+    finally:
+        file_watcher.stop()
+    assert batches == [[str(tmp_path / "a.conf"), str(tmp_path / "b.conf")]]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+def test_inotify_overflow_reports_every_root(tmp_path):
+    roots = [(str(tmp_path / "inventory"), True), (str(tmp_path / "files"), True)]
+    for root, _ in roots:
+        os.makedirs(root)
+    backend = watcher.InotifyBackend(roots)
+    try:
+        changed = set()
+        backend.overflow(changed)
+    finally:
+        backend.close()
+    assert changed == {root for root, _ in roots}